@@ -1,4 +1,5 @@
 #!/bin/bash
+# Start a worker for all queues, see start_celery_queue.sh to start the workers of a workload
 
 WORKERS=$(($(nproc) * 2))
 WORKERS=$(($WORKERS>1?$WORKERS:1))
@@ -0,0 +1,15 @@
+#!/bin/bash
+# Start a worker for the queues of one or more workloads so that each workload can be scaled on
+# its own, e.g. `./bin/start_celery_queue.sh 4 raw-save mapping`. The workloads are default,
+# raw-save, mapping, matching, data-quality, delete and email.
+
+if [ $# -lt 2 ]; then
+    echo "Usage: $0 <concurrency> <workload> [<workload> ...]"
+    exit 1
+fi
+
+WORKERS=$1
+shift
+QUEUES=$(python manage.py celery_queues "$@") || exit 1
+NAME=$(echo "$@" | tr ' ' '+')
+celery -A seed worker -l info -c $WORKERS -Q $QUEUES -n $NAME@%h --maxtasksperchild=1000 --events
@@ -4,7 +4,6 @@
 """
 from __future__ import absolute_import
 from config.settings.common import *  # noqa
-from kombu import Exchange, Queue
 # import aws
 from config.settings.aws import aws
 
@@ -50,13 +49,7 @@ if cache_settings is None:
 CELERY_BROKER_URL = 'redis://%(Address)s:%(Port)i/1' % cache_settings
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_TASK_DEFAULT_QUEUE = 'seed-deploy'
-CELERY_TASK_QUEUES = (
-    Queue(
-        CELERY_TASK_DEFAULT_QUEUE,
-        Exchange(CELERY_TASK_DEFAULT_QUEUE),
-        routing_key=CELERY_TASK_DEFAULT_QUEUE
-    ),
-)
+CELERY_TASK_QUEUES = task_queues(CELERY_TASK_DEFAULT_QUEUE, SEED_CELERY_QUEUE_SHARDS)
 
 # email through SES (django-ses)
 EMAIL_BACKEND = 'django_ses.SESBackend'
@@ -9,10 +9,10 @@ from __future__ import absolute_import
 
 import os
 
-from kombu import Exchange, Queue
 from kombu.serialization import register
 
 from seed.serializers.celery import CeleryDatetimeSerializer
+from seed.utils.queues import task_queues
 
 from django.utils.translation import ugettext_lazy as _
 
@@ -193,17 +193,23 @@ APPEND_SLASH = True
 PASSWORD_RESET_EMAIL = 'reset@seed-platform.org'
 SERVER_EMAIL = 'no-reply@seed-platform.org'
 
-CELERY_WORKER_MAX_TASKS_PER_CHILD = 1
+# The tasks reset the state they change, so the worker processes are kept warm for many tasks
+# instead of forking a new process (and reloading Django and the caches) for each task.
+CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000
 
 # Default queue
 CELERY_TASK_DEFAULT_QUEUE = 'seed-common'
-CELERY_TASK_QUEUES = (
-    Queue(
-        CELERY_TASK_DEFAULT_QUEUE,
-        Exchange(CELERY_TASK_DEFAULT_QUEUE),
-        routing_key=CELERY_TASK_DEFAULT_QUEUE
-    ),
-)
+
+# The tasks are routed to a queue per workload, named after the default queue, and the chunk tasks
+# are spread over SEED_CELERY_QUEUE_SHARDS queues per workload by organization (see
+# seed/utils/queues.py). Settings that change the default queue must rebuild CELERY_TASK_QUEUES.
+# Use bin/start_celery_queue.sh to start the workers of a single workload.
+SEED_CELERY_QUEUE_SHARDS = 4
+CELERY_TASK_QUEUES = task_queues(CELERY_TASK_DEFAULT_QUEUE, SEED_CELERY_QUEUE_SHARDS)
+CELERY_TASK_ROUTES = ('seed.utils.queues.route_task',)
+
+# Reserve one task at a time so that the queues are consumed in turn
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 
 # Register our custom JSON serializer so we can serialize datetime objects in celery.
 register('seed_json', CeleryDatetimeSerializer.seed_dumps,
@@ -290,3 +296,55 @@ SWAGGER_SETTINGS = {
 # should be a integer representing a number of days
 # GREEN_ASSESSMENT_DEFAULT_VALIDITY_DURATION=5 * 365
 GREEN_ASSESSMENT_DEFAULT_VALIDITY_DURATION = None
+
+# Inventory read model
+# When enabled, the inventory list, filter and export endpoints read from the denormalized
+# PropertyInventoryRow/TaxLotInventoryRow tables which are refreshed by the import, match, pair,
+# unpair, label and update code paths. Run `manage.py refresh_inventory_rows` after enabling.
+SEED_INVENTORY_READ_MODEL = False
+
+# Compact time series storage
+# When enabled, new meter readings are packed in one TimeSeriesBlock row per meter per month
+# instead of one TimeSeries row per reading. Existing readings are read from both storages.
+SEED_TIMESERIES_COMPACT_STORAGE = False
+
+# HPXML schema
+# Path of the schema that HPXML files are validated against, e.g. a flattened single file copy of
+# seed/hpxml/schemas/HPXML.xsd. Defaults to the bundled schema when None.
+SEED_HPXML_SCHEMA = None
+
+# Organization permission cache
+# Seconds to cache the organization memberships and roles used by the permission checks across
+# requests. The memberships are always cached for the duration of a request; 0 disables the
+# cross-request cache.
+SEED_ORG_PERMISSION_CACHE_TIMEOUT = 0
+
+# API key authentication cache
+# Seconds to cache a verified API key (keyed by the digest of the Authorization header). Saving
+# the user, e.g. when a new key is generated, invalidates the cached authentications.
+SEED_API_KEY_CACHE_TIMEOUT = 60
+
+# Claim-check raw data saves
+# When enabled, the rows of an uploaded file are spooled to the default storage and the raw save
+# tasks only receive the byte offset and row count of their chunk instead of the rows.
+SEED_RAW_SAVE_CLAIM_CHECK = False
+
+# Celery worker warm-up
+# When enabled, the worker compiles the HPXML schema and builds the mapping columns of the database
+# fields in its parent process, before the pool forks (see seed/celery.py), instead of in the first
+# task of each child process.
+SEED_CELERY_PRELOAD = True
+
+# Fast inventory deletion
+# When enabled, the inventory of an organization is deleted with one set-based DELETE per table for
+# each chunk (see seed/utils/deletion.py) instead of Django's collector. No delete signals are sent
+# for the inventory.
+SEED_FAST_INVENTORY_DELETE = True
+
+# Building file zip limits
+# Maximum number of building files in a zip uploaded to the batch endpoint, the maximum
+# uncompressed size in bytes of each file and of all of the files. The sizes are checked against
+# the zip headers before extraction and against the extracted bytes while reading.
+SEED_BUILDING_FILE_ZIP_MAX_FILES = 1000
+SEED_BUILDING_FILE_ZIP_MAX_FILE_SIZE = 50 * 2 ** 20
+SEED_BUILDING_FILE_ZIP_MAX_TOTAL_SIZE = 500 * 2 ** 20
@@ -48,13 +48,7 @@ CELERY_BROKER_TRANSPORT = 'redis'
 CELERY_BROKER_URL = "redis://db-redis:6379/1"
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_TASK_DEFAULT_QUEUE = 'seed-docker'
-CELERY_TASK_QUEUES = (
-    Queue(
-        CELERY_TASK_DEFAULT_QUEUE,
-        Exchange(CELERY_TASK_DEFAULT_QUEUE),
-        routing_key=CELERY_TASK_DEFAULT_QUEUE
-    ),
-)
+CELERY_TASK_QUEUES = task_queues(CELERY_TASK_DEFAULT_QUEUE, SEED_CELERY_QUEUE_SHARDS)
 
 LOGGING = {
     'version': 1,
@@ -10,7 +10,6 @@
 #
 from __future__ import absolute_import
 from config.settings.common import *  # noqa
-from kombu import Exchange, Queue
 
 DEBUG = False
 COMPRESS_ENABLED = True
@@ -52,13 +51,7 @@ CELERY_BROKER_TRANSPORT = 'redis'
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/1'
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 CELERY_TASK_DEFAULT_QUEUE = 'seed-prod'
-CELERY_TASK_QUEUES = (
-    Queue(
-        CELERY_TASK_DEFAULT_QUEUE,
-        Exchange(CELERY_TASK_DEFAULT_QUEUE),
-        routing_key=CELERY_TASK_DEFAULT_QUEUE
-    ),
-)
+CELERY_TASK_QUEUES = task_queues(CELERY_TASK_DEFAULT_QUEUE, SEED_CELERY_QUEUE_SHARDS)
 
 # logging
 LOGGING = {
@@ -79,12 +79,10 @@ urlpatterns = [
     url(r'get_upload_details/$', get_upload_details, name='get_upload_details'),
     url(r'sign_policy_document/$', sign_policy_document, name='sign_policy_document'),
     url(r'^schema/$', get_api_schema, name='schema'),
+    # GET returns the readings of the meter, POST adds readings
     url(r'meters/(?P<pk>\w+)/timeseries/$',
-        MeterViewSet.as_view({'get': 'timeseries'}),
+        MeterViewSet.as_view({'get': 'timeseries', 'post': 'add_timeseries'}),
         name='meters-get-timeseries'),
-    url(r'meters/(?P<pk>\w+)/timeseries/$',
-        MeterViewSet.as_view({'post': 'add_timeseries'}),
-        name='meters-add-timeseries'),
     url(
         r'projects/(?P<pk>\w+)/add/$',
         ProjectViewSet.as_view({'put': 'add'}),
@@ -13,11 +13,89 @@ from collections import OrderedDict
 
 import xmltodict
 from django.db.models import FieldDoesNotExist
+from lxml import etree
 
 from seed.models.measures import _snake_case
 
 _log = logging.getLogger(__name__)
 
+BUILDINGSYNC_URI = 'http://nrel.gov/schemas/bedes-auc/2014'
+XSI_URI = 'http://www.w3.org/2001/XMLSchema-instance'
+NAMESPACES = {
+    'auc': BUILDINGSYNC_URI,
+    'xsi': XSI_URI,
+}
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+# The files are uploaded by users: do not resolve external entities or load anything from the
+# network (XXE), as the expat parser of xmltodict did not either
+XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+# namespace URIs to prefixes, as used by xmltodict.parse
+XMLTODICT_NAMESPACES = {uri: prefix for prefix, uri in NAMESPACES.items()}
+
+# compiled XPath expressions, keyed on the dotted path and the optional sub-lookup element names
+_XPATHS = {}
+
+MEASURES_XPATH = etree.XPath('/auc:Audits/auc:Audit/auc:Measures/auc:Measure',
+                             namespaces=NAMESPACES)
+SCENARIOS_XPATH = etree.XPath(
+    '/auc:Audits/auc:Audit/auc:Report/auc:Scenarios/auc:Scenario', namespaces=NAMESPACES
+)
+
+
+def compile_path(path, key_path_name=None, value_path_name=None):
+    """
+    Return the compiled XPath expression of a dotted struct path, e.g.
+    auc:Audits.auc:Audit.auc:Sites.auc:Site.@ID. The expressions are compiled once per process.
+
+    If key_path_name and value_path_name are given, the expression selects the value_path_name
+    element of the items of the path whose key_path_name element equals the $key_value variable.
+
+    :param path: string, path delimited by periods, starting at the root element
+    :param key_path_name: string, optional, name of the element of the key of the sub-lookup
+    :param value_path_name: string, optional, name of the element of the value of the sub-lookup
+    :return: etree.XPath
+    """
+    key = (path, key_path_name, value_path_name)
+    if key not in _XPATHS:
+        xpath = '/' + '/'.join(path.split('.'))
+        if key_path_name and value_path_name:
+            xpath = '{}[{} = $key_value]/{}'.format(xpath, key_path_name, value_path_name)
+        _XPATHS[key] = etree.XPath(xpath, namespaces=NAMESPACES)
+    return _XPATHS[key]
+
+
+def _qname(name):
+    """Return the Clark notation ({uri}name) of a prefixed name, e.g. auc:City"""
+    if ':' in name:
+        prefix, local_name = name.split(':', 1)
+        return '{%s}%s' % (NAMESPACES[prefix], local_name)
+    return name
+
+
+def _text(element):
+    if element is None or element.text is None:
+        return None
+    return element.text.strip() or None
+
+
+def _node_value(node):
+    """
+    Return the value of an element or attribute the way xmltodict would: the stripped text of
+    leaf elements (or None if empty) and a dict for elements with children or attributes.
+    """
+    if not isinstance(node, etree._Element):
+        # attribute or text result
+        return unicode(node)
+    if len(node) or node.attrib:
+        return xmltodict.parse(
+            etree.tostring(node), process_namespaces=True, namespaces=XMLTODICT_NAMESPACES
+        ).values()[0]
+    return _text(node)
+
+
+def _local_name(element):
+    return etree.QName(element).localname
+
 
 class BuildingSync(object):
     ADDRESS_STRUCT = {
@@ -145,7 +223,27 @@ class BuildingSync(object):
     def __init__(self):
         self.filename = None
         self.data = None
-        self.raw_data = {}
+        self.tree = None
+        self._raw_data = {}
+
+    @property
+    def raw_data(self):
+        """
+        The file as a dictionary (in the format of xmltodict). Built on first access from the
+        parsed tree, which is what process and export use.
+        """
+        if self._raw_data is None:
+            self._raw_data = xmltodict.parse(
+                etree.tostring(self.tree),
+                process_namespaces=True,
+                namespaces=XMLTODICT_NAMESPACES,
+            )
+        return self._raw_data
+
+    @raw_data.setter
+    def raw_data(self, value):
+        self.tree = None
+        self._raw_data = value
 
     @property
     def pretty_print(self):
@@ -159,15 +257,8 @@ class BuildingSync(object):
         self.filename = filename
 
         if os.path.isfile(filename):
-            with open(filename, 'rU') as xmlfile:
-                self.raw_data = xmltodict.parse(
-                    xmlfile.read(),
-                    process_namespaces=True,
-                    namespaces={
-                        'http://nrel.gov/schemas/bedes-auc/2014': 'auc',
-                        'http://www.w3.org/2001/XMLSchema-instance': 'xsi',
-                    }
-                )
+            self.tree = etree.parse(filename, XML_PARSER)
+            self._raw_data = None
         else:
             raise Exception("File not found: {}".format(filename))
 
@@ -181,66 +272,129 @@ class BuildingSync(object):
         :param process_struct: dict, mapping from PropertyState to BuildingSync
         :return: string, as XML
         """
-
-        # if property state is not defined, then just return the BuildingSync unparsed
-        if not property_state:
-            return xmltodict.unparse(self.raw_data, pretty=True).replace('\t', '  ')
-
-        # parse the property_state and merge it with the raw data
-        new_dict = copy.deepcopy(self.raw_data)
-        if new_dict == {}:
+        if self.tree is not None:
+            tree = copy.deepcopy(self.tree)
+        elif self._raw_data:
+            tree = self._tree_from_raw_data()
+        else:
             _log.debug("BuildingSync raw data is empty, adding in header information")
-            # new_dict[]
-            new_dict = OrderedDict(
-                [
-                    (
-                        u'auc:Audits', OrderedDict(
-                            [
-                                (u'@xsi:schemaLocation',
-                                 u'http://nrel.gov/schemas/bedes-auc/2014 file:///E:/buildingsync/BuildingSync.xsd'),
-                                ('@xmlns', OrderedDict(
-                                    [
-                                        (u'auc', u'http://nrel.gov/schemas/bedes-auc/2014'),
-                                        (u'xsi', u'http://www.w3.org/2001/XMLSchema-instance')
-                                    ]
-                                ))
-                            ]
+            root = etree.Element(_qname('auc:Audits'), nsmap=NAMESPACES)
+            root.set(_qname('xsi:schemaLocation'),
+                     '{} file:///E:/buildingsync/BuildingSync.xsd'.format(BUILDINGSYNC_URI))
+            tree = etree.ElementTree(root)
+
+        # if property state is not defined, then just return the BuildingSync file
+        if property_state:
+            for field, v in process_struct['return'].items():
+                value = None
+                try:
+                    property_state._meta.get_field(field)
+                    value = getattr(property_state, field)
+                except FieldDoesNotExist:
+                    _log.debug(
+                        "Field {} is not a db field, trying read from extra data".format(field))
+                    value = property_state.extra_data.get(field, None)
+
+                # set the value in the tree
+                # TODO: remove the field if the value is None
+                if value:
+                    full_path = "{}.{}".format(process_struct['root'], v['path'])
+
+                    if v.get('key_path_name', None) and v.get('value_path_name', None) and v.get(
+                            'key_path_value', None):
+                        self._set_compound_element(
+                            tree,
+                            full_path,
+                            v['key_path_name'],
+                            v['key_path_value'],
+                            v['value_path_name'],
+                            value
                         )
-                    )
-                ]
-            )
+                    else:
+                        if not self._set_element(tree, full_path, value):
+                            _log.debug("Unable to set path")
 
-        for field, v in process_struct['return'].items():
-            value = None
-            try:
-                property_state._meta.get_field(field)
-                value = getattr(property_state, field)
-            except FieldDoesNotExist:
-                _log.debug("Field {} is not a db field, trying read from extra data".format(field))
-                value = property_state.extra_data.get(field, None)
-
-            # set the value in the new_dict (if none, then remove the field)
-            # TODO: remove the field if the value is None
-            # TODO: handle the setting of the complex fields (with key_path_names, identifiers)
-            if value:
-                full_path = "{}.{}".format(process_struct['root'], v['path'])
+        # the same declaration and (unicode) string as xmltodict.unparse
+        return XML_DECLARATION + etree.tostring(tree, pretty_print=True, encoding='unicode')
 
-                if v.get('key_path_name', None) and v.get('value_path_name', None) and v.get(
-                        'key_path_value', None):
-                    # iterate over the paths and find the correct node to set
-                    self._set_compound_node(
-                        full_path,
-                        new_dict,
-                        v['key_path_name'],
-                        v['key_path_value'],
-                        v['value_path_name'],
-                        value
-                    )
-                else:
-                    if not self._set_node(full_path, new_dict, value):
-                        _log.debug("Unable to set path")
+    def _tree_from_raw_data(self):
+        """
+        Return the raw data (e.g. set by assigning raw_data) as an element tree. The namespace
+        prefixes are declared on the root element, xmltodict.parse does not keep the declarations.
+        """
+        data = copy.deepcopy(self._raw_data)
+        root_name = next(iter(data))
+        if not isinstance(data[root_name], dict):
+            data[root_name] = OrderedDict()
+        declarations = data[root_name].setdefault('@xmlns', OrderedDict())
+        for prefix, uri in NAMESPACES.items():
+            declarations.setdefault(prefix, uri)
+
+        return etree.ElementTree(etree.fromstring(xmltodict.unparse(data).encode('utf-8'), XML_PARSER))
+
+    def _find_or_create_parent(self, tree, path):
+        # navigate to (and create if needed) the parent of the last element of the path. Only the
+        # first element is followed if there are several.
+        path = path.split('.')
+        root = tree.getroot()
+        if '' in path or root.tag != _qname(path[0]):
+            return None, None
+
+        node = root
+        for p in path[1:-1]:
+            if p.startswith('@'):
+                return None, None
+            child = node.find(_qname(p))
+            if child is None:
+                child = etree.SubElement(node, _qname(p))
+            node = child
+        return node, path[-1]
+
+    def _set_element(self, tree, path, value):
+        """
+        Set the value of an element or attribute (last part of the path starts with @) of an
+        etree, creating the elements along the path that do not exist.
 
-        return xmltodict.unparse(new_dict, pretty=True).replace('\t', '  ')
+        :param tree: etree.ElementTree, to update
+        :param path: string, path which to navigate to set the value, starting at the root element
+        :param value: value to set
+        :return: boolean, true if successful
+        """
+        node, name = self._find_or_create_parent(tree, path)
+        if node is None:
+            return False
+
+        if name.startswith('@'):
+            node.set(_qname(name[1:]), unicode(value))
+        else:
+            child = node.find(_qname(name))
+            if child is None:
+                child = etree.SubElement(node, _qname(name))
+            child.text = unicode(value)
+        return True
+
+    def _set_compound_element(self, tree, list_path, key_path_name, key_path_value,
+                              value_path_name, value):
+        """
+        etree version of _set_compound_node: set the value_path_name element of the item of
+        list_path whose key_path_name element is key_path_value, adding the item if needed.
+        """
+        node, name = self._find_or_create_parent(tree, list_path)
+        if node is None or name.startswith('@'):
+            return False
+
+        for item in node.findall(_qname(name)):
+            if _text(item.find(_qname(key_path_name))) == key_path_value:
+                break
+        else:
+            item = etree.SubElement(node, _qname(name))
+            etree.SubElement(item, _qname(key_path_name)).text = key_path_value
+
+        value_node = item.find(_qname(value_path_name))
+        if value_node is None:
+            value_node = etree.SubElement(item, _qname(value_path_name))
+        value_node.text = unicode(value)
+        return True
 
     def _set_node(self, path, data, value):
         """
@@ -361,7 +515,7 @@ class BuildingSync(object):
                     # can't recurse futher into new_node because it is not a dict
                     break
 
-    def _get_node(self, path, node, results=[], kwargs={}):
+    def _get_node(self, path, node, results=None):
         """
         Return the values from a dictionary based on a path delimited by periods. If there
         are more than one results, then it will return all the results in a list.
@@ -374,6 +528,8 @@ class BuildingSync(object):
         :param results: list or value, results
         :return: list, results
         """
+        if results is None:
+            results = []
         path = path.split(".")
 
         for idx, p in enumerate(path):
@@ -408,6 +564,36 @@ class BuildingSync(object):
         else:
             return results
 
+    def _store_value(self, res, messages, k, v, path, value):
+        """
+        Type cast a value found for a field of a process struct and store it in the results.
+
+        :return: boolean, True if there was an error
+        """
+        if value:
+            # catch some errors
+            if isinstance(value, list):
+                messages.append("Could not find single entry for '{}'".format(path))
+                return True
+
+            # type cast the value
+            if v['type'] == 'double':
+                value = float(value)
+            elif v['type'] == 'integer':
+                value = int(value)
+            elif v['type'] == 'dict':
+                value = dict(value)
+            elif v['type'] == 'string':
+                value = str(value)
+            else:
+                messages.append("Unknown cast type of {} for '{}'".format(v['type'], path))
+
+            res[k] = value
+        elif v['required']:
+            messages.append("Could not find required value for '{}'".format(path))
+            return True
+        return False
+
     def _process_struct(self, struct, data):
         """
         Take a dictionary and return the `return` object with values filled in.
@@ -456,30 +642,8 @@ class BuildingSync(object):
                         else:
                             continue
 
-                if value:
-                    # catch some errors
-                    if isinstance(value, list):
-                        messages.append("Could not find single entry for '{}'".format(path))
-                        errors = True
-                        continue
-
-                    # type cast the value
-                    if v['type'] == 'double':
-                        value = float(value)
-                    elif v['type'] == 'integer':
-                        value = int(value)
-                    elif v['type'] == 'dict':
-                        value = dict(value)
-                    elif v['type'] == 'string':
-                        value = str(value)
-                    else:
-                        messages.append("Unknown cast type of {} for '{}'".format(v['type'], path))
-
-                    res[k] = value
-                else:
-                    if v['required']:
-                        messages.append("Could not find required value for '{}'".format(path))
-                        errors = True
+                if self._store_value(res, messages, k, v, path, value):
+                    errors = True
             except Exception as err:
                 message = "Error processing {}:{} with error: {}".format(k, v, err)
                 messages.append(message)
@@ -553,6 +717,94 @@ class BuildingSync(object):
 
         return res, errors, messages
 
+    def _process_tree(self, struct, tree):
+        """
+        etree version of _process_struct. The paths of the struct are evaluated as compiled XPath
+        expressions, which is much faster than navigating the xmltodict dictionary.
+
+        :param struct: dict, object to parse and fill from BuildingSync file
+        :param tree: etree.ElementTree, parsed BuildingSync file
+        :return: list, the `return` value, if all paths were found, and list of messages
+        """
+        res = {'measures': [], 'scenarios': []}
+        messages = []
+        errors = False
+        for k, v in struct['return'].items():
+            path = ".".join([struct['root'], v['path']])
+
+            try:
+                if v.get('key_path_name', None) and v.get('value_path_name', None) and v.get(
+                        'key_path_value', None):
+                    nodes = compile_path(path, v['key_path_name'], v['value_path_name'])(
+                        tree, key_value=v['key_path_value'])
+                    value = _node_value(nodes[0]) if nodes else None
+
+                    # check if the value is not defined and if it is required
+                    if not value:
+                        if v.get('required'):
+                            messages.append(
+                                "Could not find required value for sub-lookup of {}:{}".format(
+                                    v.get('key_path_name'), v.get('key_path_value')))
+                            errors = True
+                        continue
+                else:
+                    values = [value for value in
+                              (_node_value(node) for node in compile_path(path)(tree)) if value]
+                    value = values[0] if len(values) == 1 else values
+
+                if self._store_value(res, messages, k, v, path, value):
+                    errors = True
+            except Exception as err:
+                message = "Error processing {}:{} with error: {}".format(k, v, err)
+                messages.append(message)
+                errors = True
+
+        # manually add in parsing of measures and reports because they are a bit different than
+        # a straight mapping
+        for m in MEASURES_XPATH(tree):
+            category_node = next(iter(m.iterfind(
+                'auc:TechnologyCategories/auc:TechnologyCategory/*', namespaces=NAMESPACES
+            )), None)
+            if category_node is None:
+                continue
+
+            new_data = {
+                'property_measure_name': m.get('ID'),  # This will be the IDref from the scenarios
+                'category': _snake_case(_local_name(category_node)),
+                'name': _text(category_node.find('auc:MeasureName', namespaces=NAMESPACES)),
+            }
+            for child in m.iterchildren(tag=etree.Element):
+                name = _local_name(child)
+                if name in ['PremisesAffected', 'TechnologyCategories']:
+                    continue
+                new_data[_snake_case(name)] = _node_value(child)
+
+            new_data['name'] = _snake_case(new_data['name'])
+            res['measures'].append(new_data)
+
+        for s in SCENARIOS_XPATH(tree):
+            new_data = {
+                'id': s.get('ID'),
+                'name': _text(s.find('auc:ScenarioName', namespaces=NAMESPACES)),
+            }
+
+            node = s.find('auc:ScenarioType/auc:PackageOfMeasures', namespaces=NAMESPACES)
+            if node is not None and (len(node) or node.attrib):
+                ref_case = node.find('auc:ReferenceCase', namespaces=NAMESPACES)
+                if ref_case is not None and ref_case.get('IDref'):
+                    new_data['reference_case'] = ref_case.get('IDref')
+                new_data['annual_savings_site_energy'] = _text(
+                    node.find('auc:AnnualSavingsSiteEnergy', namespaces=NAMESPACES))
+                new_data['measures'] = [
+                    measure.get('IDref') for measure in
+                    node.iterfind('auc:MeasureIDs/auc:MeasureID', namespaces=NAMESPACES)
+                    if measure.get('IDref')
+                ]
+
+            res['scenarios'].append(new_data)
+
+        return res, errors, messages
+
     def process(self, process_struct=ADDRESS_STRUCT):
         """Process the BuildingSync file based ont he process structure.
 
@@ -561,4 +813,13 @@ class BuildingSync(object):
         """
         # API call to BuildingSync Selection Tool on other server for appropriate use case
         # prcess_struct = new_use_case (from Building Selection Tool)
+        if self.tree is not None:
+            return self._process_tree(process_struct, self.tree)
         return self._process_struct(process_struct, self.raw_data)
+
+
+# compile the XPath expressions of the default structs when the module is loaded
+for _struct in [BuildingSync.ADDRESS_STRUCT, BuildingSync.BRICR_STRUCT]:
+    for _field in _struct['return'].values():
+        compile_path('.'.join([_struct['root'], _field['path']]), _field.get('key_path_name'),
+                     _field.get('value_path_name'))
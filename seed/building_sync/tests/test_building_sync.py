@@ -6,6 +6,8 @@
 """
 
 import copy
+import shutil
+import tempfile
 from os import path, remove
 
 from django.test import TestCase
@@ -61,6 +63,34 @@ class TestBuildingSync(TestCase):
 
         self.assertEqual(self.bs.raw_data, new_bs.raw_data)
 
+    def test_export_raw_data(self):
+        self.bs.import_file(self.xml_file)
+        new_bs = BuildingSync()
+        new_bs.raw_data = self.bs.raw_data
+
+        xml = new_bs.export(None, BuildingSync.BRICR_STRUCT)
+        self.assertTrue(xml.startswith('<?xml version="1.0" encoding="utf-8"?>'))
+        self.assertTrue("<auc:City>Denver</auc:City>" in xml)
+
+    def test_import_does_not_resolve_external_entities(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        secret_file = path.join(tmp_dir, 'secret.txt')
+        with open(secret_file, 'w') as f:
+            f.write('SECRET VALUE')
+        xml_file = path.join(tmp_dir, 'xxe.xml')
+        with open(xml_file, 'w') as f:
+            f.write(
+                '<?xml version="1.0"?>\n'
+                '<!DOCTYPE auc:Audits [<!ENTITY xxe SYSTEM "file://{}">]>\n'
+                '<auc:Audits xmlns:auc="http://nrel.gov/schemas/bedes-auc/2014"><auc:Audit>'
+                '<auc:Sites><auc:Site><auc:Address><auc:City>&xxe;</auc:City></auc:Address>'
+                '</auc:Site></auc:Sites></auc:Audit></auc:Audits>'.format(secret_file)
+            )
+
+        self.bs.import_file(xml_file)
+        self.assertNotIn('SECRET VALUE', self.bs.export(None, BuildingSync.BRICR_STRUCT))
+
     def test_export(self):
         self.bs.import_file(self.xml_file)
 
@@ -258,6 +288,27 @@ class TestBuildingSync(TestCase):
         result = self.bs._get_node('c.d.e.f.g.h.i', data, [])
         self.assertEqual(result, [])
 
+    def test_get_node_default_results(self):
+        data = {"a": {"b": 1}}
+        self.assertEqual(self.bs._get_node('a.b', data), 1)
+        # results are not shared between calls
+        self.assertEqual(self.bs._get_node('a.b', data), 1)
+
+    def test_process_engines_match(self):
+        xml_file = path.join(path.dirname(__file__), 'data', 'buildingsync_ex01_measures.xml')
+        self.assertTrue(self.bs.import_file(xml_file))
+        self.assertIsNotNone(self.bs.tree)
+
+        # the dictionary engine is used when there is no tree
+        dict_bs = BuildingSync()
+        dict_bs.raw_data = self.bs.raw_data
+        self.assertIsNone(dict_bs.tree)
+
+        res, errors, messages = self.bs.process(BuildingSync.BRICR_STRUCT)
+        self.assertEqual((res, errors, messages), dict_bs.process(BuildingSync.BRICR_STRUCT))
+        self.assertEqual(len(res['measures']), 2)
+        self.assertEqual(res['scenarios'][1]['measures'], ['Measure1'])
+
     def test_get_address_missing_field(self):
         self.assertTrue(self.bs.import_file(self.xml_file))
 
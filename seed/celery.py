@@ -10,6 +10,7 @@ import os
 
 import celery
 import raven
+from celery.signals import worker_init
 from django.conf import settings
 from raven.contrib.celery import register_signal, register_logger_signal
 
@@ -35,5 +36,20 @@ app = Celery('seed')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks(lambda: settings.SEED_CORE_APPS)
 
+
+@worker_init.connect
+def warm_worker(**kwargs):
+    """
+    Loads the caches that the tasks share in the parent process of the worker, before the pool
+    forks, instead of in the first task of each child. The children that replace the ones recycled
+    after CELERY_WORKER_MAX_TASKS_PER_CHILD tasks are forked with the caches loaded as well.
+    """
+    from seed.hpxml.hpxml import preload_schema
+    from seed.lib.mappings.mapping_data import MappingData
+
+    if getattr(settings, 'SEED_CELERY_PRELOAD', True):
+        preload_schema()
+        MappingData()
+
 if __name__ == '__main__':
     app.start()
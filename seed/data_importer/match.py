@@ -0,0 +1,441 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+
+Manual matching and unmatching of the states of an import file. The match and unmatch endpoints
+of the import files work on one pair of states, the bulk_match task on many pairs at once; both
+use the functions here. The states of a batch of matches are merged in memory and the merged
+states, audit logs, inventory records, views, labels and pairings are bulk inserted.
+"""
+from collections import defaultdict, namedtuple
+
+from django.apps import apps
+from django.db.models import Q
+
+from seed.lib.merging import merging
+from seed.models import (
+    AUDIT_IMPORT,
+    DATA_STATE_MATCHING,
+    MERGE_STATE_DELETE,
+    MERGE_STATE_MERGED,
+    MERGE_STATE_NEW,
+    MERGE_STATE_UNKNOWN,
+    Property,
+    PropertyAuditLog,
+    PropertyState,
+    PropertyView,
+    TaxLot,
+    TaxLotAuditLog,
+    TaxLotProperty,
+    TaxLotState,
+    TaxLotView,
+)
+from seed.utils.address import normalize_address_str
+from seed.utils.organizations import invalidate_inventory_counts
+from seed.utils.reports import invalidate_report_cache
+
+# Models of an inventory type, name is the prefix of the inventory fields (e.g. property_id) and
+# other_name the prefix of the paired inventory in TaxLotProperty
+InventoryModels = namedtuple(
+    'InventoryModels', ['inventory', 'state', 'view', 'audit_log', 'label', 'name', 'other_name']
+)
+
+
+def inventory_models(inventory_type):
+    """
+    Return the models of an inventory type.
+
+    :param inventory_type: string, either properties | taxlots
+    :return: InventoryModels
+    """
+    if inventory_type == 'properties':
+        return InventoryModels(Property, PropertyState, PropertyView, PropertyAuditLog,
+                               apps.get_model('seed', 'Property_labels'), 'property', 'taxlot')
+    return InventoryModels(TaxLot, TaxLotState, TaxLotView, TaxLotAuditLog,
+                           apps.get_model('seed', 'TaxLot_labels'), 'taxlot', 'property')
+
+
+def _error(request, message):
+    error = dict(request)
+    error['message'] = message
+    return error
+
+
+def _parse_pairs(requests, other_key):
+    """Return the (state_id, other id) pairs and the errors of the requests that are invalid"""
+    pairs = []
+    errors = []
+    seen = set()
+    for request in requests:
+        try:
+            pair = (int(request['state_id']), int(request[other_key]))
+        except (KeyError, TypeError, ValueError):
+            errors.append(_error(request, 'state_id and {} are required'.format(other_key)))
+            continue
+
+        if pair[0] == pair[1]:
+            errors.append(_error(request, 'A state cannot be matched with itself'))
+        elif seen.intersection(pair):
+            errors.append(_error(request, 'A state can only be part of one pair'))
+        else:
+            seen.update(pair)
+            pairs.append(pair)
+    return pairs, errors
+
+
+def validate_matches(inventory_type, organization_id, requests):
+    """
+    Check a list of match requests ({'state_id': ..., 'matching_state_id': ...}).
+
+    :return: tuple, (list of (state_id, matching_state_id) of the valid requests,
+                     list of the invalid requests with an error message)
+    """
+    models = inventory_models(inventory_type)
+    pairs, errors = _parse_pairs(requests, 'matching_state_id')
+
+    state_ids = [state_id for pair in pairs for state_id in pair]
+    found = set(models.state.objects.filter(
+        pk__in=state_ids, organization_id=organization_id).values_list('id', flat=True))
+    with_views = set(models.view.objects.filter(
+        state_id__in=state_ids).values_list('state_id', flat=True))
+    coparents = models.state.coparents([source_id for source_id, _ in pairs])
+
+    valid = []
+    for source_id, matching_id in pairs:
+        request = {'state_id': source_id, 'matching_state_id': matching_id}
+        if source_id not in found or matching_id not in found:
+            errors.append(_error(request, 'State does not exist'))
+        elif coparents.get(source_id):
+            errors.append(_error(request, 'Source state is already matched'))
+        elif source_id not in with_views and matching_id not in with_views:
+            errors.append(_error(request, 'The states are not in a view'))
+        else:
+            valid.append((source_id, matching_id))
+    return valid, errors
+
+
+def validate_unmatches(inventory_type, organization_id, requests):
+    """
+    Check a list of unmatch requests ({'state_id': ..., 'coparent_id': ...}).
+
+    :return: tuple, (list of (state_id, coparent_id) of the valid requests,
+                     list of the invalid requests with an error message)
+    """
+    models = inventory_models(inventory_type)
+    pairs, errors = _parse_pairs(requests, 'coparent_id')
+
+    found = set(models.state.objects.filter(
+        pk__in=[source_id for source_id, _ in pairs], organization_id=organization_id
+    ).values_list('id', flat=True))
+    coparents = models.state.coparents([source_id for source_id, _ in pairs])
+
+    valid = []
+    for source_id, coparent_id in pairs:
+        request = {'state_id': source_id, 'coparent_id': coparent_id}
+        coparent = coparents.get(source_id)
+        if source_id not in found:
+            errors.append(_error(request, 'State does not exist'))
+        elif not coparent:
+            errors.append(_error(request, 'Source state is already unmatched'))
+        elif len(coparent) > 1:
+            errors.append(_error(request, 'More than one merge record found'))
+        elif coparent[0]['id'] != coparent_id:
+            errors.append(_error(
+                request, 'Coparent ID in audit history doesn\'t match coparent_id parameter'))
+        else:
+            valid.append((source_id, coparent_id))
+    return valid, errors
+
+
+def _paired_view_ids(models, view_ids):
+    """Return the ids of the views of the other inventory type paired to each view"""
+    paired = defaultdict(set)
+    for view_id, paired_view_id in TaxLotProperty.objects.filter(
+            **{'{}_view_id__in'.format(models.name): view_ids}
+    ).values_list('{}_view_id'.format(models.name), '{}_view_id'.format(models.other_name)):
+        paired[view_id].add(paired_view_id)
+    return paired
+
+
+def _pairings(models, cycle_id, view_id, paired_view_ids):
+    return [
+        TaxLotProperty(primary=True, cycle_id=cycle_id, **{
+            '{}_view_id'.format(models.name): view_id,
+            '{}_view_id'.format(models.other_name): paired_view_id,
+        }) for paired_view_id in sorted(paired_view_ids)
+    ]
+
+
+def _labels(models, inventory_id, label_ids):
+    return [
+        models.label(statuslabel_id=label_id, **{'{}_id'.format(models.name): inventory_id})
+        for label_id in label_ids
+    ]
+
+
+def _invalidate_caches(models, cycle_ids):
+    # the views were bulk created, without their post_save signal
+    for cycle_id in set(cycle_ids):
+        invalidate_inventory_counts(cycle_id)
+        if models.inventory is Property:
+            invalidate_report_cache(cycle_id)
+
+
+def match_states(inventory_type, organization_id, pairs):
+    """
+    Merge each pair of states into a new state and replace the views, inventory records, labels
+    and pairings of the two states with those of the merged state. The pairs need to be validated
+    with validate_matches first.
+
+    :param inventory_type: string, either properties | taxlots
+    :param organization_id: int, organization of the merged states
+    :param pairs: list of (state_id, matching_state_id), the state's values take precedence
+    :return: list, ids of the new views
+    """
+    models = inventory_models(inventory_type)
+    source_ids = [source_id for source_id, _ in pairs]
+    state_ids = source_ids + [matching_id for _, matching_id in pairs]
+    states = models.state.objects.in_bulk(state_ids)
+
+    merged_states = []
+    for source_id, matching_id in pairs:
+        state1 = states[matching_id]
+        state2 = states[source_id]
+        merged_state, _ = merging.merge_state(models.state(organization_id=organization_id),
+                                              state1,
+                                              state2,
+                                              merging.get_state_attrs([state1, state2]),
+                                              default=state2,
+                                              merge_relationships=False)
+        merged_state.data_state = DATA_STATE_MATCHING
+        merged_state.merge_state = MERGE_STATE_MERGED
+        # bulk_create does not call save, which normalizes the address
+        if merged_state.address_line_1 is not None:
+            merged_state.normalized_address = normalize_address_str(merged_state.address_line_1)
+        merged_states.append(merged_state)
+    models.state.objects.bulk_create(merged_states)
+
+    models.state.merge_relationships_batch([
+        (merged_state, states[matching_id], states[source_id])
+        for (source_id, matching_id), merged_state in zip(pairs, merged_states)
+    ])
+
+    # the merge is the child of the first audit log of each state
+    first_logs = {}
+    for log_id, state_id, ancestor_ids in models.audit_log.objects.filter(
+            state_id__in=state_ids).order_by('id').values_list('id', 'state_id', 'ancestor_ids'):
+        first_logs.setdefault(state_id, (log_id, ancestor_ids))
+
+    audit_logs = []
+    for (source_id, matching_id), merged_state in zip(pairs, merged_states):
+        parents = [
+            first_logs.get(matching_id, (None, None)), first_logs.get(source_id, (None, None))
+        ]
+        ancestor_ids = set()
+        for parent_id, parent_ancestor_ids in parents:
+            if parent_id is not None:
+                ancestor_ids.add(parent_id)
+                ancestor_ids.update(parent_ancestor_ids or [])
+        audit_logs.append(models.audit_log(organization_id=states[matching_id].organization_id,
+                                           parent1_id=parents[0][0],
+                                           parent2_id=parents[1][0],
+                                           parent_state1_id=matching_id,
+                                           parent_state2_id=source_id,
+                                           state=merged_state,
+                                           name='Manual Match',
+                                           description='Automatic Merge',
+                                           import_filename=None,
+                                           record_type=AUDIT_IMPORT,
+                                           ancestor_ids=sorted(ancestor_ids)))
+    models.audit_log.objects.bulk_create(audit_logs)
+
+    models.state.objects.filter(pk__in=source_ids).update(merge_state=MERGE_STATE_UNKNOWN)
+
+    # Collect the views, labels and pairings of the states before their inventory is deleted
+    views = defaultdict(list)
+    for view_id, state_id, cycle_id, inventory_id in models.view.objects.filter(
+            state_id__in=state_ids).order_by('id').values_list(
+            'id', 'state_id', 'cycle_id', '{}_id'.format(models.name)):
+        views[state_id].append((view_id, cycle_id, inventory_id))
+    inventory_ids = [view[2] for state_views in views.values() for view in state_views]
+
+    labels = defaultdict(set)
+    for inventory_id, label_id in models.label.objects.filter(
+            **{'{}_id__in'.format(models.name): inventory_ids}
+    ).values_list('{}_id'.format(models.name), 'statuslabel_id'):
+        labels[inventory_id].add(label_id)
+    paired_view_ids = _paired_view_ids(
+        models, [view[0] for state_views in views.values() for view in state_views])
+
+    # the views and pairings are deleted by the cascade
+    models.inventory.objects.filter(pk__in=inventory_ids).delete()
+
+    new_inventory = models.inventory.objects.bulk_create([
+        models.inventory(organization_id=organization_id) for _ in pairs
+    ])
+
+    new_views = []
+    new_labels = []
+    paired = []
+    for (source_id, matching_id), merged_state, inventory_record in zip(
+            pairs, merged_states, new_inventory):
+        pair_views = sorted(views[source_id] + views[matching_id])
+        pair_label_ids = set()
+        pair_paired_view_ids = set()
+        for view_id, _, inventory_id in pair_views:
+            pair_label_ids.update(labels[inventory_id])
+            pair_paired_view_ids.update(paired_view_ids[view_id])
+
+        new_labels.extend(_labels(models, inventory_record.pk, sorted(pair_label_ids)))
+        new_views.append(models.view(cycle_id=pair_views[0][1], state_id=merged_state.pk, **{
+            '{}_id'.format(models.name): inventory_record.pk
+        }))
+        paired.append(pair_paired_view_ids)
+
+    models.label.objects.bulk_create(new_labels)
+    models.view.objects.bulk_create(new_views)
+    TaxLotProperty.objects.bulk_create([
+        pairing
+        for new_view, pair_paired_view_ids in zip(new_views, paired)
+        for pairing in _pairings(models, new_view.cycle_id, new_view.pk, pair_paired_view_ids)
+    ])
+
+    _invalidate_caches(models, [new_view.cycle_id for new_view in new_views])
+    return [new_view.pk for new_view in new_views]
+
+
+def _clone_inventory(models, old_view):
+    """Copy the inventory record of a view along with its labels"""
+    old_inventory = getattr(old_view, models.name)
+    label_ids = list(old_inventory.labels.all().values_list('id', flat=True))
+    new_inventory = old_inventory
+    new_inventory.id = None
+    new_inventory.save()
+
+    models.label.objects.bulk_create(_labels(models, new_inventory.id, label_ids))
+    return new_inventory
+
+
+def _unmatched_merge_state(audit_log):
+    if audit_log.name in ['Import Creation', 'Manual Edit'] and \
+            audit_log.import_filename is not None:
+        # State belongs to a new record
+        return MERGE_STATE_NEW
+    return MERGE_STATE_MERGED
+
+
+def unmatch_state(inventory_type, source_state_id, coparent_id):
+    """
+    Split a state from the state it was merged with. The pair needs to be validated with
+    validate_unmatches (or has_coparent of the import files) first.
+
+    :param inventory_type: string, either properties | taxlots
+    :param source_state_id: int, id of the state to split off
+    :param coparent_id: int, id of the state that it was merged with
+    :return: list, ids of the views to refresh
+    """
+    models = inventory_models(inventory_type)
+
+    state1 = models.state.objects.get(id=coparent_id)
+    state2 = models.state.objects.get(id=source_state_id)
+
+    merged_record = models.audit_log.objects.select_related('state', 'parent1', 'parent2').get(
+        parent_state1__in=[state1, state2],
+        parent_state2__in=[state1, state2]
+    )
+
+    # Ensure that state numbers line up with parent numbers
+    if merged_record.parent_state1_id != state1.id:
+        state1, state2 = state2, state1
+
+    merged_state = merged_record.state
+
+    # Check if we are at the end of a merge tree
+    old_view = models.view.objects.filter(state=merged_state).first()
+    if old_view is not None:
+        cycle_id = old_view.cycle_id
+        new_inventory = _clone_inventory(models, old_view)
+
+        # Create the views
+        new_view1 = models.view(cycle_id=cycle_id, state=state1, **{
+            '{}_id'.format(models.name): new_inventory.id
+        })
+        new_view2 = models.view(cycle_id=cycle_id, state=state2, **{
+            '{}_id'.format(models.name): getattr(old_view, '{}_id'.format(models.name))
+        })
+
+        # Mark the merged state as deleted
+        merged_state.merge_state = MERGE_STATE_DELETE
+        merged_state.save()
+
+        # Change the merge_state of the individual states
+        state1.merge_state = _unmatched_merge_state(merged_record.parent1)
+        state2.merge_state = _unmatched_merge_state(merged_record.parent2)
+        state1.save()
+        state2.save()
+
+        # Delete the audit log entry for the merge
+        merged_record.delete()
+
+        # Duplicate pairing
+        paired_view_ids = _paired_view_ids(models, [old_view.id])[old_view.id]
+
+        old_view.delete()
+        new_view1.save()
+        new_view2.save()
+
+        TaxLotProperty.objects.bulk_create(
+            _pairings(models, cycle_id, new_view1.id, paired_view_ids) +
+            _pairings(models, cycle_id, new_view2.id, paired_view_ids)
+        )
+
+        return [new_view1.id, new_view2.id]
+
+    # We are somewhere in the middle of a merge tree
+    # Climb the tree and find the final merge state
+    current_merged_record = merged_record
+    while True:
+        record = models.audit_log.objects.filter(
+            Q(parent1_id=current_merged_record.id) | Q(parent2_id=current_merged_record.id)
+        ).first()
+        if record is None:
+            break
+        current_merged_record = record
+    final_merged_state = current_merged_record.state
+
+    old_view = models.view.objects.get(state=final_merged_state)
+    cycle_id = old_view.cycle_id
+    new_inventory = _clone_inventory(models, old_view)
+
+    # Create the view
+    new_view = models.view(cycle_id=cycle_id, state_id=source_state_id, **{
+        '{}_id'.format(models.name): new_inventory.id
+    })
+
+    # Change the merge_state of the individual states
+    state1.merge_state = _unmatched_merge_state(merged_record.parent1)
+    state2.merge_state = _unmatched_merge_state(merged_record.parent2)
+    state1.save()
+    state2.save()
+
+    # Remove the parent from the original merge state record and make sure only parent1 is
+    # populated
+    if merged_record.parent_state1_id == source_state_id:
+        merged_record.parent_state1_id = merged_record.parent_state2_id
+        merged_record.parent1_id = merged_record.parent2_id
+    merged_record.parent_state2_id = None
+    merged_record.parent2_id = None
+    # rebuild the lineage from the remaining parent
+    merged_record.ancestor_ids = None
+    merged_record.save()
+
+    # Duplicate pairing
+    paired_view_ids = _paired_view_ids(models, [old_view.id])[old_view.id]
+
+    new_view.save()
+
+    TaxLotProperty.objects.bulk_create(_pairings(models, cycle_id, new_view.id, paired_view_ids))
+
+    return [new_view.id, old_view.id]
@@ -12,6 +12,7 @@ import copy
 import datetime
 import hashlib
 import operator
+import tempfile
 import traceback
 from _csv import Error
 from collections import namedtuple
@@ -21,18 +22,27 @@ from itertools import chain
 from celery import chord
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.utils import timezone
 from unidecode import unidecode
 
+from seed.data_importer.match import (
+    match_states,
+    unmatch_state,
+    validate_matches,
+    validate_unmatches,
+)
 from seed.data_importer.models import (
     ImportFile,
     ImportRecord,
     STATUS_READY_TO_MERGE,
 )
-from seed.decorators import get_prog_key
+from seed.decorators import _get_lock_key, get_prog_key
 from seed.decorators import lock_and_track
 from seed.green_button import xml_importer
 from seed.lib.mappings.mapping_data import MappingData
@@ -65,13 +75,23 @@ from seed.models import TaxLotAuditLog
 from seed.models import TaxLotProperty
 from seed.models.auditlog import AUDIT_IMPORT
 from seed.models.data_quality import DataQualityCheck
+from seed.models.inventory_rows import refresh_inventory_rows
+from seed.serializers.celery import CeleryDatetimeSerializer
 from seed.utils.buildings import get_source_type
-from seed.utils.cache import set_cache, increment_cache, get_cache, delete_cache, get_cache_raw
+from seed.utils.cache import (
+    set_cache, increment_cache, get_cache, delete_cache, get_cache_raw, get_lock, lock_cache,
+    unlock_cache
+)
 
 _log = get_task_logger(__name__)
 
 STR_TO_CLASS = {'TaxLotState': TaxLotState, 'PropertyState': PropertyState}
 
+# Number of pairs that bulk_match merges with each set of bulk inserts
+BULK_MATCH_CHUNK_SIZE = 100
+# Seconds until the lock of a bulk match expires, e.g. if the worker died
+BULK_MATCH_LOCK_TIMEOUT = 60 * 60
+
 
 def get_cache_increment_value(chunk):
     denom = len(chunk) or 1
@@ -593,20 +613,13 @@ def map_data(import_file_id, remap=False, mark_as_done=True):
     return {'status': 'success', 'progress': 100, 'progress_key': prog_key}
 
 
-@shared_task
-def _save_raw_data_chunk(chunk, file_pk, prog_key, increment):
+def _save_raw_rows(chunk, import_file):
     """
-    Save the raw data to the database
+    Save the raw rows of an import file as PropertyStates
 
-    :param chunk: list, ids to process
-    :param file_pk: ImportFile Primary Key
-    :param prog_key: string, Progress Key to append progress
-    :param increment: Float, Value by which to increment the progress
-    :return: Bool, Always true
+    :param chunk: list, row dicts
+    :param import_file: ImportFile
     """
-
-    import_file = ImportFile.objects.get(pk=file_pk)
-
     # Save our "column headers" and sample rows for F/E.
     source_type = get_source_type(import_file)
     for c in chunk:
@@ -637,6 +650,22 @@ def _save_raw_data_chunk(chunk, file_pk, prog_key, increment):
 
         raw_property.save()
 
+
+@shared_task
+def _save_raw_data_chunk(chunk, file_pk, prog_key, increment):
+    """
+    Save the raw data to the database
+
+    :param chunk: list, ids to process
+    :param file_pk: ImportFile Primary Key
+    :param prog_key: string, Progress Key to append progress
+    :param increment: Float, Value by which to increment the progress
+    :return: Bool, Always true
+    """
+
+    import_file = ImportFile.objects.get(pk=file_pk)
+    _save_raw_rows(chunk, import_file)
+
     # Indicate progress
     increment_cache(prog_key, increment)
     _log.debug('Returning from _save_raw_data_chunk')
@@ -644,14 +673,76 @@ def _save_raw_data_chunk(chunk, file_pk, prog_key, increment):
     return True
 
 
+def raw_save_claim_check_enabled():
+    """Return True if the raw rows are spooled to storage instead of sent through the broker"""
+    return getattr(settings, 'SEED_RAW_SAVE_CLAIM_CHECK', False)
+
+
+def _spool_raw_rows(file_pk, rows, chunk_size):
+    """
+    Write the rows of an import file to a spool file in the default storage, one JSON row per line.
+
+    :param file_pk: ImportFile Primary Key
+    :param rows: iterable, row dicts
+    :param chunk_size: int, number of rows per chunk
+    :return: tuple, (name of the spool file, list of (byte offset, row count) of each chunk)
+    """
+    descriptors = []
+    with tempfile.TemporaryFile() as spool:
+        for batch_chunk in batch(rows, chunk_size):
+            descriptors.append((spool.tell(), len(batch_chunk)))
+            for row in batch_chunk:
+                spool.write(CeleryDatetimeSerializer.seed_dumps(row))
+                spool.write('\n')
+        spool.seek(0)
+        name = default_storage.save(
+            'data_imports/spool/raw_rows_{}.jsonl'.format(file_pk), File(spool)
+        )
+    return name, descriptors
+
+
+def _read_spooled_rows(spool_name, offset, count):
+    """Read count rows starting at the byte offset of a spool file"""
+    with default_storage.open(spool_name, 'rb') as spool:
+        spool.seek(offset)
+        return [CeleryDatetimeSerializer.seed_loads(spool.readline()) for _ in range(count)]
+
+
+@shared_task
+def _save_raw_data_spooled_chunk(spool_name, offset, count, file_pk, prog_key, increment):
+    """
+    Save a chunk of the raw data from the spool file to the database
+
+    :param spool_name: string, name of the spool file in the default storage
+    :param offset: int, byte offset of the first row of the chunk
+    :param count: int, number of rows in the chunk
+    :param file_pk: ImportFile Primary Key
+    :param prog_key: string, Progress Key to append progress
+    :param increment: Float, Value by which to increment the progress
+    :return: Bool, Always true
+    """
+    import_file = ImportFile.objects.get(pk=file_pk)
+    _save_raw_rows(_read_spooled_rows(spool_name, offset, count), import_file)
+
+    # Indicate progress
+    increment_cache(prog_key, increment)
+    _log.debug('Returning from _save_raw_data_spooled_chunk')
+
+    return True
+
+
 @shared_task
-def finish_raw_save(file_pk):
+def finish_raw_save(file_pk, spool_name=None):
     """
     Finish importing the raw file.
 
     :param file_pk: ID of the file that was being imported
+    :param spool_name: string, name of the spool file of the rows to delete, if any
     :return: results: results from the other tasks before the chord ran
     """
+    if spool_name:
+        default_storage.delete(spool_name)
+
     import_file = ImportFile.objects.get(pk=file_pk)
     import_file.raw_save_done = True
     import_file.save()
@@ -761,13 +852,27 @@ def _save_raw_data(file_pk, *args, **kwargs):
         import_file.num_rows = 0
         import_file.num_columns = parser.num_columns()
 
-        chunks = []
-        for batch_chunk in batch(rows, 100):
-            import_file.num_rows += len(batch_chunk)
-            chunks.append(batch_chunk)
-        increment = get_cache_increment_value(chunks)
-        tasks = [_save_raw_data_chunk.s(chunk, file_pk, prog_key, increment)
-                 for chunk in chunks]
+        spool_name = None
+        if raw_save_claim_check_enabled():
+            # only send the location of each chunk through the broker, the workers read the rows
+            # from the spool file
+            spool_name, descriptors = _spool_raw_rows(file_pk, rows, 100)
+            import_file.num_rows = sum(count for _, count in descriptors)
+            increment = get_cache_increment_value(descriptors)
+            tasks = [
+                _save_raw_data_spooled_chunk.s(
+                    spool_name, offset, count, file_pk, prog_key, increment
+                )
+                for offset, count in descriptors
+            ]
+        else:
+            chunks = []
+            for batch_chunk in batch(rows, 100):
+                import_file.num_rows += len(batch_chunk)
+                chunks.append(batch_chunk)
+            increment = get_cache_increment_value(chunks)
+            tasks = [_save_raw_data_chunk.s(chunk, file_pk, prog_key, increment)
+                     for chunk in chunks]
 
         _log.debug('Appended all tasks')
         import_file.save()
@@ -775,10 +880,12 @@ def _save_raw_data(file_pk, *args, **kwargs):
 
         if tasks:
             _log.debug('Adding chord to queue')
-            chord(tasks, interval=15)(finish_raw_save.si(file_pk))
+            chord(tasks, interval=15)(finish_raw_save.si(file_pk, spool_name))
         else:
             _log.debug('Skipped chord')
             finish_raw_save.s(file_pk)
+            if spool_name:
+                default_storage.delete(spool_name)
 
         _log.debug('Finished raw save tasks')
         result = get_cache(prog_key)
@@ -869,6 +976,135 @@ def match_buildings(file_pk):
     }
 
 
+def bulk_match(file_pk, organization_id, inventory_type, matches, unmatches):
+    """
+    Kicks off the matching and unmatching of many pairs of states, returns the progress key.
+    The errors of the pairs that could not be matched or unmatched are in the data of the
+    progress once the task is done.
+
+    :param file_pk: ImportFile Primary Key
+    :param organization_id: int, organization of the states
+    :param inventory_type: string, either properties | taxlots
+    :param matches: list of {'state_id': int, 'matching_state_id': int}
+    :param unmatches: list of {'state_id': int, 'coparent_id': int}
+    :return: dict
+    """
+    prog_key = get_prog_key('bulk_match', file_pk)
+    result = {
+        'status': 'success',
+        'progress': 0,
+        'progress_key': prog_key
+    }
+    set_cache(prog_key, result['status'], result)
+
+    _bulk_match.delay(file_pk, organization_id, inventory_type, matches, unmatches)
+    return result
+
+
+def _bulk_match_pairs(pairs, fn, errors, error_key):
+    """
+    Run fn on the pairs in one transaction, or on each pair in its own transaction to find the
+    pairs that fail if the batch does. Returns the ids of the views to refresh.
+    """
+    try:
+        with transaction.atomic():
+            return fn(pairs)
+    except Exception:
+        if len(pairs) == 1:
+            _log.exception('Could not match or unmatch {}'.format(pairs[0]))
+            source_id, other_id = pairs[0]
+            errors.append({
+                'state_id': source_id,
+                error_key: other_id,
+                'message': traceback.format_exc().splitlines()[-1],
+            })
+            return []
+
+    view_ids = []
+    for pair in pairs:
+        view_ids.extend(_bulk_match_pairs([pair], fn, errors, error_key))
+    return view_ids
+
+
+@shared_task
+def _bulk_match(file_pk, organization_id, inventory_type, matches, unmatches):
+    """
+    Matches and unmatches the pairs of states. The pairs are processed in order in a single task,
+    and the merge trees are shared by all of the import files of an organization, so only one
+    task at a time runs per organization and inventory type. A task that cannot get the lock sets
+    an error status on its progress key.
+
+    :param file_pk: ImportFile Primary Key
+    :return: dict
+    """
+    prog_key = get_prog_key('bulk_match', file_pk)
+    lock_key = _get_lock_key('bulk_match', '{}:{}'.format(organization_id, inventory_type))
+    if get_lock(lock_key):
+        result = {
+            'status': 'error',
+            'progress': 100,
+            'progress_key': prog_key,
+            'message': 'Another match of the {} of the organization is in progress'.format(
+                inventory_type),
+        }
+        set_cache(prog_key, result['status'], result)
+        return result
+
+    lock_cache(lock_key, BULK_MATCH_LOCK_TIMEOUT)
+    try:
+        return _bulk_match_states(prog_key, organization_id, inventory_type, matches, unmatches)
+    finally:
+        unlock_cache(lock_key)
+
+
+def _bulk_match_states(prog_key, organization_id, inventory_type, matches, unmatches):
+    match_pairs, errors = validate_matches(inventory_type, organization_id, matches)
+    unmatch_pairs, unmatch_errors = validate_unmatches(inventory_type, organization_id, unmatches)
+    errors.extend(unmatch_errors)
+
+    total = len(match_pairs) + len(unmatch_pairs)
+    view_ids = []
+    match_failures = []
+    unmatch_failures = []
+    for pairs in batch(match_pairs, BULK_MATCH_CHUNK_SIZE):
+        view_ids.extend(_bulk_match_pairs(
+            pairs,
+            lambda p: match_states(inventory_type, organization_id, p),
+            match_failures,
+            'matching_state_id'
+        ))
+        increment_cache(prog_key, 100.0 * len(pairs) / total)
+
+    # each unmatch climbs its merge tree, they are not batched
+    for pairs in batch(unmatch_pairs, BULK_MATCH_CHUNK_SIZE):
+        for pair in pairs:
+            view_ids.extend(_bulk_match_pairs(
+                [pair],
+                lambda p: unmatch_state(inventory_type, p[0][0], p[0][1]),
+                unmatch_failures,
+                'coparent_id'
+            ))
+        increment_cache(prog_key, 100.0 * len(pairs) / total)
+
+    if inventory_type == 'properties':
+        refresh_inventory_rows(property_view_ids=view_ids)
+    else:
+        refresh_inventory_rows(taxlot_view_ids=view_ids)
+
+    result = {
+        'status': 'success',
+        'progress': 100,
+        'progress_key': prog_key,
+        'data': {
+            'matched': len(match_pairs) - len(match_failures),
+            'unmatched': len(unmatch_pairs) - len(unmatch_failures),
+            'errors': errors + match_failures + unmatch_failures,
+        }
+    }
+    set_cache(prog_key, result['status'], result)
+    return result
+
+
 def _finish_matching(import_file, progress_key, data):
     import_file.matching_done = True
     import_file.mapping_completion = 100
@@ -1440,6 +1676,10 @@ def _match_properties_and_taxlots(file_pk):
         # state.merge_state = MERGE_STATE_DUPLICATE
         state.save()
 
+    # Bring the denormalized inventory rows up to date with the views that were created or merged
+    refresh_inventory_rows(property_view_ids=[v.pk for v in merged_property_views],
+                           taxlot_view_ids=[v.pk for v in merged_taxlot_views])
+
     data = {
         'all_unmatched_properties': len(all_unmatched_properties),
         'all_unmatched_tax_lots': len(all_unmatched_tax_lots),
@@ -1593,9 +1833,7 @@ def pair_new_states(merged_property_views, merged_taxlot_views):
     cycle = view.cycle
     org = view.state.organization
 
-    global taxlot_m2m_keygen
-    global property_m2m_keygen
-
+    # the partitioners are local to the call, the workers run many tasks in the same process
     taxlot_m2m_keygen = EquivalencePartitioner(tax_cmp_fmt, ["jurisdiction_tax_lot_id"])
     property_m2m_keygen = EquivalencePartitioner(prop_cmp_fmt,
                                                  ["pm_property_id", "jurisdiction_property_id"])
@@ -13,7 +13,9 @@ import os.path as osp
 import datetime
 from dateutil import parser
 from django.core.files import File
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.utils import timezone
 from mock import patch
 
@@ -85,6 +87,23 @@ class TestMappingPortfolioData(DataMappingBaseTestCase):
         self.assertDictEqual(raw_saved.extra_data, self.fake_extra_data)
         self.assertEqual(raw_saved.organization, self.org)
 
+    @override_settings(SEED_RAW_SAVE_CLAIM_CHECK=True)
+    def test_save_raw_data_claim_check(self):
+        """Rows spooled to storage are saved the same as rows sent to the workers."""
+        with patch.object(ImportFile, 'cache_first_rows', return_value=None):
+            tasks._save_raw_data(self.import_file.pk, 'fake_cache_key', 1)
+
+        import_file = ImportFile.objects.get(pk=self.import_file.pk)
+        raw_saved = PropertyState.objects.filter(import_file=import_file)
+        self.assertEqual(raw_saved.count(), import_file.num_rows)
+        self.assertDictEqual(raw_saved.latest('id').extra_data, self.fake_extra_data)
+        self.assertTrue(import_file.raw_save_done)
+
+        # the spool file is removed once the rows are saved
+        self.assertFalse(default_storage.exists(
+            'data_imports/spool/raw_rows_{}.jsonl'.format(import_file.pk)
+        ))
+
     def test_map_data(self):
         """Save mappings based on user specifications."""
         # Create new import file to test
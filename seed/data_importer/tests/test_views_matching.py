@@ -18,6 +18,7 @@ from seed.data_importer.tests.util import (
     FAKE_MAPPINGS,
 )
 from seed.data_importer.views import ImportFileViewSet
+from seed.decorators import _get_lock_key
 from seed.models import (
     Column,
     PropertyState,
@@ -29,6 +30,7 @@ from seed.models import (
     MERGE_STATE_UNKNOWN,
     MERGE_STATE_NEW,
 )
+from seed.utils.cache import get_cache, lock_cache, unlock_cache
 
 _log = logging.getLogger(__name__)
 
@@ -186,6 +188,50 @@ class TestViewsMatching(DataMappingBaseTestCase):
         }
         self.assertDictContainsSubset(expected, coparents)
 
+    def test_get_coparents_batch(self):
+        property_states = PropertyState.objects.filter(
+            import_file_id=self.import_file_2,
+            data_state__in=[DATA_STATE_MAPPING, DATA_STATE_MATCHING],
+            merge_state__in=[MERGE_STATE_UNKNOWN, MERGE_STATE_NEW]
+        )
+
+        vs = ImportFileViewSet()
+        coparents = vs.get_coparents([p.id for p in property_states], 'properties')
+        self.assertTrue(coparents)
+        for state in property_states:
+            coparent = vs.has_coparent(state.id, 'properties')
+            if coparent:
+                self.assertEqual(coparents[state.id], coparent)
+            else:
+                self.assertNotIn(state.id, coparents)
+
+    def test_get_filtered_mapping_results_paginated(self):
+        url = reverse("api:v2:import_files-filtered-mapping-results", args=[self.import_file_2.pk])
+        resp = self.client.post(
+            url, data=json.dumps({"get_coparents": True, "page": 2, "per_page": 5}),
+            content_type='application/json'
+        )
+
+        body = json.loads(resp.content)
+        self.assertEqual(body['status'], 'success')
+        self.assertEqual(len(body['properties']), 5)
+        self.assertEqual(len(body['tax_lots']), 5)
+        self.assertEqual(body['pagination']['properties']['page'], 2)
+        self.assertEqual(body['pagination']['properties']['total'], 14)
+        self.assertEqual(body['pagination']['tax_lots']['total'], 12)
+        self.assertTrue(all('matched' in p for p in body['properties']))
+
+        # the page size is clamped to at least one state, invalid page sizes are rejected
+        resp = self.client.post(
+            url, data=json.dumps({"page": 1, "per_page": 0}), content_type='application/json'
+        )
+        self.assertEqual(len(json.loads(resp.content)['properties']), 1)
+
+        resp = self.client.post(
+            url, data=json.dumps({"page": 1, "per_page": "abc"}), content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 400)
+
     def test_unmatch(self):
         # unmatch a specific entry
         property_state = PropertyState.objects.filter(
@@ -219,3 +265,66 @@ class TestViewsMatching(DataMappingBaseTestCase):
 
         # verify that the coparent id is now in the view
         self.assertTrue(prop.exists())
+
+    def test_bulk_match(self):
+        property_state = PropertyState.objects.filter(
+            use_description='Club',
+            import_file_id=self.import_file_2,
+            data_state__in=[DATA_STATE_MAPPING, DATA_STATE_MATCHING],
+            merge_state__in=[MERGE_STATE_UNKNOWN, MERGE_STATE_NEW]
+        ).first()
+
+        vs = ImportFileViewSet()
+        coparent_id = vs.has_coparent(property_state.id, 'properties', ['id'])['id']
+
+        url = reverse("api:v2:import_files-bulk-match", args=[self.import_file_2.pk])
+        url += '?organization_id={}'.format(self.org.pk)
+        data = {
+            'inventory_type': 'properties',
+            'unmatches': [
+                {'state_id': property_state.id, 'coparent_id': coparent_id},
+                {'state_id': property_state.id + 100000, 'coparent_id': coparent_id},
+            ]
+        }
+        resp = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        body = json.loads(resp.content)
+        self.assertEqual(body['status'], 'success')
+
+        result = get_cache(body['progress_key'])
+        self.assertEqual(result['progress'], 100)
+        self.assertEqual(result['data']['unmatched'], 1)
+        self.assertEqual(len(result['data']['errors']), 1)
+        self.assertEqual(result['data']['errors'][0]['message'], 'State does not exist')
+        self.assertFalse(vs.has_coparent(property_state.id, 'properties'))
+        self.assertTrue(PropertyView.objects.filter(state_id=coparent_id).exists())
+
+        # match the states again
+        data = {
+            'inventory_type': 'properties',
+            'matches': [{'state_id': property_state.id, 'matching_state_id': coparent_id}]
+        }
+        resp = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        body = json.loads(resp.content)
+
+        result = get_cache(body['progress_key'])
+        self.assertEqual(result['data']['matched'], 1)
+        self.assertEqual(result['data']['errors'], [])
+        self.assertFalse(
+            PropertyView.objects.filter(state_id__in=[property_state.id, coparent_id]).exists()
+        )
+        merge = PropertyAuditLog.objects.get(
+            parent_state1_id=coparent_id, parent_state2_id=property_state.id, name='Manual Match'
+        )
+        self.assertTrue(PropertyView.objects.filter(state_id=merge.state_id).exists())
+        self.assertTrue(merge.ancestor_ids)
+
+        # only one bulk match of the organization's properties runs at a time
+        lock_key = _get_lock_key('bulk_match', '{}:properties'.format(self.org.pk))
+        lock_cache(lock_key)
+        try:
+            resp = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        finally:
+            unlock_cache(lock_key)
+        result = get_cache(json.loads(resp.content)['progress_key'])
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(result['progress'], 100)
@@ -11,14 +11,12 @@ import json
 import logging
 import os
 
-from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.core.files.storage import FileSystemStorage
 from django.core.urlresolvers import reverse
-from django.db.models import Q
 from django.http import HttpResponse, JsonResponse
 from django.utils.timezone import make_naive
 from rest_framework import serializers, status, viewsets
@@ -31,8 +29,10 @@ from seed.data_importer.models import (
     ImportFile,
     ImportRecord
 )
+from seed.data_importer.match import match_states, unmatch_state
 from seed.data_importer.models import ROW_DELIMITER
 from seed.data_importer.tasks import (
+    bulk_match,
     map_data,
     match_buildings,
     save_raw_data as task_save_raw
@@ -43,7 +43,6 @@ from seed.lib.mappings import mapper as simple_mapper
 from seed.lib.mappings import mapping_data
 from seed.lib.mappings.mapping_data import MappingData
 from seed.lib.mcm import mapper
-from seed.lib.merging import merging
 from seed.lib.superperms.orgs.decorators import has_perm_class
 from seed.lib.superperms.orgs.models import OrganizationUser
 from seed.lib.superperms.orgs.permissions import SEEDOrgPermissions
@@ -59,24 +58,25 @@ from seed.models import (
     MERGE_STATE_UNKNOWN,
     MERGE_STATE_NEW,
     MERGE_STATE_MERGED,
-    MERGE_STATE_DELETE,
     Cycle,
     Column,
     PropertyAuditLog,
     TaxLotAuditLog,
     PropertyView,
     TaxLotView,
-    AUDIT_IMPORT,
-    AUDIT_USER_EDIT,
-    Property,
-    TaxLot,
-    TaxLotProperty)
+    AUDIT_USER_EDIT)
 from seed.models.data_quality import DataQualityCheck
+from seed.models.inventory_rows import refresh_inventory_rows
 from seed.utils.api import api_endpoint, api_endpoint_class
 from seed.utils.cache import get_cache_raw, get_cache
+from seed.utils.pagination import paginate_views, parse_page_size
 
 _log = logging.getLogger(__name__)
 
+# Number of states per page of the mapping results, and the most that can be requested
+MAPPING_RESULTS_PER_PAGE = 100
+MAPPING_RESULTS_MAX_PER_PAGE = 1000
+
 
 @api_endpoint
 @ajax_request
@@ -523,6 +523,8 @@ class ImportFileViewSet(viewsets.ViewSet):
     def filtered_mapping_results(self, request, pk=None):
         """
         Retrieves a paginated list of Properties and Tax Lots for an import file after mapping.
+        The states are paginated if `page` or `per_page` is passed in the body, in which case
+        the coparents are only resolved for the states of the page.
         ---
         parameter_strategy: replace
         parameters:
@@ -531,6 +533,16 @@ class ImportFileViewSet(viewsets.ViewSet):
               type: integer
               required: true
               paramType: path
+            - name: page
+              description: Page to return
+              type: integer
+              required: false
+              paramType: body
+            - name: per_page
+              description: Number of Properties and of Tax Lots per page (defaults to 100, max 1000)
+              type: integer
+              required: false
+              paramType: body
         response_serializer: MappingResultsResponseSerializer
         """
         import_file_id = pk
@@ -593,29 +605,47 @@ class ImportFileViewSet(viewsets.ViewSet):
                 'status': 'success'
             }
 
+            page = request.data.get('page')
+            paginated = page is not None or request.data.get('per_page') is not None
+            try:
+                per_page = parse_page_size(
+                    request.data.get('per_page'), MAPPING_RESULTS_PER_PAGE,
+                    MAPPING_RESULTS_MAX_PER_PAGE
+                )
+            except (TypeError, ValueError):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'per_page must be an integer'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            def paginate(states, key):
+                if not paginated:
+                    return list(states)
+                states, pagination = paginate_views(
+                    states, {'page': page or 1, 'per_page': per_page}
+                )
+                result.setdefault('pagination', {})[key] = pagination
+                return list(states)
+
             if inventory_type == 'properties' or inventory_type == 'all':
-                properties = list(PropertyState.objects.filter(
+                # If a record was manually edited then remove the edited version
+                properties = PropertyState.objects.filter(
                     import_file_id=import_file_id,
                     data_state__in=[DATA_STATE_MAPPING, DATA_STATE_MATCHING],
                     merge_state__in=[MERGE_STATE_UNKNOWN, MERGE_STATE_NEW]
-                ).order_by('id').values(*fields['PropertyState']))
-
-                # If a record was manually edited then remove the edited version
-                properties_to_remove = list(
-                    PropertyAuditLog.objects.filter(state_id__in=[p['id'] for p in properties],
-                                                    name='Manual Edit').values_list('state_id',
-                                                                                    flat=True)
-                )
-                properties = [p for p in properties if p['id'] not in properties_to_remove]
+                ).exclude(
+                    id__in=PropertyAuditLog.objects.filter(
+                        state__import_file_id=import_file_id, name='Manual Edit'
+                    ).values('state_id')
+                ).order_by('id').values(*fields['PropertyState'])
+                properties = paginate(properties, 'properties')
 
                 if get_coparents:
+                    coparents = self.get_coparents([p['id'] for p in properties], 'properties')
                     for state in properties:
-                        state['matched'] = False
-                        coparent = self.has_coparent(state['id'], 'properties',
-                                                     fields['PropertyState'])
-                        if coparent:
-                            state['matched'] = True
-                            state['coparent'] = coparent
+                        state['matched'] = state['id'] in coparents
+                        if state['matched']:
+                            state['coparent'] = coparents[state['id']]
 
                 _log.debug('Found {} properties'.format(len(properties)))
 
@@ -635,27 +665,24 @@ class ImportFileViewSet(viewsets.ViewSet):
                 result['properties'] = properties
 
             if inventory_type == 'taxlots' or inventory_type == 'all':
-                tax_lots = list(TaxLotState.objects.filter(
+                # If a record was manually edited then remove the edited version
+                tax_lots = TaxLotState.objects.filter(
                     import_file_id=import_file_id,
                     data_state__in=[DATA_STATE_MAPPING, DATA_STATE_MATCHING],
                     merge_state__in=[MERGE_STATE_UNKNOWN, MERGE_STATE_NEW]
-                ).order_by('id').values(*fields['TaxLotState']))
-
-                # If a record was manually edited then remove the edited version
-                taxlots_to_remove = list(
-                    TaxLotAuditLog.objects.filter(state_id__in=[t['id'] for t in tax_lots],
-                                                  name='Manual Edit').values_list('state_id',
-                                                                                  flat=True)
-                )
-                tax_lots = [t for t in tax_lots if t['id'] not in taxlots_to_remove]
+                ).exclude(
+                    id__in=TaxLotAuditLog.objects.filter(
+                        state__import_file_id=import_file_id, name='Manual Edit'
+                    ).values('state_id')
+                ).order_by('id').values(*fields['TaxLotState'])
+                tax_lots = paginate(tax_lots, 'tax_lots')
 
                 if get_coparents:
+                    coparents = self.get_coparents([t['id'] for t in tax_lots], 'taxlots')
                     for state in tax_lots:
-                        state['matched'] = False
-                        coparent = self.has_coparent(state['id'], 'taxlots', fields['TaxLotState'])
-                        if coparent:
-                            state['matched'] = True
-                            state['coparent'] = coparent
+                        state['matched'] = state['id'] in coparents
+                        if state['matched']:
+                            state['coparent'] = coparents[state['id']]
 
                 _log.debug('Found {} tax lots'.format(len(tax_lots)))
 
@@ -800,6 +827,42 @@ class ImportFileViewSet(viewsets.ViewSet):
 
         return audit_entry[0]
 
+    @staticmethod
+    def get_coparents(state_ids, inventory_type):
+        """
+        Return the coparents of a list of state ids based on the inventory type, resolved in a
+        single query instead of calling has_coparent for each state.
+
+        :param state_ids: list, IDs of PropertyStates or TaxLotStates
+        :param inventory_type: string, either properties | taxlots
+        :return: dict, state id: coparent dict, for the states that have a coparent
+        """
+        state_model = PropertyState if inventory_type == 'properties' else TaxLotState
+
+        result = {}
+        for state_id, coparents in state_model.coparents(state_ids).items():
+            if len(coparents) > 1:
+                _log.error('More than one merge record found for state {}'.format(state_id))
+                continue
+            result[state_id] = coparents[0]
+        return result
+
+    @staticmethod
+    def merged_import_state_ids(audit_log, state_ids):
+        """
+        Return the ids of the states whose import creation audit log is the parent of a merge,
+        i.e. the states listed as new that were merged into a different record.
+
+        :param audit_log: PropertyAuditLog or TaxLotAuditLog
+        :param state_ids: list or values queryset of PropertyState or TaxLotState IDs
+        :return: set of state IDs
+        """
+        return set(audit_log.objects.exclude(record_type=AUDIT_USER_EDIT).filter(
+            parent1__state_id__in=state_ids,
+            parent1__name='Import Creation',
+            parent1__import_filename__isnull=False,
+        ).values_list('parent1__state_id', flat=True))
+
     @api_endpoint_class
     @ajax_request_class
     @detail_route(methods=['POST'])
@@ -823,248 +886,16 @@ class ImportFileViewSet(viewsets.ViewSet):
             return JsonResponse({
                 'status': 'error',
                 'message': 'Coparent ID in audit history doesn\'t match coparent_id parameter',
-                'found': coparent.id,
+                'found': coparent['id'],
                 'passed_in': coparent_id
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        if inventory_type == 'properties':
-            audit_log = PropertyAuditLog
-            label = apps.get_model('seed', 'Property_labels')
-            state = PropertyState
-            view = PropertyView
-        else:
-            audit_log = TaxLotAuditLog
-            label = apps.get_model('seed', 'TaxLot_labels')
-            state = TaxLotState
-            view = TaxLotView
-
-        state1 = state.objects.get(id=coparent['id'])
-        state2 = state.objects.get(id=source_state_id)
-
-        merged_record = audit_log.objects.select_related('state', 'parent1', 'parent2').get(
-            parent_state1__in=[state1, state2],
-            parent_state2__in=[state1, state2]
-        )
-
-        # Ensure that state numbers line up with parent numbers
-        if merged_record.parent_state1_id != state1.id:
-            state1_copy = state1
-            state1 = state2
-            state2 = state1_copy
-
-        merged_state = merged_record.state
-
-        # Check if we are at the end of a merge tree
-        if view.objects.filter(state=merged_state).exists():
-            old_view = view.objects.get(state=merged_state)
-            cycle_id = old_view.cycle_id
-
-            # Clone the property/taxlot record, then the labels
-            if inventory_type == 'properties':
-                old_inventory = old_view.property
-                label_ids = list(old_inventory.labels.all().values_list('id', flat=True))
-                new_inventory = old_inventory
-                new_inventory.id = None
-                new_inventory.save()
-
-                for label_id in label_ids:
-                    label(property_id=new_inventory.id, statuslabel_id=label_id).save()
-            else:
-                old_inventory = old_view.taxlot
-                label_ids = list(old_inventory.labels.all().values_list('id', flat=True))
-                new_inventory = old_inventory
-                new_inventory.id = None
-                new_inventory.save()
-
-                for label_id in label_ids:
-                    label(taxlot_id=new_inventory.id, tatuslabel_id=label_id).save()
-
-            # Create the views
-            if inventory_type == 'properties':
-                new_view1 = view(
-                    cycle_id=cycle_id,
-                    property_id=new_inventory.id,
-                    state=state1
-                )
-                new_view2 = view(
-                    cycle_id=cycle_id,
-                    property_id=old_view.property_id,
-                    state=state2
-                )
-            else:
-                new_view1 = view(
-                    cycle_id=cycle_id,
-                    taxlot_id=new_inventory.id,
-                    state=state1
-                )
-                new_view2 = view(
-                    cycle_id=cycle_id,
-                    taxlot_id=old_view.taxlot_id,
-                    state=state2
-                )
-
-            # Mark the merged state as deleted
-            merged_state.merge_state = MERGE_STATE_DELETE
-            merged_state.save()
-
-            # Change the merge_state of the individual states
-            if merged_record.parent1.name in ['Import Creation',
-                                              'Manual Edit'] and merged_record.parent1.import_filename is not None:
-                # State belongs to a new record
-                state1.merge_state = MERGE_STATE_NEW
-            else:
-                state1.merge_state = MERGE_STATE_MERGED
-            if merged_record.parent2.name in ['Import Creation',
-                                              'Manual Edit'] and merged_record.parent2.import_filename is not None:
-                # State belongs to a new record
-                state2.merge_state = MERGE_STATE_NEW
-            else:
-                state2.merge_state = MERGE_STATE_MERGED
-            state1.save()
-            state2.save()
-
-            # Delete the audit log entry for the merge
-            merged_record.delete()
-
-            # Duplicate pairing
-            if inventory_type == 'properties':
-                paired_view_ids = list(TaxLotProperty.objects.filter(property_view_id=old_view.id)
-                                       .order_by('taxlot_view_id').values_list('taxlot_view_id',
-                                                                               flat=True))
-            else:
-                paired_view_ids = list(TaxLotProperty.objects.filter(taxlot_view_id=old_view.id)
-                                       .order_by('property_view_id').values_list('property_view_id',
-                                                                                 flat=True))
-
-            old_view.delete()
-            new_view1.save()
-            new_view2.save()
-
-            if inventory_type == 'properties':
-                for paired_view_id in paired_view_ids:
-                    TaxLotProperty(primary=True,
-                                   cycle_id=cycle_id,
-                                   property_view_id=new_view1.id,
-                                   taxlot_view_id=paired_view_id).save()
-                    TaxLotProperty(primary=True,
-                                   cycle_id=cycle_id,
-                                   property_view_id=new_view2.id,
-                                   taxlot_view_id=paired_view_id).save()
-            else:
-                for paired_view_id in paired_view_ids:
-                    TaxLotProperty(primary=True,
-                                   cycle_id=cycle_id,
-                                   taxlot_view_id=new_view1.id,
-                                   property_view_id=paired_view_id).save()
-                    TaxLotProperty(primary=True,
-                                   cycle_id=cycle_id,
-                                   taxlot_view_id=new_view2.id,
-                                   property_view_id=paired_view_id).save()
+        new_view_ids = unmatch_state(inventory_type, source_state_id, coparent_id)
 
+        if inventory_type == 'properties':
+            refresh_inventory_rows(property_view_ids=new_view_ids)
         else:
-            # We are somewhere in the middle of a merge tree
-            # Climb the tree and find the final merge state
-            done_searching = False
-            current_merged_record = merged_record
-            while not done_searching:
-                # current_merged_record = audit_log.objects.select_related('state', 'parent1', 'parent2').filter(
-                #     parent1__in=[state1, state2],
-                #     parent_state2__in=[state1, state2]
-                # )
-                record = audit_log.objects.only('parent1_id', 'parent2_id') \
-                    .filter(
-                    Q(parent1_id=current_merged_record.id) | Q(parent2_id=current_merged_record.id))
-                if record.exists():
-                    current_merged_record = record.first()
-                else:
-                    final_merged_state = current_merged_record.state
-                    done_searching = True
-
-            old_view = view.objects.get(state=final_merged_state)
-            cycle_id = old_view.cycle_id
-
-            # Clone the property/taxlot record, then the labels
-            if inventory_type == 'properties':
-                old_inventory = old_view.property
-                label_ids = list(old_inventory.labels.all().values_list('id', flat=True))
-                new_inventory = old_inventory
-                new_inventory.id = None
-                new_inventory.save()
-
-                for label_id in label_ids:
-                    label(property_id=new_inventory.id, statuslabel_id=label_id).save()
-            else:
-                old_inventory = old_view.taxlot
-                label_ids = list(old_inventory.labels.all().values_list('id', flat=True))
-                new_inventory = old_inventory
-                new_inventory.id = None
-                new_inventory.save()
-
-                for label_id in label_ids:
-                    label(taxlot_id=new_inventory.id, statuslabel_id=label_id).save()
-
-            # Create the view
-            if inventory_type == 'properties':
-                new_view = view(
-                    cycle_id=cycle_id,
-                    property_id=new_inventory.id,
-                    state=state.objects.get(id=source_state_id)
-                )
-            else:
-                new_view = view(
-                    cycle_id=cycle_id,
-                    taxlot_id=new_inventory.id,
-                    state=state.objects.get(id=source_state_id)
-                )
-
-            # Change the merge_state of the individual states
-            if merged_record.parent1.name in ['Import Creation',
-                                              'Manual Edit'] and merged_record.parent1.import_filename is not None:
-                # State belongs to a new record
-                state1.merge_state = MERGE_STATE_NEW
-            else:
-                state1.merge_state = MERGE_STATE_MERGED
-            if merged_record.parent2.name in ['Import Creation',
-                                              'Manual Edit'] and merged_record.parent2.import_filename is not None:
-                # State belongs to a new record
-                state2.merge_state = MERGE_STATE_NEW
-            else:
-                state2.merge_state = MERGE_STATE_MERGED
-            state1.save()
-            state2.save()
-
-            # Remove the parent from the original merge state record and make sure only parent1 is populated
-            if merged_record.parent_state1_id == source_state_id:
-                merged_record.parent_state1_id = merged_record.parent_state2_id
-                merged_record.parent1_id = merged_record.parent2_id
-            merged_record.parent_state2_id = None
-            merged_record.parent2_id = None
-            merged_record.save()
-
-            # Duplicate pairing
-            if inventory_type == 'properties':
-                paired_view_ids = list(TaxLotProperty.objects.filter(property_view_id=old_view.id)
-                                       .order_by('taxlot_view_id').values_list('taxlot_view_id',
-                                                                               flat=True))
-            else:
-                paired_view_ids = list(TaxLotProperty.objects.filter(taxlot_view_id=old_view.id)
-                                       .order_by('property_view_id').values_list('property_view_id',
-                                                                                 flat=True))
-
-            new_view.save()
-
-            if inventory_type == 'properties':
-                for paired_view_id in paired_view_ids:
-                    TaxLotProperty(primary=True,
-                                   cycle_id=cycle_id,
-                                   property_view_id=new_view.id,
-                                   taxlot_view_id=paired_view_id).save()
-            else:
-                for paired_view_id in paired_view_ids:
-                    TaxLotProperty(primary=True,
-                                   cycle_id=cycle_id,
-                                   taxlot_view_id=new_view.id,
-                                   property_view_id=paired_view_id).save()
+            refresh_inventory_rows(taxlot_view_ids=new_view_ids)
 
         return {
             'status': 'success'
@@ -1090,112 +921,77 @@ class ImportFileViewSet(viewsets.ViewSet):
                 'message': 'Source state is already matched'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        if inventory_type == 'properties':
-            audit_log = PropertyAuditLog
-            inventory = Property
-            label = apps.get_model('seed', 'Property_labels')
-            state = PropertyState
-            view = PropertyView
-        else:
-            audit_log = TaxLotAuditLog
-            inventory = TaxLot
-            label = apps.get_model('seed', 'TaxLot_labels')
-            state = TaxLotState
-            view = TaxLotView
-
-        state1 = state.objects.get(id=matching_state_id)
-        state2 = state.objects.get(id=source_state_id)
-
-        merged_state = state.objects.create(organization_id=organization_id)
-        merged_state, changes = merging.merge_state(merged_state,
-                                                    state1,
-                                                    state2,
-                                                    merging.get_state_attrs([state1, state2]),
-                                                    default=state2)
-
-        state_1_audit_log = audit_log.objects.filter(state=state1).first()
-        state_2_audit_log = audit_log.objects.filter(state=state2).first()
-
-        audit_log.objects.create(organization=state1.organization,
-                                 parent1=state_1_audit_log,
-                                 parent2=state_2_audit_log,
-                                 parent_state1=state1,
-                                 parent_state2=state2,
-                                 state=merged_state,
-                                 name='Manual Match',
-                                 description='Automatic Merge',
-                                 import_filename=None,
-                                 record_type=AUDIT_IMPORT)
-
-        # Set the merged_state to merged
-        merged_state.data_state = DATA_STATE_MATCHING
-        merged_state.merge_state = MERGE_STATE_MERGED
-        merged_state.save()
-        state2.merge_state = MERGE_STATE_UNKNOWN
-        state2.save()
-
-        # Delete existing views and inventory records
-        views = view.objects.filter(state_id__in=[source_state_id, matching_state_id])
-        view_ids = list(views.values_list('id', flat=True))
-        cycle_id = views.first().cycle_id
-        label_ids = []
-        # Get paired view ids
-        if inventory_type == 'properties':
-            paired_view_ids = list(TaxLotProperty.objects.filter(property_view_id__in=view_ids)
-                                   .order_by('taxlot_view_id').distinct('taxlot_view_id')
-                                   .values_list('taxlot_view_id', flat=True))
-        else:
-            paired_view_ids = list(TaxLotProperty.objects.filter(taxlot_view_id__in=view_ids)
-                                   .order_by('property_view_id').distinct('property_view_id')
-                                   .values_list('property_view_id', flat=True))
-        for v in views:
-            if inventory_type == 'properties':
-                label_ids.extend(list(v.property.labels.all().values_list('id', flat=True)))
-                v.property.delete()
-            else:
-                label_ids.extend(list(v.taxlot.labels.all().values_list('id', flat=True)))
-                v.taxlot.delete()
-        label_ids = list(set(label_ids))
-
-        # Create new inventory record
-        inventory_record = inventory(organization_id=organization_id)
-        inventory_record.save()
-
-        # Create new labels and view
-        if inventory_type == 'properties':
-            for label_id in label_ids:
-                label(property_id=inventory_record.id, statuslabel_id=label_id).save()
-            new_view = view(cycle_id=cycle_id, state_id=merged_state.id,
-                            property_id=inventory_record.id)
-        else:
-            for label_id in label_ids:
-                label(taxlot_id=inventory_record.id, statuslabel_id=label_id).save()
-            new_view = view(cycle_id=cycle_id, state_id=merged_state.id,
-                            taxlot_id=inventory_record.id)
-        new_view.save()
+        new_view_ids = match_states(
+            inventory_type, organization_id, [(source_state_id, matching_state_id)]
+        )
 
-        # Delete existing pairs and re-pair all to new view
         if inventory_type == 'properties':
-            # Probably already deleted by cascade
-            TaxLotProperty.objects.filter(property_view_id__in=view_ids).delete()
-            for paired_view_id in paired_view_ids:
-                TaxLotProperty(primary=True,
-                               cycle_id=cycle_id,
-                               property_view_id=new_view.id,
-                               taxlot_view_id=paired_view_id).save()
+            refresh_inventory_rows(property_view_ids=new_view_ids)
         else:
-            # Probably already deleted by cascade
-            TaxLotProperty.objects.filter(taxlot_view_id__in=view_ids).delete()
-            for paired_view_id in paired_view_ids:
-                TaxLotProperty(primary=True,
-                               cycle_id=cycle_id,
-                               property_view_id=paired_view_id,
-                               taxlot_view_id=new_view.id).save()
+            refresh_inventory_rows(taxlot_view_ids=new_view_ids)
 
         return {
             'status': 'success'
         }
 
+    @api_endpoint_class
+    @ajax_request_class
+    @has_perm_class('can_modify_data')
+    @detail_route(methods=['POST'])
+    def bulk_match(self, request, pk=None):
+        """
+        Starts a background task to match and unmatch many pairs of states at once. The pairs
+        that cannot be matched or unmatched are listed with an error message in the data of the
+        progress once the task is done.
+        ---
+        type:
+            status:
+                required: true
+                type: string
+                description: either success or error
+            progress_key:
+                type: string
+                description: ID of background job, for retrieving job progress
+        parameter_strategy: replace
+        parameters:
+            - name: pk
+              description: Import file ID
+              required: true
+              paramType: path
+            - name: organization_id
+              description: The organization_id for this user's organization
+              required: true
+              paramType: query
+            - name: inventory_type
+              description: either properties or taxlots
+              required: false
+              paramType: body
+            - name: matches
+              description: list of {"state_id": int, "matching_state_id": int}
+              required: false
+              paramType: body
+            - name: unmatches
+              description: list of {"state_id": int, "coparent_id": int}
+              required: false
+              paramType: body
+        """
+        body = request.data
+        inventory_type = body.get('inventory_type', 'properties')
+        matches = body.get('matches', [])
+        unmatches = body.get('unmatches', [])
+        organization_id = int(request.query_params.get('organization_id', None))
+
+        for requests in [matches, unmatches]:
+            if not isinstance(requests, list) or not all(isinstance(r, dict) for r in requests):
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'matches and unmatches must be lists of objects'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        return JsonResponse(
+            bulk_match(pk, organization_id, inventory_type, matches, unmatches)
+        )
+
     @api_endpoint_class
     @ajax_request_class
     @has_perm_class('can_modify_data')
@@ -1521,24 +1317,18 @@ class ImportFileViewSet(viewsets.ViewSet):
         ).values_list('id', flat=True))
 
         # Check audit log in case PropertyStates are listed as "new" but were merged into a different property
-        properties = list(PropertyState.objects.filter(
+        properties = PropertyState.objects.filter(
             import_file__pk=import_file_id,
             data_state=DATA_STATE_MATCHING,
             merge_state=MERGE_STATE_NEW,
-        ))
+        ).values_list('id', flat=True)
+        merged_ids = self.merged_import_state_ids(PropertyAuditLog, properties)
 
-        for state in properties:
-            audit_creation_id = PropertyAuditLog.objects.only('id').exclude(
-                import_filename=None).get(
-                state_id=state.id,
-                name='Import Creation'
-            )
-            if PropertyAuditLog.objects.exclude(record_type=AUDIT_USER_EDIT).filter(
-                parent1_id=audit_creation_id
-            ).exists():
-                properties_matched.append(state.id)
+        for state_id in properties:
+            if state_id in merged_ids:
+                properties_matched.append(state_id)
             else:
-                properties_new.append(state.id)
+                properties_new.append(state_id)
 
         tax_lots_new = []
         tax_lots_matched = list(TaxLotState.objects.only('id').filter(
@@ -1548,23 +1338,18 @@ class ImportFileViewSet(viewsets.ViewSet):
         ).values_list('id', flat=True))
 
         # Check audit log in case TaxLotStates are listed as "new" but were merged into a different tax lot
-        taxlots = list(TaxLotState.objects.filter(
+        taxlots = TaxLotState.objects.filter(
             import_file__pk=import_file_id,
             data_state=DATA_STATE_MATCHING,
             merge_state=MERGE_STATE_NEW,
-        ))
+        ).values_list('id', flat=True)
+        merged_ids = self.merged_import_state_ids(TaxLotAuditLog, taxlots)
 
-        for state in taxlots:
-            audit_creation_id = TaxLotAuditLog.objects.only('id').exclude(import_filename=None).get(
-                state_id=state.id,
-                name='Import Creation'
-            )
-            if TaxLotAuditLog.objects.exclude(record_type=AUDIT_USER_EDIT).filter(
-                parent1_id=audit_creation_id
-            ).exists():
-                tax_lots_matched.append(state.id)
+        for state_id in taxlots:
+            if state_id in merged_ids:
+                tax_lots_matched.append(state_id)
             else:
-                tax_lots_new.append(state.id)
+                tax_lots_new.append(state_id)
 
         return {
             'status': 'success',
@@ -1638,15 +1423,11 @@ class ImportFileViewSet(viewsets.ViewSet):
             ).values_list('state_id', flat=True))
             properties = [p for p in properties if p.id not in properties_to_remove]
 
+            merged_ids = self.merged_import_state_ids(
+                PropertyAuditLog, [p.id for p in properties]
+            )
             for state in properties:
-                audit_creation_id = PropertyAuditLog.objects.only('id').exclude(
-                    import_filename=None).get(
-                    state_id=state.id,
-                    name='Import Creation'
-                )
-                if PropertyAuditLog.objects.exclude(record_type=AUDIT_USER_EDIT).filter(
-                    parent1_id=audit_creation_id
-                ).exists():
+                if state.id in merged_ids:
                     properties_matched.append(state.id)
                 else:
                     properties_new.append(state.id)
@@ -1679,15 +1460,9 @@ class ImportFileViewSet(viewsets.ViewSet):
             ).values_list('state_id', flat=True))
             taxlots = [t for t in taxlots if t.id not in taxlots_to_remove]
 
+            merged_ids = self.merged_import_state_ids(TaxLotAuditLog, [t.id for t in taxlots])
             for state in taxlots:
-                audit_creation_id = TaxLotAuditLog.objects.only('id').exclude(
-                    import_filename=None).get(
-                    state_id=state.id,
-                    name='Import Creation'
-                )
-                if TaxLotAuditLog.objects.exclude(record_type=AUDIT_USER_EDIT).filter(
-                    parent1_id=audit_creation_id
-                ).exists():
+                if state.id in merged_ids:
                     tax_lots_matched.append(state.id)
                 else:
                     tax_lots_new.append(state.id)
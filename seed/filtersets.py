@@ -10,6 +10,8 @@ All rights reserved.  # NOQA
 FilterSet classes to provide advanced filtering API endpoints.
 """
 
+import json
+import re
 from datetime import datetime
 
 import pytz
@@ -27,11 +29,17 @@ from seed.models import (
     PropertyView,
     StatusLabel as Label
 )
+from seed.utils.extra_data import ExtraDataValue
 
 # Oops! we override a builtin in some of the models
 property_decorator = property
 
 
+# numeric comparison of an extra data value, e.g. '>= 50'
+EXTRA_DATA_COMPARISON_REGEX = re.compile(r'^\s*(<=|>=|<|>|=)\s*(-?\d+(?:\.\d+)?)\s*$')
+EXTRA_DATA_LOOKUPS = {'<': 'lt', '<=': 'lte', '>': 'gt', '>=': 'gte', '=': 'exact'}
+
+
 # Public Classes and Functions
 class NumberInFilter(BaseInFilter, NumberFilter):
     pass
@@ -130,6 +138,7 @@ class PropertyStateFilterSet(FilterSet):
     """
     energy_score = NumberFilter(name='energy_score', lookup_expr='gte')
     property_identifier = CharFilter(method='identifier_filter')
+    extra_data = CharFilter(method='extra_data_filter')
 
     class Meta:
         model = PropertyState
@@ -137,7 +146,8 @@ class PropertyStateFilterSet(FilterSet):
             'energy_score',
             'city',
             'pm_parent_property_id',
-            'property_identifier'
+            'property_identifier',
+            'extra_data',
         ]
 
     def identifier_filter(self, queryset, name, value):
@@ -159,3 +169,40 @@ class PropertyStateFilterSet(FilterSet):
             | ubid
         )
         return queryset.filter(query)
+
+    def extra_data_filter(self, queryset, name, value):
+        """
+        Filter queryset on extra data values. The value is a JSON object of extra data column
+        names to values, e.g. {"Site EUI": ">= 50", "Building Type": "Office"}. Values starting
+        with a comparison operator are compared numerically (using the column's expression index
+        if the column is indexed), all other values must match exactly (using the GIN index).
+        """
+        try:
+            filters = json.loads(value)
+        except ValueError:
+            return queryset.none()
+        if not isinstance(filters, dict):
+            return queryset.none()
+
+        # the expression indexes are partial indexes on the organization_id of the states, so
+        # the states are filtered on it directly for the planner to be able to use them
+        organization_id = self.data.get('organization_id')
+        if organization_id is not None:
+            try:
+                queryset = queryset.filter(organization_id=int(organization_id))
+            except ValueError:
+                return queryset.none()
+
+        for index, (key, key_value) in enumerate(sorted(filters.items())):
+            comparison = EXTRA_DATA_COMPARISON_REGEX.match(unicode(key_value))
+            if comparison:
+                alias = 'extra_data_value_{}'.format(index)
+                queryset = queryset.annotate(
+                    **{alias: ExtraDataValue(key, numeric=True)}
+                ).filter(**{
+                    '{}__{}'.format(alias, EXTRA_DATA_LOOKUPS[comparison.group(1)]):
+                        float(comparison.group(2))
+                })
+            else:
+                queryset = queryset.filter(extra_data__contains={key: key_value})
+        return queryset
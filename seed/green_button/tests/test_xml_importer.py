@@ -362,3 +362,44 @@ class GreenButtonXMLImportTests(TestCase):
             end=datetime(2016, 12, 31, tzinfo=timezone.get_current_timezone()),
         )
         xml_importer.import_xml(self.import_file, cycle)
+        self.assertEqual(PropertyState.objects.filter(import_file=self.import_file).count(), 1)
+        self.assertEqual(TimeSeries.objects.count(), 2)
+
+    def test_import_xml_multiple_usage_points(self):
+        """
+        Test of xml_importer.stream_import with a file with several UsagePoints.
+        """
+        filepath = path.join(path.dirname(__file__), 'data', 'sample_gb_multiple.xml')
+        self.import_file.file = SimpleUploadedFile(
+            name='sample_gb_multiple.xml',
+            content=open(filepath, 'rb').read()
+        )
+        self.import_file.save()
+
+        cycle = Cycle.objects.create(
+            name="Green Button Cycle",
+            organization=self.org,
+            start=datetime(2013, 1, 1, tzinfo=timezone.get_current_timezone()),
+            end=datetime(2013, 12, 31, tzinfo=timezone.get_current_timezone()),
+        )
+        views = xml_importer.stream_import(self.import_file, cycle, batch_size=2)
+
+        self.assertEqual(
+            [v.state.address_line_1 for v in views],
+            ['100 MAIN ST BERKELEY CA 94704', '200 MAIN ST BERKELEY CA 94704']
+        )
+
+        electricity = views[0].meters.get()
+        self.assertEqual(electricity.energy_type, Meter.ELECTRICITY)
+        self.assertEqual(electricity.energy_units, Meter.WATT_HOURS)
+        self.assertEqual(electricity.timeseries_set.count(), 5)
+        self.assertEqual(
+            list(electricity.timeseries_set.order_by('begin_time').values_list(
+                'reading', flat=True)),
+            [500, 500, 500, 600, 600]
+        )
+
+        gas = views[1].meters.get()
+        self.assertEqual(gas.energy_type, Meter.NATURAL_GAS)
+        self.assertEqual(gas.energy_units, Meter.THERMS)
+        self.assertEqual(gas.timeseries_set.count(), 4)
@@ -4,18 +4,27 @@
 :copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
-from collections import Iterable
-from datetime import datetime
+import logging
+from collections import Iterable, OrderedDict
 
-import xmltodict
-from django.utils import timezone
+from lxml import etree
 
 from seed.lib.mcm.reader import ROW_DELIMITER
 from seed.models import (
     PropertyState,
     GREEN_BUTTON_BS,
 )
-from seed.models.meters import Meter, TimeSeries
+from seed.models.meters import Meter
+from seed.utils.timeseries import (
+    bulk_insert_timeseries,
+    epoch_reading_converter,
+    TIMESERIES_BATCH_SIZE,
+)
+
+_log = logging.getLogger(__name__)
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+ESPI_NS = 'http://naesb.org/espi'
 
 
 def energy_type(service_category):
@@ -235,86 +244,265 @@ def building_data(xml_data):
     return result
 
 
-def create_models(data, import_file, cycle):
-    """
-    Create a PropertyState and a Meter. Then, create TimeSeries models for each meter
-    reading in data.
-
-    :param data: dict, building data from a Green Button XML file from xml_importer.building_data
-    :param import_file: ImportFile, reference to Green Button XML file
-    :param cycle: Cycle, the cycle from which the property view will be attached
-    :returns: PropertyState
-    """
-
-    # cache data on import_file; this is a proof of concept and we
-    # only have two example files available so we hardcode the only
-    # heading present.
-
-    # NL: Yuck, not sure that this makes much sense here, or anywhere in this method
-    import_file.cached_first_row = ROW_DELIMITER.join(["address"])
-    import_file.cached_second_to_fifth_row = ROW_DELIMITER.join([data['address']])
-    import_file.save()
-
+def _create_property_view(import_file, cycle, address):
     property_state = PropertyState()
     property_state.import_file = import_file
     property_state.organization = import_file.import_record.super_organization
-    property_state.address_line_1 = data['address']
+    property_state.address_line_1 = address
     property_state.source_type = GREEN_BUTTON_BS  # TODO: Green Button Fix -- prob can be removed
     property_state.save()
 
-    pv = property_state.promote(cycle)
+    return property_state.promote(cycle)
+
 
+def _create_meter(property_view, service_category, uom):
     # create meter for this dataset (each dataset is a single energy type)
-    e_type = energy_type(data['service_category'])
+    e_type = energy_type(service_category)
     e_type_string = next(
         pair[1] for pair in Meter.ENERGY_TYPES if pair[0] == e_type
     )
 
-    m_name = "gb_{0}[{1}]".format(str(property_state.id), e_type_string)
-    m_energy_units = energy_units(data['meter']['uom'])
+    m_name = "gb_{0}[{1}]".format(str(property_view.state_id), e_type_string)
+    m_energy_units = energy_units(uom)
 
-    meter = Meter.objects.create(
-        name=m_name, energy_type=e_type, energy_units=m_energy_units, property_view=pv
+    return Meter.objects.create(
+        name=m_name, energy_type=e_type, energy_units=m_energy_units, property_view=property_view
     )
-    meter.save()
+
+
+def _cache_rows(import_file, address):
+    # cache data on import_file; this is a proof of concept and we
+    # only have two example files available so we hardcode the only
+    # heading present.
+
+    # NL: Yuck, not sure that this makes much sense here, or anywhere in this method
+    import_file.cached_first_row = ROW_DELIMITER.join(["address"])
+    import_file.cached_second_to_fifth_row = ROW_DELIMITER.join([address])
+    import_file.save()
+
+
+def create_models(data, import_file, cycle):
+    """
+    Create a PropertyState and a Meter. Then, bulk create TimeSeries models for the meter
+    readings in data.
+
+    :param data: dict, building data from a Green Button XML file from xml_importer.building_data
+    :param import_file: ImportFile, reference to Green Button XML file
+    :param cycle: Cycle, the cycle from which the property view will be attached
+    :returns: PropertyState
+    """
+    _cache_rows(import_file, data['address'])
+
+    pv = _create_property_view(import_file, cycle, data['address'])
+    meter = _create_meter(pv, data['service_category'], data['meter']['uom'])
 
     # now time series data for the meter
-    for reading in data['interval']['readings']:
-        # how to deal with timezones?
-        start_time = int(reading['start_time'])
-        duration = int(reading['duration'])
-
-        begin_time = datetime.fromtimestamp(start_time, tz=timezone.get_current_timezone())
-        end_time = datetime.fromtimestamp(start_time + duration, tz=timezone.get_current_timezone())
-        value = reading['value']
-        cost = reading['cost']
-
-        new_ts = TimeSeries.objects.create(
-            begin_time=begin_time,
-            end_time=end_time,
-            reading=value,
-            cost=cost,
-            meter=meter,
-        )
-        new_ts.save()
+    bulk_insert_timeseries(meter, data['interval']['readings'], epoch_reading_converter())
 
     return pv
 
 
+def _local_name(elem):
+    return etree.QName(elem).localname
+
+
+def _self_href(links):
+    return next((href for rel, href in links if rel == 'self'), None)
+
+
+def _child_text(elem, name):
+    child = elem.find('{%s}%s' % (ESPI_NS, name))
+    return child.text.strip() if child is not None and child.text else None
+
+
+def iter_feed(xml_file):
+    """
+    Stream the UsagePoints and IntervalReadings of a Green Button (ESPI) Atom feed with
+    lxml.etree.iterparse. The parsed elements are discarded as soon as they are handled, so the
+    memory used does not grow with the number of readings in the file.
+
+    A feed can contain several UsagePoints (buildings/services), each with MeterReadings that
+    reference a ReadingType and contain IntervalBlocks. The entries are linked together by the
+    hrefs of their links; feeds without links fall back to the most recent UsagePoint and
+    ReadingType.
+
+    :param xml_file: file-like object or path of the Green Button XML file
+    :returns: generator of ('usage_point', usage_point) and ('reading', block, reading) tuples.
+        usage_point is a dict with keys 'href', 'address' and 'service_category'. block is a
+        dict with keys 'meter_reading', 'usage_point' and 'reading_type' and is the same object
+        for all of the readings of a MeterReading. reading is a dict in the format returned by
+        interval_data.
+    """
+    usage_points = []
+    reading_types = {}
+    meter_reading_types = {}
+    blocks = {}
+    last_reading_type = None
+
+    entry_title = None
+    entry_links = []
+    block = None
+
+    # the files are uploaded by users: do not resolve external entities or load anything from the
+    # network (XXE), and keep libxml2's limits on the size and depth of the document
+    for _, elem in etree.iterparse(
+            xml_file, events=('end',), resolve_entities=False, no_network=True):
+        name = _local_name(elem)
+        parent = elem.getparent()
+        in_entry = parent is not None and parent.tag == '{%s}entry' % ATOM_NS
+
+        if in_entry and name == 'title':
+            entry_title = (elem.text or '').strip()
+        elif in_entry and name == 'link':
+            entry_links.append((elem.get('rel'), elem.get('href')))
+        elif name == 'UsagePoint':
+            kind = elem.find('{%s}ServiceCategory/{%s}kind' % (ESPI_NS, ESPI_NS))
+            usage_point = {
+                'href': _self_href(entry_links),
+                'address': entry_title,
+                'service_category': (kind.text or '').strip() or None if kind is not None else None,
+            }
+            usage_points.append(usage_point)
+            yield 'usage_point', usage_point
+        elif name == 'ReadingType':
+            last_reading_type = {
+                'currency': _child_text(elem, 'currency'),
+                'power_of_ten_multiplier': _child_text(elem, 'powerOfTenMultiplier'),
+                'uom': _child_text(elem, 'uom'),
+            }
+            reading_types[_self_href(entry_links)] = last_reading_type
+        elif name == 'MeterReading':
+            meter_reading_types[_self_href(entry_links)] = next(
+                (href for rel, href in entry_links if rel == 'related' and
+                 href and 'ReadingType' in href), None
+            )
+        elif name == 'IntervalReading':
+            if block is None:
+                block = _interval_block(
+                    _self_href(entry_links), usage_points, reading_types, meter_reading_types,
+                    last_reading_type, blocks
+                )
+            time_period = elem.find('{%s}timePeriod' % ESPI_NS)
+            yield 'reading', block, {
+                'cost': _child_text(elem, 'cost'),
+                'value': _child_text(elem, 'value'),
+                'start_time': _child_text(time_period, 'start'),
+                'duration': _child_text(time_period, 'duration'),
+            }
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+        elif name == 'entry':
+            entry_title = None
+            entry_links = []
+            block = None
+            elem.clear()
+            # drop the references to the entries that have already been handled
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def _interval_block(href, usage_points, reading_types, meter_reading_types, last_reading_type,
+                    blocks):
+    # IntervalBlock hrefs are {UsagePoint}/MeterReading/{id}/IntervalBlock/{id}
+    meter_reading = href.split('/IntervalBlock')[0] if href else None
+    if meter_reading in blocks:
+        return blocks[meter_reading]
+
+    usage_point = None
+    if meter_reading:
+        matches = [up for up in usage_points if up['href'] and
+                   meter_reading.startswith(up['href'] + '/')]
+        if matches:
+            usage_point = max(matches, key=lambda up: len(up['href']))
+    if usage_point is None and usage_points:
+        usage_point = usage_points[-1]
+
+    reading_type = reading_types.get(meter_reading_types.get(meter_reading)) or last_reading_type
+
+    block = {
+        'meter_reading': meter_reading,
+        'usage_point': usage_point,
+        'reading_type': reading_type,
+    }
+    blocks[meter_reading] = block
+    return block
+
+
+def stream_import(import_file, cycle, batch_size=TIMESERIES_BATCH_SIZE):
+    """
+    Import a Green Button XML file without loading it in memory. A PropertyView is created for
+    each UsagePoint and a Meter for each MeterReading; the readings are written with the bulk
+    time series writer as they are parsed, at most `batch_size` at a time. MeterReadings with
+    service categories or units that SEED does not support are skipped.
+
+    :param import_file: ImportFile, reference to Green Button XML file
+    :param cycle: Cycle, the cycle to which the property views will be attached
+    :param batch_size: int, maximum number of readings held in memory
+    :returns: list of PropertyViews, one per UsagePoint, in the order of the file
+    """
+    views = OrderedDict()
+    meters = {}
+    converter = epoch_reading_converter()
+
+    current_meter = None
+    readings = []
+
+    def property_view(usage_point):
+        key = id(usage_point)
+        if key not in views:
+            if not views:
+                _cache_rows(import_file, usage_point['address'])
+            views[key] = _create_property_view(import_file, cycle, usage_point['address'])
+        return views[key]
+
+    for event in iter_feed(import_file.local_file):
+        if event[0] == 'usage_point':
+            property_view(event[1])
+            continue
+
+        _, block, reading = event
+        key = block['meter_reading']
+        if key not in meters:
+            usage_point = block['usage_point']
+            reading_type = block['reading_type']
+            if (usage_point is None or reading_type is None or
+                    energy_type(usage_point['service_category'] or -1) is None or
+                    energy_units(reading_type['uom'] or -1) is None):
+                _log.warning('Skipping unsupported Green Button meter reading {}'.format(key))
+                meters[key] = None
+            else:
+                meters[key] = _create_meter(
+                    property_view(usage_point), usage_point['service_category'],
+                    reading_type['uom']
+                )
+
+        meter = meters[key]
+        if meter is None:
+            continue
+        if meter is not current_meter or len(readings) >= batch_size:
+            if readings:
+                bulk_insert_timeseries(current_meter, readings, converter, batch_size)
+            current_meter = meter
+            readings = []
+        readings.append(reading)
+
+    if readings:
+        bulk_insert_timeseries(current_meter, readings, converter, batch_size)
+
+    return list(views.values())
+
+
 def import_xml(import_file, cycle):
     """
     Given an import_file referencing a raw Green Button XML file, extracts
     building and time series information from the file and constructs
-    required database models.
+    required database models. The file is streamed, see stream_import.
 
     :param import_file: a seed.models.ImportFile instance representing a
         Green Button XML file that has been previously uploaded
     :param cycle: which cycle to import the results
-    :returns: PropertyView, attached to cycle
+    :returns: PropertyView of the first UsagePoint, attached to cycle
     """
-    xml_file = import_file.local_file
-    xml_string = xml_file.read()
-    raw_data = xmltodict.parse(xml_string)
-
-    data = building_data(raw_data)
-    return create_models(data, import_file, cycle)
+    views = stream_import(import_file, cycle)
+    return views[0] if views else None
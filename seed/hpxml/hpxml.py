@@ -8,6 +8,8 @@
 import logging
 import os
 import functools
+import threading
+import time
 from copy import deepcopy
 
 try:
@@ -22,7 +24,52 @@ import usaddress as usadd
 _log = logging.getLogger(__name__)
 
 here = os.path.dirname(os.path.abspath(__file__))
-hpxml_parser = objectify.makeparser(schema=etree.XMLSchema(etree.parse(os.path.join(here, 'schemas', 'HPXML.xsd'))))
+
+# The HPXML schema is large, so it is only compiled the first time that a file is validated and
+# then shared by all of the parsers of the process. The Celery workers call preload_schema in the
+# parent process, before the pool forks, so that the children share the compiled schema.
+_parsers = {}
+_parsers_lock = threading.Lock()
+
+
+def schema_path():
+    """
+    Return the path of the schema used for validation. The SEED_HPXML_SCHEMA setting can point to
+    a different (e.g. flattened, single file) copy of HPXML.xsd.
+    """
+    from django.conf import settings
+    path = getattr(settings, 'SEED_HPXML_SCHEMA', None)
+    return path or os.path.join(here, 'schemas', 'HPXML.xsd')
+
+
+def get_hpxml_parser(validate=True):
+    """
+    Return the process-wide objectify parser for HPXML files, compiling the schema on first use.
+
+    :param validate: bool, validate the files against the HPXML schema. Only skip the validation
+        for trusted files.
+    :return: lxml parser
+    """
+    parser = _parsers.get(validate)
+    if parser is None:
+        with _parsers_lock:
+            parser = _parsers.get(validate)
+            if parser is None:
+                if validate:
+                    start = time.time()
+                    path = schema_path()
+                    parser = objectify.makeparser(schema=etree.XMLSchema(etree.parse(path)))
+                    _log.info('Compiled HPXML schema {} in {:.3f}s'.format(
+                        path, time.time() - start))
+                else:
+                    parser = objectify.makeparser()
+                _parsers[validate] = parser
+    return parser
+
+
+def preload_schema():
+    """Compile the HPXML schema now instead of on the first import"""
+    get_hpxml_parser(validate=True)
 
 
 class HPXMLError(Exception):
@@ -70,9 +117,19 @@ class HPXML(object):
         }
     }
 
-    def __init__(self):
+    # keys that process returns besides those of HPXML_STRUCT
+    PROCESS_KEYS = [
+        'hpxml_building_id', 'owner', 'owner_email', 'owner_telephone', 'owner_address',
+        'owner_city_state', 'owner_postal_code', 'building_certification', 'energy_score_type',
+    ]
+
+    def __init__(self, validate=True):
         self.filename = None
         self.tree = None
+        self.validate = validate
+        # seconds spent parsing (and validating) the file in the last import_file. The schema
+        # compilation is logged on its own by get_hpxml_parser.
+        self.import_seconds = None
 
     @property
     def root(self):
@@ -97,8 +154,13 @@ class HPXML(object):
             return resp
 
     def import_file(self, filename):
+        parser = get_hpxml_parser(self.validate)
+        start = time.time()
         self.filename = filename
-        self.tree = objectify.parse(self.filename, parser=hpxml_parser)
+        self.tree = objectify.parse(self.filename, parser=parser)
+        self.import_seconds = time.time() - start
+        _log.debug('Imported HPXML file {} in {:.3f}s (validate={})'.format(
+            filename, self.import_seconds, self.validate))
 
         return True
 
@@ -114,7 +176,8 @@ class HPXML(object):
             return f.getvalue()
 
         if self.tree is None:
-            tree = objectify.parse(os.path.join(here, 'schemas', 'blank.xml'), parser=hpxml_parser)
+            tree = objectify.parse(os.path.join(here, 'schemas', 'blank.xml'),
+                                   parser=get_hpxml_parser(self.validate))
             root = tree.getroot()
         else:
             root = deepcopy(self.root)
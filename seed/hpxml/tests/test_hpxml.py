@@ -13,7 +13,7 @@ from lxml import objectify
 from lxml.etree import XMLSyntaxError
 import xmltodict
 
-from seed.hpxml.hpxml import HPXML, hpxml_parser
+from seed.hpxml.hpxml import HPXML, get_hpxml_parser
 from seed.landing.models import SEEDUser as User
 from seed.lib.superperms.orgs.models import (
     Organization,
@@ -55,6 +55,22 @@ class TestHPXML(TestCase):
             os.close(fd)
             os.remove(tempfile_path)
 
+    def test_import_without_validation(self):
+        self.assertIs(get_hpxml_parser(), get_hpxml_parser())
+        fd, tempfile_path = tempfile.mkstemp()
+        try:
+            tree = objectify.parse(self.xml_file)
+            objectify.SubElement(tree.getroot(), 'BogusElement')
+            tree.write(tempfile_path, encoding='utf-8')
+            with self.assertRaises(XMLSyntaxError):
+                HPXML().import_file(tempfile_path)
+            hpxml = HPXML(validate=False)
+            self.assertTrue(hpxml.import_file(tempfile_path))
+            self.assertIsNotNone(hpxml.import_seconds)
+        finally:
+            os.close(fd)
+            os.remove(tempfile_path)
+
     def test_get_building(self):
         self.assertTrue(self.hpxml.import_file(self.xml_file))
         bldg = self.hpxml._get_building()
@@ -123,7 +139,7 @@ class TestHPXML(TestCase):
         ps.save()
         xml = self.hpxml.export(ps)
         f = StringIO(xml)
-        tree = objectify.parse(f, parser=hpxml_parser)
+        tree = objectify.parse(f, parser=get_hpxml_parser())
         root = tree.getroot()
         energy_score = root.Building.BuildingDetails.BuildingSummary.BuildingConstruction.EnergyScore
         self.assertEqual(int(energy_score.Score), ps.energy_score)
@@ -186,7 +202,7 @@ class TestHPXML(TestCase):
 
         xml = self.hpxml.export(ps)
         f = StringIO(xml)
-        tree = objectify.parse(f, parser=hpxml_parser)
+        tree = objectify.parse(f, parser=get_hpxml_parser())
         root = tree.getroot()
         self.assertEqual(
             int(root.Building.BuildingDetails.BuildingSummary.BuildingConstruction.EnergyScore[1].Score),
@@ -227,7 +243,7 @@ class TestHPXML(TestCase):
 
         xml = self.hpxml.export(ps)
         f = StringIO(xml)
-        tree = objectify.parse(f, parser=hpxml_parser)
+        tree = objectify.parse(f, parser=get_hpxml_parser())
         root = tree.getroot()
         name = root.Customer.CustomerDetails.Person.Name
         self.assertEqual('Dr.', name.PrefixName.text)
@@ -248,7 +264,7 @@ class TestHPXML(TestCase):
 
         xml = self.hpxml.export(ps)
         f = StringIO(xml)
-        tree = objectify.parse(f, parser=hpxml_parser)
+        tree = objectify.parse(f, parser=get_hpxml_parser())
         root = tree.getroot()
 
         self.assertEqual(root.Project.ProjectDetails.ProgramCertificate, 'other')
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2018-01-24 10:12
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models
+from django.utils.crypto import get_random_string
+
+
+def hash_api_keys(apps, schema_editor):
+    """Replace the plain text API keys with their salted digests"""
+    SEEDUser = apps.get_model('landing', 'SEEDUser')
+    for user in SEEDUser.objects.exclude(api_key='').only('id', 'api_key'):
+        salt = get_random_string(12)
+        digest = hashlib.sha256('{}${}'.format(salt, user.api_key).encode('utf-8')).hexdigest()
+        SEEDUser.objects.filter(pk=user.pk).update(
+            api_key='',
+            api_key_prefix=user.api_key[:8],
+            api_key_hash='sha256${}${}'.format(salt, digest),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landing', '0006_auto_20170602_1648'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seeduser',
+            name='api_key_hash',
+            field=models.CharField(blank=True, default='', max_length=128, verbose_name='api key hash'),
+        ),
+        migrations.AddField(
+            model_name='seeduser',
+            name='api_key_prefix',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=8, verbose_name='api key prefix'),
+        ),
+        migrations.RunPython(hash_api_keys, migrations.RunPython.noop),
+    ]
@@ -7,6 +7,7 @@
 import uuid
 import hmac
 import base64
+import hashlib
 # sha1 used for api_key creation, but may vary by python version
 try:
     from hashlib import sha1
@@ -14,12 +15,15 @@ except ImportError:
     import sha
     sha1 = sha.sha
 
+from django.conf import settings
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
     UserManager,
     # SiteProfileNotAvailable
 )
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, get_random_string
 from django.utils.translation import ugettext_lazy as _
 from django.utils import timezone
 from django.db import models
@@ -31,6 +35,32 @@ from django.contrib.postgres.fields import JSONField
 
 from seed.lib.superperms.orgs.models import Organization
 
+# Number of leading characters of an API key that are stored in plain text to look the key up
+API_KEY_PREFIX_LENGTH = 8
+
+
+def hash_api_key(api_key, salt=None):
+    """
+    Return the salted digest of an API key as stored in SEEDUser.api_key_hash. API keys are long
+    random strings, so a single round of SHA-256 is enough (and keeps the check cheap).
+
+    :param api_key: str, the API key
+    :param salt: str, salt to use, a random one if None
+    :return: str, 'sha256$<salt>$<hex digest>'
+    """
+    if salt is None:
+        salt = get_random_string(12)
+    digest = hashlib.sha256('{}${}'.format(salt, api_key).encode('utf-8')).hexdigest()
+    return 'sha256${}${}'.format(salt, digest)
+
+
+def _api_key_version_key(user_id):
+    return 'api_key_version:{}'.format(user_id)
+
+
+def _api_key_cache_key(auth_header):
+    return 'api_key_auth:{}'.format(hashlib.sha256(auth_header).hexdigest())
+
 
 class SEEDUser(AbstractBaseUser, PermissionsMixin):
     """
@@ -67,6 +97,8 @@ class SEEDUser(AbstractBaseUser, PermissionsMixin):
         related_name='default_users',
         on_delete=models.SET_NULL
     )
+    # API keys are only stored as a salted digest (api_key_hash) along with the first characters
+    # of the key. api_key is kept for the API responses and is always blank.
     api_key = models.CharField(
         _('api key'),
         max_length=128,
@@ -74,6 +106,14 @@ class SEEDUser(AbstractBaseUser, PermissionsMixin):
         default='',
         db_index=True
     )
+    api_key_prefix = models.CharField(
+        _('api key prefix'),
+        max_length=API_KEY_PREFIX_LENGTH,
+        blank=True,
+        default='',
+        db_index=True
+    )
+    api_key_hash = models.CharField(_('api key hash'), max_length=128, blank=True, default='')
 
     objects = UserManager()
 
@@ -107,13 +147,31 @@ class SEEDUser(AbstractBaseUser, PermissionsMixin):
             auth_header = auth_header.split()[1]
             auth_header = base64.urlsafe_b64decode(auth_header)
             username, api_key = auth_header.split(':')
-            user = SEEDUser.objects.get(api_key=api_key, username=username)
-            return user
         except ValueError:
             raise exceptions.AuthenticationFailed("Invalid HTTP_AUTHORIZATION Header")
-        except SEEDUser.DoesNotExist:
+
+        # the verified users are cached by the digest of the header, along with the version of the
+        # user which changes whenever the user is saved (e.g. when a new key is generated).
+        timeout = getattr(settings, 'SEED_API_KEY_CACHE_TIMEOUT', 0)
+        if timeout:
+            cache_key = _api_key_cache_key(auth_header)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                user, version = cached
+                if version == cache.get(_api_key_version_key(user.pk), 0):
+                    return user
+
+        user = SEEDUser.objects.filter(
+            username=username, api_key_prefix=api_key[:API_KEY_PREFIX_LENGTH]
+        ).first()
+        if user is None or not user.check_api_key(api_key):
             raise exceptions.AuthenticationFailed("Invalid API key")
 
+        if timeout:
+            version = cache.get(_api_key_version_key(user.pk), 0)
+            cache.set(cache_key, (user, version), timeout)
+        return user
+
     def get_absolute_url(self):
         return "/users/%s/" % urlquote(self.username)
 
@@ -136,15 +194,28 @@ class SEEDUser(AbstractBaseUser, PermissionsMixin):
 
     def generate_key(self):
         """
-        Creates and sets an API key for this user.
+        Creates and sets an API key for this user. Only the digest of the key is stored, so the
+        key has to be shown to the user now. Any previous key is revoked.
         Adapted from tastypie:
 
         https://github.com/toastdriven/django-tastypie/blob/master/tastypie/models.py#L47  # noqa
+
+        :return: str, the new API key
         """
         new_uuid = uuid.uuid4()
         api_key = hmac.new(new_uuid.bytes, digestmod=sha1).hexdigest()
-        self.api_key = api_key
+        self.api_key = ''
+        self.api_key_prefix = api_key[:API_KEY_PREFIX_LENGTH]
+        self.api_key_hash = hash_api_key(api_key)
         self.save()
+        return api_key
+
+    def check_api_key(self, api_key):
+        """Return True if api_key is the user's current API key"""
+        if not self.api_key_hash:
+            return False
+        salt = self.api_key_hash.split('$')[1]
+        return constant_time_compare(self.api_key_hash, hash_api_key(api_key, salt))
 
     def save(self, *args, **kwargs):
         """
@@ -156,4 +227,12 @@ class SEEDUser(AbstractBaseUser, PermissionsMixin):
         # correct? Regardless, this code seems problematic
         if self.email.lower() != self.username:
             self.email = self.username
-        return super(SEEDUser, self).save(*args, **kwargs)
+        result = super(SEEDUser, self).save(*args, **kwargs)
+
+        # the cached API key authentications hold a copy of the user, discard them (this also
+        # revokes the previous key when a new one is generated)
+        try:
+            cache.incr(_api_key_version_key(self.pk))
+        except ValueError:
+            cache.set(_api_key_version_key(self.pk), 1, None)
+        return result
@@ -11,6 +11,9 @@ from seed.utils import constants
 
 _log = logging.getLogger(__name__)
 
+# Columns of the database fields by the excluded field names, see MappingData._database_columns
+_DATABASE_COLUMNS = {}
+
 
 class MappingData(object):
     """
@@ -34,38 +37,40 @@ class MappingData(object):
             exclude_fields = constants.EXCLUDE_FIELDS
 
         # So bedes compliant fields are defined in the database? That is strange
-        self.data = []
+        self.data = [dict(column) for column in self._database_columns(exclude_fields)]
         self.property_data = []
         self.tax_lot_data = []
 
-        for f in PropertyState._meta.fields:
-            # _source have been removed from new data model
-            if f.name not in exclude_fields:  # and '_source' not in f.name:
-                column = {
-                    'table': 'PropertyState',
-                    'name': f.name,
-                    'type': f.get_internal_type() if f.get_internal_type else 'string',
-                    'js_type': self._normalize_mappable_type(f.get_internal_type()),
-                    'schema': 'BEDES',
-                    'extra_data': False,
-                }
-                self.data.append(column)
-
-        for f in TaxLotState._meta.fields:
-            # _source have been removed from new data model
-            if f.name not in exclude_fields:  # and '_source' not in f.name:
-                column = {
-                    'table': 'TaxLotState',
-                    'name': f.name,
-                    'type': f.get_internal_type() if f.get_internal_type else 'string',
-                    'js_type': self._normalize_mappable_type(f.get_internal_type()),
-                    'schema': 'BEDES',
-                    'extra_data': False,
-                }
+        self.sort_data()
 
-                self.data.append(column)
+    def _database_columns(self, exclude_fields):
+        """
+        Return the columns of the PropertyState and TaxLotState fields. The fields only change with
+        the code, so the columns are built once per process and copied by each instance.
 
-        self.sort_data()
+        Args:
+            exclude_fields: list of field names to skip
+
+        Returns: list of column dicts, do not modify
+
+        """
+        key = tuple(sorted(exclude_fields))
+        if key not in _DATABASE_COLUMNS:
+            columns = []
+            for model in [PropertyState, TaxLotState]:
+                for f in model._meta.fields:
+                    # _source have been removed from new data model
+                    if f.name not in exclude_fields:  # and '_source' not in f.name:
+                        columns.append({
+                            'table': model.__name__,
+                            'name': f.name,
+                            'type': f.get_internal_type() if f.get_internal_type else 'string',
+                            'js_type': self._normalize_mappable_type(f.get_internal_type()),
+                            'schema': 'BEDES',
+                            'extra_data': False,
+                        })
+            _DATABASE_COLUMNS[key] = columns
+        return _DATABASE_COLUMNS[key]
 
     def _normalize_mappable_type(self, in_str):
         """
@@ -220,3 +220,13 @@ class TestMappingData(TestCase):
         ]
         c = self.obj.extra_data
         self.assertListEqual(expected, c)
+
+    def test_database_columns_are_copied(self):
+        # the columns of the database fields are shared by the instances, changes to one instance
+        # must not leak into the next
+        self.obj.data[0]['name'] = 'changed'
+        self.obj.add_extra_data(Column.objects.none())
+
+        obj = mapping_data.MappingData()
+        self.assertEqual(obj.data[0]['name'], 'address_line_1')
+        self.assertEqual(len(obj.data), len(self.obj.data))
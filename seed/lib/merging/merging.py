@@ -124,7 +124,7 @@ def _merge_extra_data(b1, b2, default=None):
     return extra_data, extra_data_sources
 
 
-def merge_state(merged_state, state1, state2, can_attrs, default=None):
+def merge_state(merged_state, state1, state2, can_attrs, default=None, merge_relationships=True):
     """
     Set attributes on our Canonical model, saving differences.
 
@@ -133,6 +133,8 @@ def merge_state(merged_state, state1, state2, can_attrs, default=None):
     :param state2: PropertyState/TaxLotState model inst. Right parent.
     :param can_attrs:  dict of dicts, {'attr_name': {'dataset1': 'value'...}}.
     :param default: (optional), which dataset's value to default to.
+    :param merge_relationships: (optional), copy the measures, scenarios, etc. to the merged
+        state, which must be saved. Callers that bulk create the merged states copy them after.
     :return: inst(``merged_state``), updated.
     """
     default = default or state2
@@ -169,7 +171,7 @@ def merge_state(merged_state, state1, state2, can_attrs, default=None):
     merged_state.extra_data = merged_extra_data
 
     # merge measures, scenarios, simulations
-    if isinstance(merged_state, PropertyState):
+    if merge_relationships and isinstance(merged_state, PropertyState):
         PropertyState.merge_relationships(merged_state, state1, state2)
 
     return merged_state, changes
@@ -10,12 +10,11 @@ from functools import wraps
 from django.conf import settings
 from django.http import HttpResponseForbidden
 
+from seed.lib.superperms.orgs.membership import get_membership, get_parent_role_level
 from seed.lib.superperms.orgs.models import (
     ROLE_OWNER,
     ROLE_MEMBER,
     ROLE_VIEWER,
-    Organization,
-    OrganizationUser
 )
 
 # Allow Super Users to ignore permissions.
@@ -32,13 +31,10 @@ def requires_parent_org_owner(org_user):
 
 def requires_owner(org_user):
     """Owners, and only owners have owner perms."""
-    is_parent_org_owner = False
-    parent = org_user.organization.parent_org
-    if parent:
-        is_parent_org_owner = OrganizationUser.objects.filter(
-            organization=parent, user=org_user.user, role_level__gte=ROLE_OWNER
-        ).exists()
-    return is_parent_org_owner or org_user.role_level >= ROLE_OWNER
+    if org_user.role_level >= ROLE_OWNER:
+        return True
+    parent_role_level = get_parent_role_level(org_user)
+    return parent_role_level is not None and parent_role_level >= ROLE_OWNER
 
 
 def requires_member(org_user):
@@ -90,10 +86,7 @@ def can_modify_org_settings(org_user):
         return True
     # otherwise, there may be a parent org, so see if this user
     # is an owner of the parent.
-    org = org_user.organization
-    if org.parent_org is not None and org.parent_org.is_owner(org_user.user):
-        return True
-    return False
+    return get_parent_role_level(org_user) == ROLE_OWNER
 
 
 def can_view_sub_org_settings(org_user):
@@ -188,18 +181,10 @@ def has_perm(perm_name):
             if request.user.is_superuser and ALLOW_SUPER_USER_PERMS:
                 return fn(request, *args, **kwargs)
 
-            org_id = _get_org_id(request)
-
-            try:
-                org = Organization.objects.get(pk=org_id)
-            except Organization.DoesNotExist:
+            org, org_user = get_membership(request, _get_org_id(request))
+            if org is None:
                 return _make_resp('org_dne')
-
-            try:
-                org_user = OrganizationUser.objects.get(
-                    user=request.user, organization=org
-                )
-            except OrganizationUser.DoesNotExist:
+            if org_user is None:
                 return _make_resp('user_dne')
 
             if not PERMS.get(perm_name, lambda x: False)(org_user):
@@ -223,18 +208,10 @@ def has_perm_class(perm_name):
             if request.user.is_superuser and ALLOW_SUPER_USER_PERMS:
                 return fn(self, request, *args, **kwargs)
 
-            org_id = _get_org_id(request)
-
-            try:
-                org = Organization.objects.get(pk=org_id)
-            except Organization.DoesNotExist:
+            org, org_user = get_membership(request, _get_org_id(request))
+            if org is None:
                 return _make_resp('org_dne')
-
-            try:
-                org_user = OrganizationUser.objects.get(
-                    user=request.user, organization=org
-                )
-            except OrganizationUser.DoesNotExist:
+            if org_user is None:
                 return _make_resp('user_dne')
 
             if not PERMS.get(perm_name, lambda x: False)(org_user):
@@ -0,0 +1,130 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+
+Cache of the organization memberships that are looked up by the permission decorators, the DRF
+permission classes and OrgMixin. Stacked decorators on a view check the same organization and
+user several times per request, so the membership is resolved once and kept on the request.
+
+The memberships can also be cached across requests for SEED_ORG_PERMISSION_CACHE_TIMEOUT seconds.
+The cross-request entries of a user are invalidated with `invalidate_memberships` whenever the
+user's roles change; other changes (e.g. moving an organization under a parent) are picked up
+when the entries expire.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+
+from seed.lib.superperms.orgs.models import Organization, OrganizationUser
+
+# Attribute of the (Django) request that holds the memberships resolved during the request
+REQUEST_CACHE_ATTR = '_seed_org_memberships'
+
+# Marker for a role level that has not been loaded
+NOT_LOADED = object()
+
+
+def _timeout():
+    return getattr(settings, 'SEED_ORG_PERMISSION_CACHE_TIMEOUT', 0)
+
+
+def _request_cache(request):
+    # DRF wraps the Django request, keep the cache on the Django request so that the decorators
+    # and the permission classes of the same request share it.
+    request = getattr(request, '_request', request)
+    if not isinstance(request, HttpRequest):
+        # nothing to keep the cache on (e.g. a stub request)
+        return {}
+    memberships = getattr(request, REQUEST_CACHE_ATTR, None)
+    if memberships is None:
+        memberships = {}
+        setattr(request, REQUEST_CACHE_ATTR, memberships)
+    return memberships
+
+
+def _version_key(user_id):
+    return 'org_membership_version:{}'.format(user_id)
+
+
+def _cache_key(user_id, org_id):
+    version = cache.get(_version_key(user_id), 0)
+    return 'org_membership:{}:{}:{}'.format(user_id, version, org_id)
+
+
+def invalidate_memberships(user_id):
+    """Discard the memberships of a user that are cached across requests"""
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # the version does not exist yet (or was evicted)
+        cache.set(key, 1, None)
+
+
+def _load(user, org_id):
+    """Return (organization, role level, parent role level), or Nones if they do not exist"""
+    try:
+        org = Organization.objects.select_related('parent_org').get(pk=org_id)
+    except Organization.DoesNotExist:
+        return None, None, None
+
+    org_ids = [org.pk] if org.parent_org_id is None else [org.pk, org.parent_org_id]
+    roles = dict(OrganizationUser.objects.filter(
+        user_id=user.pk, organization_id__in=org_ids
+    ).values_list('organization_id', 'role_level'))
+    return org, roles.get(org.pk), roles.get(org.parent_org_id)
+
+
+def get_membership(request, org_id):
+    """
+    Return the organization and the OrganizationUser of the request's user in it. The result is
+    cached for the rest of the request (and across requests if enabled in the settings).
+
+    :param request: Django or DRF request
+    :param org_id: int or str, id of the organization
+    :return: tuple, (Organization or None if it does not exist,
+                     OrganizationUser or None if the user is not a member)
+    """
+    user = request.user
+    memberships = _request_cache(request)
+    request_key = (user.pk, str(org_id))
+    if request_key not in memberships:
+        timeout = _timeout()
+        if timeout:
+            key = _cache_key(user.pk, org_id)
+            loaded = cache.get(key)
+            if loaded is None:
+                loaded = _load(user, org_id)
+                cache.set(key, loaded, timeout)
+        else:
+            loaded = _load(user, org_id)
+
+        org, role_level, parent_role_level = loaded
+        org_user = None
+        if role_level is not None:
+            org_user = OrganizationUser(
+                user=user, organization=org, role_level=role_level
+            )
+            org_user.parent_role_level = parent_role_level
+        memberships[request_key] = (org, org_user)
+
+    return memberships[request_key]
+
+
+def get_parent_role_level(org_user):
+    """
+    Return the role level of the OrganizationUser's user in the parent of the organization, or
+    None if the user is not a member of the parent (or there is no parent).
+    """
+    parent = org_user.organization.parent_org
+    if parent is None:
+        return None
+
+    role_level = getattr(org_user, 'parent_role_level', NOT_LOADED)
+    if role_level is NOT_LOADED:
+        role_level = OrganizationUser.objects.filter(
+            organization=parent, user=org_user.user
+        ).values_list('role_level', flat=True).first()
+    return role_level
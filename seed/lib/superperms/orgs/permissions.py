@@ -17,12 +17,11 @@ from django.conf import settings
 from rest_framework.permissions import BasePermission
 from rest_framework.exceptions import PermissionDenied
 
+from seed.lib.superperms.orgs.membership import get_membership
 from seed.lib.superperms.orgs.models import (
     ROLE_OWNER,
     ROLE_MEMBER,
     ROLE_VIEWER,
-    Organization,
-    OrganizationUser
 )
 
 # Allow Super Users to ignore permissions.
@@ -124,25 +123,16 @@ class SEEDOrgPermissions(BasePermission):
         has_perm = False
         # defaults to OWNER if not specified.
         required_perm = self.perm_map.get(request.method, ROLE_OWNER)
-        org = None
         org_id = get_org_id(request)
         if not org_id:
-            org = get_user_org(request.user)
-            org_id = getattr(org, 'pk')
-        try:
-            org_user = OrganizationUser.objects.get(
-                user=request.user, organization__id=org_id
-            )
+            org_id = getattr(get_user_org(request.user), 'pk')
+        org, org_user = get_membership(request, org_id)
+        if org_user is not None:
             has_perm = org_user.role_level >= required_perm
-        except OrganizationUser.DoesNotExist:
+        elif org is None:
+            self.message = 'Organization does not exist'
+        else:
             self.message = 'No relationship to organization'
-            # return the right error message. we wait until here to check for
-            # organization so the extra db call is not made if not needed.
-            if not org:
-                try:
-                    org = Organization.objects.get(id=org_id)
-                except Organization.DoesNotExist:
-                    self.message = 'Organization does not exist'
         return has_perm
 
     def has_permission(self, request, view):
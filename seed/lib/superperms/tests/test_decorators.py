@@ -6,7 +6,7 @@
 """
 import json
 
-from django.test import TestCase
+from django.test import RequestFactory, TestCase, override_settings
 from django.http import HttpResponse, HttpResponseForbidden
 from seed.lib.superperms.orgs.models import (
     ROLE_VIEWER,
@@ -22,6 +22,7 @@ from seed.landing.models import SEEDUser as User
 # Copied wholesale from django-brake's tests
 # https://github.com/gmcquillan/django-brake/blob/master/brake/tests/tests.py
 from seed.lib.superperms.orgs import decorators
+from seed.lib.superperms.orgs.membership import get_membership, invalidate_memberships
 
 
 class FakeRequest(object):
@@ -322,3 +323,32 @@ class TestDecorators(TestCase):
         self.assertFalse(decorators.requires_superuser(self.member_org_user))
         self.assertFalse(decorators.requires_superuser(self.viewer_org_user))
         self.assertTrue(decorators.requires_superuser(self.superuser_org_user))
+
+    def test_membership_cached_for_request(self):
+        """Stacked checks in one request only look up the membership once."""
+        request = RequestFactory().get('/', {'organization_id': self.fake_org.pk})
+        request.user = self.fake_owner
+
+        with self.assertNumQueries(2):
+            self.assertEqual(_fake_invite_user(request).__class__, HttpResponse)
+        with self.assertNumQueries(0):
+            self.assertEqual(_fake_invite_user(request).__class__, HttpResponse)
+
+    @override_settings(SEED_ORG_PERMISSION_CACHE_TIMEOUT=60)
+    def test_membership_cache_invalidation(self):
+        """Role changes invalidate the memberships cached across requests."""
+        def _role_level():
+            request = RequestFactory().get('/')
+            request.user = self.fake_member
+            return get_membership(request, self.fake_org.pk)[1].role_level
+
+        invalidate_memberships(self.fake_member.pk)
+        self.assertEqual(_role_level(), ROLE_MEMBER)
+
+        self.member_org_user.role_level = ROLE_OWNER
+        self.member_org_user.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(_role_level(), ROLE_MEMBER)
+
+        invalidate_memberships(self.fake_member.pk)
+        self.assertEqual(_role_level(), ROLE_OWNER)
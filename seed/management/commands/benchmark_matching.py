@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from seed.data_importer.tasks import query_property_matches
+from seed.filtersets import PropertyStateFilterSet
+from seed.models import PropertyState, TaxLotState
+
+
+class Command(BaseCommand):
+    help = ('Times the identifier lookups used for matching an organization\'s states with and '
+            'without the use of indexes (index scans are turned off for the second run, which '
+            'approximates the table before the matching identifier indexes were added)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org',
+                            help='Organization id to benchmark',
+                            action='store',
+                            dest='organization',
+                            required=True)
+
+        parser.add_argument('--samples',
+                            help='Number of states to look up, defaults to 100',
+                            action='store',
+                            dest='samples',
+                            type=int,
+                            default=100)
+
+    def _time(self, lookup, rows, use_indexes):
+        with transaction.atomic():
+            if not use_indexes:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_indexscan = off')
+                    cursor.execute('SET LOCAL enable_bitmapscan = off')
+                    cursor.execute('SET LOCAL enable_indexonlyscan = off')
+
+            start = time.time()
+            for row in rows:
+                list(lookup(row).values_list('id', flat=True))
+            return time.time() - start
+
+    def handle(self, *args, **options):
+        organization_id = int(options['organization'])
+        properties = PropertyState.objects.filter(organization_id=organization_id)
+        taxlots = TaxLotState.objects.filter(organization_id=organization_id)
+
+        property_rows = list(properties.order_by('?').values_list(
+            'pm_property_id', 'custom_id_1', 'ubid', 'normalized_address'
+        )[:options['samples']])
+        taxlot_rows = list(taxlots.order_by('?').values_list(
+            'jurisdiction_tax_lot_id', 'normalized_address'
+        )[:options['samples']])
+        if not property_rows and not taxlot_rows:
+            raise CommandError('Organization %s does not have any states' % organization_id)
+
+        filterset = PropertyStateFilterSet()
+        lookups = [
+            ('query_property_matches', property_rows,
+             lambda row: query_property_matches(properties, row[0], row[1], row[2])),
+            ('identifier_filter', property_rows,
+             lambda row: filterset.identifier_filter(
+                 properties, 'property_identifier', row[0] or row[1] or row[2] or '')),
+            ('property normalized_address', property_rows,
+             lambda row: properties.filter(normalized_address=row[3])),
+            ('taxlot jurisdiction_tax_lot_id', taxlot_rows,
+             lambda row: taxlots.filter(jurisdiction_tax_lot_id=row[0])),
+            ('taxlot normalized_address', taxlot_rows,
+             lambda row: taxlots.filter(normalized_address=row[1])),
+        ]
+
+        self.stdout.write(
+            'Organization %s: %s property states, %s tax lot states' % (
+                organization_id, properties.count(), taxlots.count()),
+            ending='\n'
+        )
+        for name, rows, lookup in lookups:
+            if not rows:
+                continue
+            indexed = self._time(lookup, rows, True)
+            sequential = self._time(lookup, rows, False)
+            self.stdout.write(
+                '%-32s %5s lookups: %8.3fs with indexes, %8.3fs without (%.1fx)' % (
+                    name, len(rows), indexed, sequential, sequential / max(indexed, 1e-6)),
+                ending='\n'
+            )
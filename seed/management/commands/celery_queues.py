@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from seed.utils.queues import DEFAULT, WORKLOADS, workload_queue_names
+
+
+class Command(BaseCommand):
+    help = 'Prints the comma separated Celery queues of workloads, e.g. for `celery worker -Q`'
+
+    def add_arguments(self, parser):
+        parser.add_argument('workloads',
+                            nargs='*',
+                            help='One or more of {}, defaults to all'.format(
+                                ', '.join([DEFAULT] + WORKLOADS)))
+
+    def handle(self, *args, **options):
+        workloads = options['workloads'] or [DEFAULT] + WORKLOADS
+        for workload in workloads:
+            if workload not in [DEFAULT] + WORKLOADS:
+                raise CommandError('Unknown workload {}'.format(workload))
+
+        names = []
+        for workload in workloads:
+            names.extend(workload_queue_names(
+                settings.CELERY_TASK_DEFAULT_QUEUE, workload, settings.SEED_CELERY_QUEUE_SHARDS
+            ))
+        self.stdout.write(','.join(names))
@@ -11,7 +11,7 @@ from seed.landing.models import SEEDUser as User
 
 
 class Command(BaseCommand):
-    help = 'Creates the JSON file needed for testing the API'
+    help = 'Creates the JSON file needed for testing the API (generates a new API key)'
 
     def add_arguments(self, parser):
         parser.add_argument('--username',
@@ -40,7 +40,8 @@ class Command(BaseCommand):
                 'name': 'seed_api_test',
                 'host': options['host'],
                 'username': options['username'],
-                'api_key': u.api_key,
+                # only the digest of the key is stored, so a new key is generated
+                'api_key': u.generate_key(),
             }
 
             if options['file'] == 'none':
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from django.core.management.base import BaseCommand
+
+from seed.lib.superperms.orgs.models import Organization
+from seed.models import Cycle, PropertyInventoryRow, TaxLotInventoryRow
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalized inventory rows for organizations and cycles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--org',
+                            help='Comma separated list of organization ids, defaults to all',
+                            action='store',
+                            dest='organization')
+
+        parser.add_argument('--cycle',
+                            help='Comma separated list of cycle ids, defaults to all',
+                            action='store',
+                            dest='cycle')
+
+    def handle(self, *args, **options):
+        if options['organization']:
+            organization_ids = map(int, options['organization'].split(','))
+        else:
+            organization_ids = Organization.objects.values_list('id', flat=True)
+
+        cycles = Cycle.objects.filter(organization_id__in=organization_ids)
+        if options['cycle']:
+            cycles = cycles.filter(pk__in=map(int, options['cycle'].split(',')))
+
+        for cycle in cycles.order_by('organization_id', 'id'):
+            num_properties = PropertyInventoryRow.refresh_cycle(cycle.organization_id, cycle.id)
+            num_taxlots = TaxLotInventoryRow.refresh_cycle(cycle.organization_id, cycle.id)
+            self.stdout.write(
+                'Organization %s, %s: %s property rows, %s tax lot rows' % (
+                    cycle.organization_id, cycle.name, num_properties, num_taxlots),
+                ending='\n'
+            )
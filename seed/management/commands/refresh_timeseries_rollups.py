@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from django.core.management.base import BaseCommand
+
+from seed.models import Meter
+from seed.utils.timeseries import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the hourly, daily and monthly time series rollups of meters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meter',
+                            help='Comma separated list of meter ids, defaults to all',
+                            action='store',
+                            dest='meter')
+
+    def handle(self, *args, **options):
+        meters = Meter.objects.all()
+        if options['meter']:
+            meters = meters.filter(pk__in=map(int, options['meter'].split(',')))
+
+        for meter in meters.order_by('id').iterator():
+            refresh_rollups(meter)
+            self.stdout.write(
+                'Meter %s: %s rollups' % (meter.pk, meter.rollups.count()), ending='\n'
+            )
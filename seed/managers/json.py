@@ -9,37 +9,27 @@ class JsonQuerySet(QuerySet):
     PRIMARY = 'extra_data'
     TABLE = 'seed_buildingsnapshot'
 
-    def _safe_cast(self, cast_fn, val):
-        try:
-            return cast_fn(val)
-        except TypeError:
-            return val
-
     def json_order_by(self, key, order_by, order_by_rev=False, unit=None):
-        from seed.models import FLOAT, DECIMAL, STRING
-
-        def get_field(x):
-            return getattr(x, self.PRIMARY).get(order_by, None)
-
-        unit_type = STRING
-        if unit:
-            unit_type = unit.unit_type
-
-        qs = self
-        qs = list(qs)
-
-        key_fns = {
-            STRING: get_field,
-            FLOAT: lambda x: self._safe_cast(float, get_field(x)),
-            DECIMAL: lambda x: self._safe_cast(float, get_field(x)),
-        }
-
-        qs.sort(
-            key=key_fns.get(unit_type, get_field),
-            reverse=order_by_rev,
-        )
-
-        return qs
+        """
+        Order the queryset by the value of a key in the JSON field. The ordering is done in the
+        database, so the result is still a lazy queryset that can be sliced or paginated.
+
+        Values are compared as floats if the unit of the column is a Float or Decimal (values that
+        are not numbers sort as missing) and as text otherwise. Missing values sort first, or last
+        when reversed.
+        """
+        from seed.models import FLOAT, DECIMAL
+        from seed.utils.extra_data import ExtraDataValue
+
+        numeric = unit is not None and unit.unit_type in [FLOAT, DECIMAL]
+        value = ExtraDataValue(order_by, numeric=numeric, field=self.PRIMARY)
+
+        if order_by_rev:
+            ordering = value.desc(nulls_last=True)
+        else:
+            ordering = value.asc(nulls_first=True)
+
+        return self.order_by(ordering, 'pk')
 
 
 class JsonManager(Manager):
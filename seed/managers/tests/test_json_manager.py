@@ -4,9 +4,10 @@
 :copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
+from django.db.models.query import QuerySet
 from django.test import TestCase
 
-from seed.models import BuildingSnapshot
+from seed.models import BuildingSnapshot, FLOAT, Unit
 
 
 class TestJsonManager(TestCase):
@@ -60,3 +61,26 @@ class TestJsonManager(TestCase):
         self.assertEqual(buildings4[0].extra_data['counter'], '1001')
         self.assertEqual(buildings4[1].extra_data['counter'], '10')
         self.assertEqual(buildings4[2].extra_data.get('counter'), None)
+
+    def test_order_by_numeric_unit(self):
+        """Test that values of Float columns are compared as numbers in the database."""
+        for counter in ['9', '10', 'not a number']:
+            b = BuildingSnapshot.objects.create(source_type=3)
+            b.extra_data = {'counter': counter}
+            b.save()
+
+        unit = Unit.objects.create(unit_name='count', unit_type=FLOAT)
+        buildings = BuildingSnapshot.objects.filter(source_type=3).json_order_by(
+            'counter', order_by='counter', unit=unit
+        )
+        self.assertTrue(isinstance(buildings, QuerySet))
+        self.assertEqual(
+            [b.extra_data['counter'] for b in buildings], ['not a number', '9', '10']
+        )
+
+        buildings = BuildingSnapshot.objects.filter(source_type=3).json_order_by(
+            'counter', order_by='counter', order_by_rev=True, unit=unit
+        )
+        self.assertEqual(
+            [b.extra_data['counter'] for b in buildings[:2]], ['10', '9']
+        )
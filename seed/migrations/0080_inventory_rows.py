@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2018-01-08 10:14
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+import seed.serializers.pint
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orgs', '0003_auto_20160412_1123'),
+        ('seed', '0079_propertystate_ubid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyInventoryRow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state_id', models.IntegerField()),
+                ('campus', models.BooleanField(default=False)),
+                ('label_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None)),
+                ('related_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None)),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(default=dict, encoder=seed.serializers.pint.PintJSONEncoder)),
+                ('related', django.contrib.postgres.fields.jsonb.JSONField(default=list, encoder=seed.serializers.pint.PintJSONEncoder)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='seed.Cycle')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='orgs.Organization')),
+                ('view', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_row', to='seed.PropertyView')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaxLotInventoryRow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state_id', models.IntegerField()),
+                ('campus', models.BooleanField(default=False)),
+                ('label_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None)),
+                ('related_ids', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, default=list, size=None)),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField(default=dict, encoder=seed.serializers.pint.PintJSONEncoder)),
+                ('related', django.contrib.postgres.fields.jsonb.JSONField(default=list, encoder=seed.serializers.pint.PintJSONEncoder)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='seed.Cycle')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='orgs.Organization')),
+                ('view', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_row', to='seed.TaxLotView')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='taxlotinventoryrow',
+            index_together=set([('organization', 'cycle', 'view')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='propertyinventoryrow',
+            index_together=set([('organization', 'cycle', 'view')]),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2018-01-10 09:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# Cast text to a float, returning NULL if the text is not a number. Declared IMMUTABLE so that it
+# can be used in the expression indexes of the extra data columns (see seed/utils/extra_data.py).
+CREATE_TRY_FLOAT = """\
+    CREATE OR REPLACE FUNCTION seed_try_float(value text) RETURNS double precision AS $$
+    BEGIN
+        RETURN value::double precision;
+    EXCEPTION WHEN others THEN
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql IMMUTABLE;
+"""
+
+DROP_TRY_FLOAT = """\
+    DROP FUNCTION IF EXISTS seed_try_float(text);
+"""
+
+# GIN indexes for containment (@>) and key existence queries on all of the extra data. Built
+# concurrently (hence the non-atomic migration) so that the state tables are not locked.
+CREATE_GIN_INDEXES = [
+    "CREATE INDEX CONCURRENTLY seed_propertystate_extra_data_gin "
+    "ON seed_propertystate USING gin (extra_data jsonb_path_ops);",
+    "CREATE INDEX CONCURRENTLY seed_taxlotstate_extra_data_gin "
+    "ON seed_taxlotstate USING gin (extra_data jsonb_path_ops);",
+]
+
+DROP_GIN_INDEXES = [
+    "DROP INDEX CONCURRENTLY IF EXISTS seed_propertystate_extra_data_gin;",
+    "DROP INDEX CONCURRENTLY IF EXISTS seed_taxlotstate_extra_data_gin;",
+]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('seed', '0080_inventory_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='column',
+            name='is_indexed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunSQL(CREATE_TRY_FLOAT, DROP_TRY_FLOAT),
+        migrations.RunSQL(CREATE_GIN_INDEXES, DROP_GIN_INDEXES),
+    ]
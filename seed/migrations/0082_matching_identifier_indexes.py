@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2018-01-11 14:05
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Organization scoped indexes on the identifiers used to match and look up states. The exact
+# lookups (query_property_matches, matching on the normalized address) use the plain column
+# indexes, the case insensitive lookups (PropertyStateFilterSet.identifier_filter) use the
+# UPPER() expression indexes, which is the expression Django generates for iexact. The indexes
+# are built concurrently (hence the non-atomic migration) so the state tables stay writable.
+INDEXES = [
+    ('seed_propertystate', 'seed_ps_org_pm_property_id', 'organization_id, pm_property_id'),
+    ('seed_propertystate', 'seed_ps_org_custom_id_1', 'organization_id, custom_id_1'),
+    ('seed_propertystate', 'seed_ps_org_ubid', 'organization_id, ubid'),
+    ('seed_propertystate', 'seed_ps_org_normalized_address', 'organization_id, normalized_address'),
+    ('seed_propertystate', 'seed_ps_org_jurisdiction_property_id',
+     'organization_id, jurisdiction_property_id'),
+    ('seed_propertystate', 'seed_ps_org_home_energy_score_id',
+     'organization_id, home_energy_score_id'),
+    ('seed_propertystate', 'seed_ps_org_upper_custom_id_1',
+     'organization_id, UPPER(custom_id_1::text)'),
+    ('seed_propertystate', 'seed_ps_org_upper_ubid', 'organization_id, UPPER(ubid::text)'),
+    ('seed_propertystate', 'seed_ps_org_upper_jurisdiction_property_id',
+     'organization_id, UPPER(jurisdiction_property_id::text)'),
+    ('seed_taxlotstate', 'seed_tls_org_jurisdiction_tax_lot_id',
+     'organization_id, jurisdiction_tax_lot_id'),
+    ('seed_taxlotstate', 'seed_tls_org_normalized_address', 'organization_id, normalized_address'),
+]
+
+CREATE_INDEXES = [
+    'CREATE INDEX CONCURRENTLY {} ON {} ({});'.format(name, table, columns)
+    for table, name, columns in INDEXES
+]
+
+DROP_INDEXES = [
+    'DROP INDEX CONCURRENTLY IF EXISTS {};'.format(name) for _, name, _ in INDEXES
+]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('seed', '0081_extra_data_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEXES, DROP_INDEXES),
+    ]
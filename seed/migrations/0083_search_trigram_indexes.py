@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2018-01-12 11:20
+from __future__ import unicode_literals
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Trigram indexes for the inventory quick search and autocomplete (see seed/search.py). Django
+# generates UPPER(field::text) LIKE UPPER(%s) for icontains and istartswith, so the indexes are
+# on that expression. They are built concurrently (hence the non-atomic migration).
+INDEXES = [
+    ('seed_propertystate', 'seed_ps_trgm_address_line_1', 'address_line_1'),
+    ('seed_propertystate', 'seed_ps_trgm_property_name', 'property_name'),
+    ('seed_propertystate', 'seed_ps_trgm_pm_property_id', 'pm_property_id'),
+    ('seed_propertystate', 'seed_ps_trgm_jurisdiction_property_id', 'jurisdiction_property_id'),
+    ('seed_propertystate', 'seed_ps_trgm_custom_id_1', 'custom_id_1'),
+    ('seed_taxlotstate', 'seed_tls_trgm_address_line_1', 'address_line_1'),
+    ('seed_taxlotstate', 'seed_tls_trgm_jurisdiction_tax_lot_id', 'jurisdiction_tax_lot_id'),
+    ('seed_taxlotstate', 'seed_tls_trgm_custom_id_1', 'custom_id_1'),
+]
+
+CREATE_INDEXES = [
+    'CREATE INDEX CONCURRENTLY {} ON {} '
+    'USING gin (UPPER({}::text) gin_trgm_ops);'.format(name, table, column)
+    for table, name, column in INDEXES
+]
+
+DROP_INDEXES = [
+    'DROP INDEX CONCURRENTLY IF EXISTS {};'.format(name) for _, name, _ in INDEXES
+]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('seed', '0082_matching_identifier_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(CREATE_INDEXES, DROP_INDEXES),
+    ]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2018-01-15 09:42
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0083_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSeriesRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('begin_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('reading_count', models.IntegerField(default=0)),
+                ('reading_sum', models.FloatField(null=True)),
+                ('reading_min', models.FloatField(null=True)),
+                ('reading_max', models.FloatField(null=True)),
+                ('cost', models.DecimalField(decimal_places=4, max_digits=16, null=True)),
+                ('meter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='seed.Meter')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='timeseriesrollup',
+            unique_together=set([('meter', 'period', 'begin_time')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='timeseries',
+            index_together=set([('begin_time', 'end_time'), ('meter', 'begin_time')]),
+        ),
+    ]
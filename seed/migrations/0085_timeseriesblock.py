@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2018-01-16 14:05
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0084_timeseriesrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimeSeriesBlock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('interval_seconds', models.IntegerField()),
+                ('readings', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), default=list, size=None)),
+                ('costs', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), default=list, size=None)),
+                ('meter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='seed.Meter')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='timeseriesblock',
+            unique_together=set([('meter', 'start_time')]),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.6 on 2018-01-24 10:12
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+# Materialize the ancestors of the existing audit logs by walking the parent1/parent2 relations
+ANCESTORS_SQL = """
+    WITH RECURSIVE ancestors(id, ancestor_id) AS (
+        SELECT l.id, p.parent_id
+        FROM {table} l
+        CROSS JOIN LATERAL (VALUES (l.parent1_id), (l.parent2_id)) p(parent_id)
+        WHERE p.parent_id IS NOT NULL
+      UNION
+        SELECT a.id, p.parent_id
+        FROM ancestors a
+        JOIN {table} l ON l.id = a.ancestor_id
+        CROSS JOIN LATERAL (VALUES (l.parent1_id), (l.parent2_id)) p(parent_id)
+        WHERE p.parent_id IS NOT NULL
+    )
+    UPDATE {table} l
+    SET ancestor_ids = a.ancestor_ids
+    FROM (
+        SELECT id, array_agg(ancestor_id ORDER BY ancestor_id) AS ancestor_ids
+        FROM ancestors
+        GROUP BY id
+    ) a
+    WHERE l.id = a.id;
+
+    UPDATE {table} SET ancestor_ids = '{{}}' WHERE ancestor_ids IS NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seed', '0085_timeseriesblock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyauditlog',
+            name='ancestor_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='taxlotauditlog',
+            name='ancestor_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, null=True, size=None),
+        ),
+        migrations.RunSQL(
+            ANCESTORS_SQL.format(table='seed_propertyauditlog'), migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            ANCESTORS_SQL.format(table='seed_taxlotauditlog'), migrations.RunSQL.noop
+        ),
+    ]
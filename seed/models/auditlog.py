@@ -9,3 +9,47 @@ DATA_UPDATE_TYPE = (
     (AUDIT_USER_EDIT, "UserEdit"),
     (AUDIT_USER_CREATE, "UserCreate")
 )
+
+
+def get_ancestor_ids(audit_log_model, parent_ids):
+    """
+    Return the ids of the parents of a new audit log and of all of their ancestors, i.e. the
+    materialized lineage of the new audit log. The lineage of audit logs that were created without
+    one (e.g. by bulk_create) is not included, their ancestors are loaded through the parents.
+
+    :param audit_log_model: PropertyAuditLog or TaxLotAuditLog
+    :param parent_ids: list, ids of parent1 and parent2 (may be None)
+    :return: list of ids, sorted
+    """
+    parent_ids = [parent_id for parent_id in parent_ids if parent_id is not None]
+    ancestor_ids = set(parent_ids)
+    if parent_ids:
+        for ids in audit_log_model.objects.filter(pk__in=parent_ids).values_list(
+                'ancestor_ids', flat=True):
+            ancestor_ids.update(ids or [])
+    return sorted(ancestor_ids)
+
+
+def prefetch_lineage(audit_log):
+    """
+    Load the ancestors of an audit log and their states in one query and link them through the
+    parent1/parent2 relations, so that walking the history does not fetch each parent separately.
+
+    :param audit_log: PropertyAuditLog or TaxLotAuditLog, or None
+    :return: the audit log
+    """
+    if audit_log is None or not audit_log.ancestor_ids:
+        return audit_log
+
+    logs = {
+        log.id: log for log in type(audit_log).objects.select_related('state').filter(
+            pk__in=audit_log.ancestor_ids
+        )
+    }
+    logs[audit_log.id] = audit_log
+    for log in logs.values():
+        if log.parent1_id in logs:
+            log.parent1 = logs[log.parent1_id]
+        if log.parent2_id in logs:
+            log.parent2 = logs[log.parent2_id]
+    return audit_log
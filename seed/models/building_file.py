@@ -6,6 +6,7 @@
 """
 from __future__ import unicode_literals
 
+import collections
 import logging
 
 from django.db import models
@@ -14,6 +15,7 @@ from seed.building_sync.building_sync import BuildingSync
 from seed.hpxml.hpxml import HPXML as HPXMLParser
 from seed.lib.mappings.mapping_data import MappingData
 from seed.lib.merging.merging import merge_state, get_state_attrs
+from seed.models.inventory_rows import refresh_inventory_rows
 from seed.models import (
     PropertyState,
     Column,
@@ -83,13 +85,71 @@ class BuildingFile(models.Model):
         else:
             return None
 
-    def process(self, organization_id, cycle, property_view=None):
+    @classmethod
+    def preload(cls, organization_id):
+        """
+        Load the organization's data that is needed to process building files, so that a batch of
+        files can be processed without querying it for every file.
+
+        :param organization_id: integer, ID of organization
+        :return: dict, measures as {(category, name): id} and the names of the extra data columns
+        """
+        return {
+            'measures': {
+                (category, name): pk for category, name, pk in Measure.objects.filter(
+                    organization_id=organization_id).values_list('category', 'name', 'id')
+            },
+            'columns': set(Column.objects.filter(
+                organization_id=organization_id,
+                table_name='PropertyState',
+                is_extra_data=True,
+            ).values_list('column_name', flat=True)),
+        }
+
+    @classmethod
+    def create_extra_data_columns(cls, organization_id, file_types, preloaded):
+        """
+        Create the extra data columns for the keys that the parsers of the file types can return
+        and that are not PropertyState fields. A batch creates them once before its files are
+        processed in parallel, as the columns are not unique and each worker would otherwise
+        create the same new columns.
+
+        :param organization_id: integer, ID of organization
+        :param file_types: list, file types of the building files
+        :param preloaded: dict, result of BuildingFile.preload for the organization. The new
+            columns are added to it.
+        """
+        keys = set()
+        for file_type in file_types:
+            if file_type == cls.BUILDINGSYNC:
+                keys.update(BuildingSync.BRICR_STRUCT['return'].keys())
+            elif file_type == cls.HPXML:
+                keys.update(HPXMLParser.HPXML_STRUCT.keys())
+                keys.update(HPXMLParser.PROCESS_KEYS)
+
+        md = MappingData()
+        for k in sorted(keys - preloaded['columns']):
+            if not md.find_column('PropertyState', k):
+                Column.objects.get_or_create(
+                    organization_id=organization_id,
+                    column_name=k,
+                    table_name='PropertyState',
+                    is_extra_data=True,
+                )
+                preloaded['columns'].add(k)
+
+    def process(self, organization_id, cycle, property_view=None, skip_validation=False,
+                preloaded=None):
         """
         Process the building file that was uploaded and create the correct models for the object
 
         :param organization_id: integer, ID of organization
         :param cycle: object, instance of cycle object
         :param property_view: Existing property view of the building file that will be updated from merging the property_view.state
+        :param skip_validation: bool, do not validate HPXML files against the schema. Only use for
+            trusted files (e.g. bulk loads of files that were already validated).
+        :param preloaded: dict, result of BuildingFile.preload for the organization. New extra
+            data columns are added to it.
         :return: list, [status, (PropertyState|None), (PropertyView|None), messages]
         """
 
@@ -100,8 +160,13 @@ class BuildingFile(models.Model):
             )
             return False, None, None, "File format was not one of: {}".format(acceptable_file_types)
 
-        parser = Parser()
+        if self.file_type == self.HPXML:
+            parser = Parser(validate=not skip_validation)
+        else:
+            parser = Parser()
         parser.import_file(self.file.path)
+        if getattr(parser, 'import_seconds', None) is not None:
+            _log.info('Parsed building file {} in {:.3f}s'.format(self.pk, parser.import_seconds))
         parser_args = []
         parser_kwargs = {}
         if self.file_type == self.BUILDINGSYNC:
@@ -111,6 +176,9 @@ class BuildingFile(models.Model):
         if errors or not data:
             return False, None, None, messages
 
+        if preloaded is None:
+            preloaded = self.preload(organization_id)
+
         # sub-select the data that are needed to create the PropertyState object
         md = MappingData()
         create_data = {"organization_id": organization_id}
@@ -128,19 +196,19 @@ class BuildingFile(models.Model):
                 # doesn't exist yet.
                 extra_data[k] = v
                 # create columns, if needed, for the extra_data fields
-
-                Column.objects.get_or_create(
-                    organization_id=organization_id,
-                    column_name=k,
-                    table_name='PropertyState',
-                    is_extra_data=True,
-                )
+                if k not in preloaded['columns']:
+                    Column.objects.get_or_create(
+                        organization_id=organization_id,
+                        column_name=k,
+                        table_name='PropertyState',
+                        is_extra_data=True,
+                    )
+                    preloaded['columns'].add(k)
 
         # always create the new object, then decide if we need to merge it.
         # create a new property_state for the object and promote to a new property_view
+        create_data['extra_data'] = extra_data
         property_state = PropertyState.objects.create(**create_data)
-        property_state.extra_data = extra_data
-        property_state.save()
 
         PropertyAuditLog.objects.create(
             organization_id=organization_id,
@@ -155,22 +223,71 @@ class BuildingFile(models.Model):
         self.property_state_id = property_state.id
         self.save()
 
-        # add in the measures
-        for m in data.get('measures', []):
-            # Find the measure in the database
-            try:
-                measure = Measure.objects.get(
-                    category=m['category'], name=m['name'], organization_id=organization_id,
-                )
-            except Measure.DoesNotExist:
+        self._create_measures(data.get('measures', []), preloaded['measures'])
+        self._create_scenarios(data.get('scenarios', []))
+
+        if property_view:
+            # create a new blank state to merge the two together
+            merged_state = PropertyState.objects.create(organization_id=organization_id)
+
+            # assume the same cycle id as the former state.
+            # should merge_state also copy/move over the relationships?
+            merged_state, changed = merge_state(merged_state, property_view.state, property_state,
+                                                get_state_attrs([property_view.state, property_state]))
+
+            # log the merge
+            # Not a fan of the parent1/parent2 logic here, seems error prone, what this
+            # is also in here: https://github.com/SEED-platform/seed/blob/63536e99cf5be3a9a86391c5cead6dd4ff74462b/seed/data_importer/tasks.py#L1549
+            PropertyAuditLog.objects.create(
+                organization_id=organization_id,
+                parent1=PropertyAuditLog.objects.filter(state=property_view.state).first(),
+                parent2=PropertyAuditLog.objects.filter(state=property_state).first(),
+                parent_state1=property_view.state,
+                parent_state2=property_state,
+                state=merged_state,
+                name='System Match',
+                description='Automatic Merge',
+                import_filename=None,
+                record_type=AUDIT_IMPORT
+            )
+
+            property_view.state = merged_state
+            property_view.save()
+
+            merged_state.merge_state = MERGE_STATE_MERGED
+            merged_state.save()
+
+            # set the property_state to the new one
+            property_state = merged_state
+        elif not property_view:
+            property_view = property_state.promote(cycle)
+        else:
+            # invalid arguments, must pass both or neither
+            return False, None, None, "Invalid arguments passed to BuildingFile.process()"
+
+        refresh_inventory_rows(property_view_ids=[property_view.pk])
+
+        return True, property_state, property_view, messages
+
+    def _create_measures(self, measures, measure_ids):
+        """
+        Bulk create the PropertyMeasures of the file's new property state. Measures that are not
+        defined for the organization are skipped.
+
+        :param measures: list, measures returned by the parser
+        :param measure_ids: dict, {(category, name): Measure id} of the organization
+        """
+        property_measures = collections.OrderedDict()
+        for m in measures:
+            measure_id = measure_ids.get((m['category'], m['name']))
+            if measure_id is None:
                 # TODO: Deal with it
                 continue
 
-            # Add the measure to the join table.
             # Need to determine what constitutes the unique measure for a property
-            join, _ = PropertyMeasure.objects.get_or_create(
+            join = PropertyMeasure(
                 property_state_id=self.property_state_id,
-                measure_id=measure.pk,
+                measure_id=measure_id,
                 implementation_status=PropertyMeasure.str_to_impl_status(m['implementation_status']),
                 application_scale=PropertyMeasure.str_to_application_scale(
                     m.get('application_scale_of_application',
@@ -189,19 +306,33 @@ class BuildingFile(models.Model):
             join.cost_material = m.get('measure_material_cost')
             join.cost_capital_replacement = m.get('measure_capital_replacement_cost')
             join.cost_residual_value = m.get('measure_residual_value')
-            join.save()
 
-        # add in scenarios
-        for s in data.get('scenarios', []):
-            # measures = models.ManyToManyField(PropertyMeasure)
+            # a later duplicate of the same measure updates the earlier one
+            key = (join.measure_id, join.implementation_status, join.application_scale,
+                   join.category_affected, join.recommended)
+            property_measures[key] = join
 
-            # {'reference_case': u'Baseline', 'annual_savings_site_energy': None,
-            #  'measures': [], 'id': u'Baseline', 'name': u'Baseline'}
+        PropertyMeasure.objects.bulk_create(property_measures.values())
 
-            scenario, _ = Scenario.objects.get_or_create(
-                name=s.get('name'),
-                property_state_id=self.property_state_id,
-            )
+    def _create_scenarios(self, scenarios):
+        """
+        Bulk create the Scenarios of the file's new property state, along with their reference
+        cases and measures.
+
+        :param scenarios: list, scenarios returned by the parser, e.g.
+            {'reference_case': u'Baseline', 'annual_savings_site_energy': None,
+             'measures': [], 'id': u'Baseline', 'name': u'Baseline'}
+        """
+        if not scenarios:
+            return
+
+        by_name = collections.OrderedDict()
+        for s in scenarios:
+            # a later duplicate of the same name updates the earlier one
+            scenario = by_name.get(s.get('name'))
+            if scenario is None:
+                scenario = Scenario(name=s.get('name'), property_state_id=self.property_state_id)
+                by_name[s.get('name')] = scenario
             scenario.description = s.get('description')
             scenario.annual_site_energy_savings = s.get('annual_site_energy_savings')
             scenario.annual_source_energy_savings = s.get('annual_source_energy_savings')
@@ -216,68 +347,29 @@ class BuildingFile(models.Model):
             # temporal_status = models.IntegerField(choices=TEMPORAL_STATUS_TYPES,
             #                                       default=TEMPORAL_STATUS_CURRENT)
 
-            if s.get('reference_case'):
-                ref_case = Scenario.objects.filter(
-                    name=s.get('reference_case'),
-                    property_state_id=self.property_state_id,
-                )
-                if len(ref_case) == 1:
-                    scenario.reference_case = ref_case.first()
-
-            # set the list of measures
-            for measure_name in s['measures']:
-                # find the join measure in the database
-                measure = None
-                try:
-                    measure = PropertyMeasure.objects.get(
-                        property_state_id=self.property_state_id,
-                        property_measure_name=measure_name,
-                    )
-                except PropertyMeasure.DoesNotExist:
-                    # PropertyMeasure is not in database, skipping silently
-                    continue
-
-                scenario.measures.add(measure)
-
-            scenario.save()
-
-        if property_view:
-            # create a new blank state to merge the two together
-            merged_state = PropertyState.objects.create(organization_id=organization_id)
-
-            # assume the same cycle id as the former state.
-            # should merge_state also copy/move over the relationships?
-            merged_state, changed = merge_state(merged_state, property_view.state, property_state,
-                                                get_state_attrs([property_view.state, property_state]))
-
-            # log the merge
-            # Not a fan of the parent1/parent2 logic here, seems error prone, what this
-            # is also in here: https://github.com/SEED-platform/seed/blob/63536e99cf5be3a9a86391c5cead6dd4ff74462b/seed/data_importer/tasks.py#L1549
-            PropertyAuditLog.objects.create(
-                organization_id=organization_id,
-                parent1=PropertyAuditLog.objects.filter(state=property_view.state).first(),
-                parent2=PropertyAuditLog.objects.filter(state=property_state).first(),
-                parent_state1=property_view.state,
-                parent_state2=property_state,
-                state=merged_state,
-                name='System Match',
-                description='Automatic Merge',
-                import_filename=None,
-                record_type=AUDIT_IMPORT
-            )
+        Scenario.objects.bulk_create(by_name.values())
 
-            property_view.state = merged_state
-            property_view.save()
+        measure_ids = dict(PropertyMeasure.objects.filter(
+            property_state_id=self.property_state_id,
+        ).values_list('property_measure_name', 'id'))
 
-            merged_state.merge_state = MERGE_STATE_MERGED
-            merged_state.save()
+        through = Scenario.measures.through
+        links = set()
+        for s in scenarios:
+            scenario = by_name[s.get('name')]
+            reference_case = None
+            if s.get('reference_case'):
+                reference_case = by_name.get(s['reference_case'])
+            if reference_case is not None and scenario.reference_case_id != reference_case.pk:
+                scenario.reference_case = reference_case
+                Scenario.objects.filter(pk=scenario.pk).update(reference_case=reference_case)
 
-            # set the property_state to the new one
-            property_state = merged_state
-        elif not property_view:
-            property_view = property_state.promote(cycle)
-        else:
-            # invalid arguments, must pass both or neither
-            return False, None, None, "Invalid arguments passed to BuildingFile.process()"
+            # set the list of measures, PropertyMeasures that are not in the database are skipped
+            for measure_name in s['measures']:
+                if measure_name in measure_ids:
+                    links.add((scenario.pk, measure_ids[measure_name]))
 
-        return True, property_state, property_view, messages
+        through.objects.bulk_create([
+            through(scenario_id=scenario_id, propertymeasure_id=measure_id)
+            for scenario_id, measure_id in sorted(links)
+        ])
@@ -11,7 +11,7 @@ import logging
 import os.path
 from collections import OrderedDict
 
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.utils.translation import ugettext_lazy as _
 
@@ -24,6 +24,7 @@ from seed.models.models import (
     SEED_DATA_SOURCES,
 )
 from seed.utils.constants import VIEW_COLUMNS_PROPERTY
+from seed.utils.extra_data import drop_index
 from seed.utils.strings import titlecase
 
 # This is the inverse mapping of the property and tax lots that are prepended to the fields
@@ -120,6 +121,8 @@ class Column(models.Model):
     unit = models.ForeignKey(Unit, blank=True, null=True)
     enum = models.ForeignKey(Enum, blank=True, null=True)
     is_extra_data = models.BooleanField(default=False)
+    # extra data columns can be indexed to speed up filtering and sorting (see utils/extra_data.py)
+    is_indexed = models.BooleanField(default=False)
     import_file = models.ForeignKey('data_importer.ImportFile', blank=True, null=True)
     units_pint = models.CharField(max_length=64, blank=True, null=True)
 
@@ -132,6 +135,26 @@ class Column(models.Model):
     def __unicode__(self):
         return u'{} - {}'.format(self.pk, self.column_name)
 
+    def save(self, *args, **kwargs):
+        """
+        The name of the extra data index of a column is derived from its column_name, so renaming
+        an indexed column drops the index of the old name and rebuilds it under the new one.
+        """
+        old_column = None
+        if self.pk and self.is_indexed:
+            old_column = Column.objects.filter(pk=self.pk).exclude(
+                column_name=self.column_name).first()
+
+        super(Column, self).save(*args, **kwargs)
+
+        if old_column is not None:
+            from seed.tasks import sync_extra_data_index
+
+            drop_index(old_column)
+            # the task reads the column, so only queue it once the new name is committed
+            pk = self.pk
+            transaction.on_commit(lambda: sync_extra_data_index.delay(pk))
+
     @staticmethod
     def create_mappings_from_file(filename, organization, user, import_file_id=None):
         """
@@ -479,7 +502,8 @@ class Column(models.Model):
             'organization_id': self.organization.id,
             'table_name': self.table_name,
             'column_name': self.column_name,
-            'is_extra_data': self.is_extra_data
+            'is_extra_data': self.is_extra_data,
+            'is_indexed': self.is_indexed,
         }
         if self.unit:
             c['unit_name'] = self.unit.unit_name
@@ -499,6 +523,9 @@ class Column(models.Model):
         :param organization: instance, Organization
         :return: [int, int] Number of columns, column_mappings records that were deleted
         """
+        for column in Column.objects.filter(organization=organization, is_indexed=True):
+            drop_index(column)
+
         cm_delete_count, _ = ColumnMapping.objects.filter(super_organization=organization).delete()
         c_count, _ = Column.objects.filter(organization=organization).delete()
         return [c_count, cm_delete_count]
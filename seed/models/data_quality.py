@@ -22,6 +22,7 @@ from seed.models import (
     StatusLabel,
     PropertyView, TaxLotView)
 from seed.models import obj_to_dict
+from seed.models.inventory_rows import refresh_inventory_rows
 from seed.utils.cache import (
     set_cache_raw, get_cache_raw
 )
@@ -524,6 +525,9 @@ class DataQualityCheck(models.Model):
         # set in check_data
         self.column_lookup = {}
 
+        # ids of the properties/tax lots whose status labels were added or removed by the checks
+        self.relabeled_ids = set()
+
         super(DataQualityCheck, self).__init__(*args, **kwargs)
 
     @staticmethod
@@ -585,6 +589,16 @@ class DataQualityCheck(models.Model):
             # Run the checks
             self._check(rules, row)
 
+        # the labels are copied to the inventory rows of all of the views of the records
+        if self.relabeled_ids:
+            if record_type == 'PropertyState':
+                refresh_inventory_rows(property_view_ids=PropertyView.objects.filter(
+                    property_id__in=self.relabeled_ids).values_list('id', flat=True))
+            else:
+                refresh_inventory_rows(taxlot_view_ids=TaxLotView.objects.filter(
+                    taxlot_id__in=self.relabeled_ids).values_list('id', flat=True))
+            self.relabeled_ids = set()
+
         # Prune the results will remove any entries that have zero data_quality_results
         for k, v in self.results.items():
             if not v['data_quality_results']:
@@ -865,11 +879,13 @@ class DataQualityCheck(models.Model):
 
         if rule.status_label_id is not None and linked_id is not None:
             if rule.table_name == 'PropertyState':
-                label_class.objects.get_or_create(property_id=linked_id,
-                                                  statuslabel_id=rule.status_label_id)
+                _, created = label_class.objects.get_or_create(
+                    property_id=linked_id, statuslabel_id=rule.status_label_id)
             else:
-                label_class.objects.get_or_create(taxlot_id=linked_id,
-                                                  statuslabel_id=rule.status_label_id)
+                _, created = label_class.objects.get_or_create(
+                    taxlot_id=linked_id, statuslabel_id=rule.status_label_id)
+            if created:
+                self.relabeled_ids.add(linked_id)
             return True
 
     def remove_status_label(self, label_class, rule, linked_id):
@@ -883,11 +899,13 @@ class DataQualityCheck(models.Model):
         """
 
         if rule.table_name == 'PropertyState':
-            label_class.objects.filter(property_id=linked_id,
-                                       statuslabel_id=rule.status_label_id).delete()
+            deleted, _ = label_class.objects.filter(property_id=linked_id,
+                                                    statuslabel_id=rule.status_label_id).delete()
         else:
-            label_class.objects.filter(taxlot_id=linked_id,
-                                       statuslabel_id=rule.status_label_id).delete()
+            deleted, _ = label_class.objects.filter(taxlot_id=linked_id,
+                                                    statuslabel_id=rule.status_label_id).delete()
+        if deleted:
+            self.relabeled_ids.add(linked_id)
 
     def retrieve_result_by_address(self, address):
         """
@@ -0,0 +1,342 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from __future__ import unicode_literals
+
+import logging
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.db import models, transaction
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from seed.lib.mcm.utils import batch
+from seed.lib.superperms.orgs.models import Organization
+from seed.models.cycles import Cycle
+from seed.models.properties import Property, PropertyView
+from seed.models.tax_lot_properties import TaxLotProperty
+from seed.models.tax_lots import TaxLotView
+from seed.serializers.pint import PintJSONEncoder
+from seed.utils.pagination import paginate_views
+
+_log = logging.getLogger(__name__)
+
+# Keys that TaxLotProperty.get_related always returns on the related objects, regardless of the
+# columns that were requested.
+RELATED_ALWAYS_KEYS = ['id', 'primary', 'calculated_taxlot_ids', 'property_view_id',
+                       'taxlot_view_id']
+
+
+def inventory_read_model_enabled():
+    """Return True if the denormalized inventory read model is turned on in the settings"""
+    return getattr(settings, 'SEED_INVENTORY_READ_MODEL', False)
+
+
+class InventoryRow(models.Model):
+    """
+    Denormalized, flattened copy of a PropertyView or TaxLotView as returned by
+    TaxLotProperty.get_related. The rows are keyed on the view and partitioned by organization
+    and cycle so that the inventory list, filter and export endpoints can read a single indexed
+    table instead of rebuilding the rows from the views, states, extra data, joins and labels on
+    every request.
+
+    The rows are maintained incrementally by `refresh_inventory_rows` and can be rebuilt for an
+    entire organization/cycle with the `refresh_inventory_rows` management command.
+    """
+    organization = models.ForeignKey(Organization)
+    cycle = models.ForeignKey(Cycle, on_delete=models.CASCADE)
+    state_id = models.IntegerField()
+    campus = models.BooleanField(default=False)
+    label_ids = ArrayField(models.IntegerField(), default=list, blank=True)
+    # ids of the related Property/TaxLot (not the views), as returned in related[]['id']
+    related_ids = ArrayField(models.IntegerField(), default=list, blank=True)
+
+    # the flattened state, extra data and view data without the related objects
+    data = JSONField(default=dict, encoder=PintJSONEncoder)
+    # the unfiltered list of related objects
+    related = JSONField(default=list, encoder=PintJSONEncoder)
+
+    updated = models.DateTimeField(auto_now=True)
+
+    # set on the subclasses
+    parent_name = None
+    related_column_key = None
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def _view_class(cls):
+        return cls._meta.get_field('view').related_model
+
+    @classmethod
+    def build_rows(cls, view_ids):
+        """
+        Create (or replace) the rows for the given view ids.
+
+        :param view_ids: list, PropertyView or TaxLotView ids
+        :return: dict, view id to InventoryRow
+        """
+        view_class = cls._view_class()
+        parent_name = cls.parent_name
+        label_through = view_class._meta.get_field(parent_name).related_model.labels.through
+
+        rows = {}
+        for ids in batch(list(set(view_ids)), 500):
+            views = list(view_class.objects.select_related(parent_name, 'state', 'cycle').filter(
+                pk__in=ids).order_by('id'))
+            if not views:
+                continue
+
+            parent_field = '{}_id'.format(parent_name)
+            label_map = {}
+            for parent_id, label_id in label_through.objects.filter(**{
+                '{}__in'.format(parent_field): [getattr(v, parent_field) for v in views]
+            }).values_list(parent_field, 'statuslabel_id'):
+                label_map.setdefault(parent_id, []).append(label_id)
+
+            new_rows = []
+            for view, datum in zip(views, TaxLotProperty.get_related(views, None)):
+                related = datum.pop('related', [])
+                parent = getattr(view, parent_name)
+                new_rows.append(cls(
+                    view_id=view.pk,
+                    organization_id=parent.organization_id,
+                    cycle_id=view.cycle_id,
+                    state_id=view.state_id,
+                    campus=getattr(parent, 'campus', False),
+                    label_ids=sorted(label_map.get(parent.pk, [])),
+                    related_ids=sorted(set(r['id'] for r in related if r.get('id') is not None)),
+                    data=datum,
+                    related=related,
+                ))
+
+            with transaction.atomic():
+                cls.objects.filter(view_id__in=[v.pk for v in views]).delete()
+                cls.objects.bulk_create(new_rows)
+
+            for row in new_rows:
+                rows[row.view_id] = row
+
+        return rows
+
+    @classmethod
+    def refresh_cycle(cls, organization_id, cycle_id):
+        """Rebuild all of the rows of an organization's cycle"""
+        view_ids = list(cls._view_class().objects.filter(**{
+            '{}__organization_id'.format(cls.parent_name): organization_id,
+            'cycle_id': cycle_id,
+        }).values_list('id', flat=True))
+
+        cls.objects.filter(organization_id=organization_id, cycle_id=cycle_id).exclude(
+            view_id__in=view_ids).delete()
+        return len(cls.build_rows(view_ids))
+
+    @classmethod
+    def cycle_rows(cls, organization_id, cycle_id):
+        """
+        Return the rows of an organization's cycle ordered by view id, for filtering, sorting and
+        paginating the inventory on the rows. The rows of views that do not have one yet are built
+        first, so the result is always complete.
+
+        :param organization_id: int, organization of the inventory
+        :param cycle_id: int, cycle of the views
+        :return: QuerySet of InventoryRows
+        """
+        missing = list(cls._view_class().objects.filter(**{
+            '{}__organization_id'.format(cls.parent_name): organization_id,
+            'cycle_id': cycle_id,
+            'inventory_row__isnull': True,
+        }).values_list('id', flat=True))
+        if missing:
+            _log.debug('Building {} missing inventory rows'.format(len(missing)))
+            cls.build_rows(missing)
+
+        return cls.objects.filter(
+            organization_id=organization_id, cycle_id=cycle_id
+        ).order_by('view_id')
+
+    @classmethod
+    def related_data(cls, rows, columns):
+        """
+        Return the flattened data of the rows, with the related objects limited to the columns.
+
+        :param rows: list, InventoryRows
+        :param columns: list, columns (as defined by frontend)
+        :return: list
+        """
+        results = []
+        for row in rows:
+            datum = dict(row.data)
+            datum['related'] = [
+                {key: value for key, value in related.items() if
+                 key in RELATED_ALWAYS_KEYS or key in columns or
+                 "{}_{}".format(cls.related_column_key, key) in columns}
+                for related in row.related
+            ]
+            results.append(datum)
+
+        return results
+
+    @classmethod
+    def get_related(cls, object_list, columns):
+        """
+        Read-model equivalent of TaxLotProperty.get_related. Views that do not have a row yet are
+        built on the fly, so the result is always complete.
+
+        :param object_list: list, PropertyViews or TaxLotViews
+        :param columns: list, columns (as defined by frontend)
+        :return: list
+        """
+        view_ids = [obj.pk for obj in object_list]
+        rows = {row.view_id: row for row in cls.objects.filter(view_id__in=view_ids)}
+
+        missing = [view_id for view_id in view_ids if view_id not in rows]
+        if missing:
+            _log.debug('Building {} missing inventory rows'.format(len(missing)))
+            rows.update(cls.build_rows(missing))
+
+        return cls.related_data([rows[view_id] for view_id in view_ids if view_id in rows], columns)
+
+
+class PropertyInventoryRow(InventoryRow):
+    view = models.OneToOneField('PropertyView', related_name='inventory_row',
+                                on_delete=models.CASCADE)
+
+    parent_name = 'property'
+    related_column_key = 'tax'
+
+    class Meta:
+        index_together = [['organization', 'cycle', 'view']]
+
+    def __unicode__(self):
+        return u'Property Inventory Row - %s' % self.view_id
+
+
+class TaxLotInventoryRow(InventoryRow):
+    view = models.OneToOneField('TaxLotView', related_name='inventory_row',
+                                on_delete=models.CASCADE)
+
+    parent_name = 'taxlot'
+    related_column_key = 'property'
+
+    class Meta:
+        index_together = [['organization', 'cycle', 'view']]
+
+    def __unicode__(self):
+        return u'TaxLot Inventory Row - %s' % self.view_id
+
+
+def get_inventory_related(object_list, columns):
+    """
+    Return the flattened inventory rows for a list of PropertyViews or TaxLotViews. Reads from the
+    inventory read model if it is enabled, otherwise falls back to TaxLotProperty.get_related.
+
+    :param object_list: list, PropertyViews or TaxLotViews
+    :param columns: list, columns (as defined by frontend)
+    :return: list
+    """
+    object_list = list(object_list)
+    if not object_list or not inventory_read_model_enabled():
+        return TaxLotProperty.get_related(object_list, columns)
+
+    if object_list[0].__class__.__name__ == 'PropertyView':
+        return PropertyInventoryRow.get_related(object_list, columns)
+    else:
+        return TaxLotInventoryRow.get_related(object_list, columns)
+
+
+def get_inventory_page(views_list, organization_id, cycle_id, query_params, columns):
+    """
+    Return a page of the flattened inventory of an organization's cycle. If the read model is
+    enabled the inventory is filtered, sorted and paginated on the inventory rows, otherwise on
+    the views, which are then flattened by TaxLotProperty.get_related.
+
+    :param views_list: QuerySet, the cycle's PropertyViews or TaxLotViews ordered by id
+    :param organization_id: int, organization of the inventory
+    :param cycle_id: int, cycle of the views
+    :param query_params: dict, request query parameters with the pagination
+    :param columns: list, columns (as defined by frontend)
+    :return: tuple, (list of flattened rows, pagination dict)
+    :raises InvalidCursor: if the cursor token is not valid
+    """
+    if not inventory_read_model_enabled():
+        views, pagination = paginate_views(views_list, query_params)
+        return TaxLotProperty.get_related(list(views), columns), pagination
+
+    if views_list.model.__name__ == 'PropertyView':
+        row_class = PropertyInventoryRow
+    else:
+        row_class = TaxLotInventoryRow
+
+    # the cursor is the view id, so the pages are the same as when paginating the views
+    rows, pagination = paginate_views(
+        row_class.cycle_rows(organization_id, cycle_id), query_params, key='view_id'
+    )
+    return row_class.related_data(rows, columns), pagination
+
+
+def refresh_inventory_rows(property_view_ids=None, taxlot_view_ids=None):
+    """
+    Rebuild the inventory rows of the given views along with the rows of the views paired to them
+    (which embed the changed data in their related objects). This is a no-op if the read model is
+    not enabled.
+
+    :param property_view_ids: list, PropertyView ids that changed
+    :param taxlot_view_ids: list, TaxLotView ids that changed
+    :return: None
+    """
+    if not inventory_read_model_enabled():
+        return
+
+    property_view_ids = set(property_view_ids or [])
+    taxlot_view_ids = set(taxlot_view_ids or [])
+
+    joined_property_view_ids = set()
+    joined_taxlot_view_ids = set()
+    for ids in batch(list(property_view_ids), 1000):
+        joined_taxlot_view_ids.update(TaxLotProperty.objects.filter(
+            property_view_id__in=ids).values_list('taxlot_view_id', flat=True))
+    for ids in batch(list(taxlot_view_ids), 1000):
+        joined_property_view_ids.update(TaxLotProperty.objects.filter(
+            taxlot_view_id__in=ids).values_list('property_view_id', flat=True))
+
+    PropertyInventoryRow.build_rows(property_view_ids | joined_property_view_ids)
+    TaxLotInventoryRow.build_rows(taxlot_view_ids | joined_taxlot_view_ids)
+
+
+@receiver(post_save, sender=Property)
+def post_save_property(sender, **kwargs):
+    """Rebuild the inventory rows of the Property's views if its campus flag was changed"""
+    if kwargs['created'] or not inventory_read_model_enabled():
+        return
+
+    instance = kwargs['instance']
+    view_ids = list(PropertyInventoryRow.objects.filter(view__property_id=instance.pk).exclude(
+        campus=instance.campus).values_list('view_id', flat=True))
+    if view_ids:
+        refresh_inventory_rows(property_view_ids=view_ids)
+
+
+@receiver(pre_delete, sender=PropertyView)
+def pre_delete_property_view(sender, **kwargs):
+    """
+    Remove the inventory rows of the tax lots paired to the PropertyView, which list it in their
+    related objects. The rows are rebuilt when they are read next.
+    """
+    TaxLotInventoryRow.objects.filter(view__in=TaxLotProperty.objects.filter(
+        property_view_id=kwargs['instance'].pk).values('taxlot_view_id')).delete()
+
+
+@receiver(pre_delete, sender=TaxLotView)
+def pre_delete_taxlot_view(sender, **kwargs):
+    """
+    Remove the inventory rows of the properties paired to the TaxLotView, which list it in their
+    related objects. The rows are rebuilt when they are read next.
+    """
+    PropertyInventoryRow.objects.filter(view__in=TaxLotProperty.objects.filter(
+        taxlot_view_id=kwargs['instance'].pk).values('property_view_id')).delete()
@@ -3,6 +3,10 @@
 :copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 """
 
+from datetime import timedelta
+from itertools import izip_longest
+
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 
 from seed.models import PropertyView, Scenario
@@ -82,4 +86,87 @@ class TimeSeries(models.Model):
     meter = models.ForeignKey(Meter, null=True, blank=True)
 
     class Meta:
-        index_together = [['begin_time', 'end_time']]
+        index_together = [['begin_time', 'end_time'], ['meter', 'begin_time']]
+
+
+class TimeSeriesRollup(models.Model):
+    """
+    Pre-aggregated readings of a meter per hour, day or month, in the server's timezone. The
+    rollups are maintained by seed.utils.timeseries when readings are added and are used to
+    answer downsampled time series requests.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    MONTH = 'month'
+
+    PERIODS = (
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+        (MONTH, 'Month'),
+    )
+
+    meter = models.ForeignKey(Meter, related_name='rollups', on_delete=models.CASCADE)
+    period = models.CharField(max_length=5, choices=PERIODS)
+    begin_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    reading_count = models.IntegerField(default=0)
+    reading_sum = models.FloatField(null=True)
+    reading_min = models.FloatField(null=True)
+    reading_max = models.FloatField(null=True)
+    cost = models.DecimalField(max_digits=16, decimal_places=4, null=True)
+
+    class Meta:
+        unique_together = [['meter', 'period', 'begin_time']]
+
+
+class TimeSeriesBlock(models.Model):
+    """
+    Compact storage of the readings of a meter for one month (in the server's timezone). The
+    readings are packed in arrays; reading i begins at start_time + i * interval_seconds and
+    missing readings are stored as NULL. Used instead of TimeSeries rows when
+    SEED_TIMESERIES_COMPACT_STORAGE is enabled, see seed.utils.timeseries.
+    """
+    meter = models.ForeignKey(Meter, related_name='blocks', on_delete=models.CASCADE)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    interval_seconds = models.IntegerField()
+    readings = ArrayField(models.FloatField(null=True), default=list)
+    costs = ArrayField(models.FloatField(null=True), default=list)
+
+    class Meta:
+        unique_together = [['meter', 'start_time']]
+
+    def set_reading(self, begin_time, reading, cost):
+        """
+        Store a reading in the block. Returns False if the begin time is not aligned on the
+        interval of the block.
+        """
+        offset = int((begin_time - self.start_time).total_seconds())
+        index, remainder = divmod(offset, self.interval_seconds)
+        if remainder or index < 0:
+            return False
+
+        if index >= len(self.readings):
+            self.readings.extend([None] * (index + 1 - len(self.readings)))
+        if index >= len(self.costs):
+            self.costs.extend([None] * (index + 1 - len(self.costs)))
+        self.readings[index] = reading
+        self.costs[index] = cost
+        self.end_time = self.start_time + timedelta(
+            seconds=len(self.readings) * self.interval_seconds)
+        return True
+
+    def expand(self):
+        """
+        Return the readings of the block.
+
+        :return: list of (begin_time, end_time, reading, cost) tuples, without the missing readings
+        """
+        interval = timedelta(seconds=self.interval_seconds)
+        results = []
+        for i, (reading, cost) in enumerate(izip_longest(self.readings, self.costs)):
+            if reading is None and cost is None:
+                continue
+            begin_time = self.start_time + i * interval
+            results.append((begin_time, begin_time + interval, reading, cost))
+        return results
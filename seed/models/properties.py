@@ -11,16 +11,15 @@ import logging
 import pdb
 
 from django.apps import apps
-from django.contrib.postgres.fields import JSONField
-from django.db import IntegrityError
+from django.contrib.postgres.fields import ArrayField, JSONField
 from django.db import models
-from django.db.models.signals import pre_delete, post_save
+from django.db.models.signals import pre_delete, post_delete, post_save
 from django.dispatch import receiver
-from django.forms.models import model_to_dict
 from quantityfield.fields import QuantityField
 
 from auditlog import AUDIT_IMPORT
 from auditlog import DATA_UPDATE_TYPE
+from auditlog import get_ancestor_ids
 from seed.data_importer.models import ImportFile
 from seed.lib.superperms.orgs.models import Organization
 from seed.models import (
@@ -35,6 +34,8 @@ from seed.models import (
 )
 from seed.utils.address import normalize_address_str
 from seed.utils.generic import split_model_fields, obj_to_dict
+from seed.utils.organizations import invalidate_inventory_counts
+from seed.utils.reports import invalidate_report_cache
 from seed.utils.time import convert_datestr
 
 _log = logging.getLogger(__name__)
@@ -194,6 +195,8 @@ class PropertyState(models.Model):
     measures = models.ManyToManyField('Measure', through='PropertyMeasure')
 
     class Meta:
+        # The organization scoped indexes on the matching identifiers are created concurrently in
+        # migration 0082 and are not declared here.
         index_together = [
             ['import_file', 'data_state'],
             ['import_file', 'data_state', 'merge_state'],
@@ -332,6 +335,24 @@ class PropertyState(models.Model):
         :return: dict
         """
 
+        coparents = cls.coparents([state_id]).get(int(state_id), [])
+        return coparents, len(coparents)
+
+    @classmethod
+    def coparents(cls, state_ids):
+        """
+        Return the coparents of a list of PropertyStates in a single query of the
+        PropertyAuditLog table. The state ids need to be the base IDs of when the original
+        records were imported.
+
+        :param state_ids: list of integers, state ids to find the coparents of.
+        :return: dict, state id: list of coparent dicts
+        """
+        result = {}
+        state_ids = [int(state_id) for state_id in state_ids]
+        if not state_ids:
+            return result
+
         coparents = list(
             PropertyState.objects.raw("""
                 WITH creation_id AS (
@@ -339,7 +360,7 @@ class PropertyState(models.Model):
                       pal.id,
                       pal.state_id AS original_state_id
                     FROM seed_propertyauditlog pal
-                    WHERE pal.state_id = %s AND
+                    WHERE pal.state_id = ANY(%s) AND
                           pal.name = 'Import Creation' AND
                           pal.import_filename IS NOT NULL
                 ), audit_id AS (
@@ -399,12 +420,12 @@ class PropertyState(models.Model):
                     ps.analysis_state,
                     ps.analysis_state_message,
                     ps.extra_data,
-                    NULL
+                    aid.original_state_id AS coparent_of
                 FROM seed_propertystate ps, audit_id aid
                 WHERE (ps.id = aid.parent_state1_id AND
                        aid.parent_state1_id <> aid.original_state_id) OR
                       (ps.id = aid.parent_state2_id AND
-                       aid.parent_state2_id <> aid.original_state_id);""", [int(state_id)])
+                       aid.parent_state2_id <> aid.original_state_id);""", [state_ids])
         )
 
         # reduce this down to just the fields that were returned and convert to dict. This is
@@ -422,94 +443,161 @@ class PropertyState(models.Model):
                        'source_eui', 'source_eui_modeled', 'energy_alerts', 'space_alerts',
                        'building_certification', 'analysis_start_time', 'analysis_end_time',
                        'analysis_state', 'analysis_state_message', 'extra_data', ]
-        coparents = [{key: getattr(c, key) for key in keep_fields} for c in coparents]
+        for c in coparents:
+            result.setdefault(c.coparent_of, []).append(
+                {key: getattr(c, key) for key in keep_fields})
 
-        return coparents, len(coparents)
+        return result
 
     @classmethod
     def merge_relationships(cls, merged_state, state1, state2):
         """
         Merge together the old relationships with the new.
         """
+        cls.merge_relationships_batch([(merged_state, state1, state2)])
+        return merged_state
+
+    @classmethod
+    def merge_relationships_batch(cls, merges):
+        """
+        Merge together the old relationships with the new for many merges at once. The no measure
+        scenarios, building files, simulations, measures and the scenarios of the measures of both
+        parents are copied to the merged state with one bulk insert per model for all of the
+        merges.
+
+        :param merges: list of (merged_state, state1, state2), the merged states must be saved
+        """
         SimulationClass = apps.get_model('seed', 'Simulation')
         ScenarioClass = apps.get_model('seed', 'Scenario')
         PropertyMeasureClass = apps.get_model('seed', 'PropertyMeasure')
+        BuildingFileClass = apps.get_model('seed', 'BuildingFile')
+        ScenarioMeasureClass = ScenarioClass.measures.through
 
-        # get some items off of this property view
-        no_measure_scenarios = [x for x in state2.scenarios.filter(measures__isnull=True)] + \
-                               [x for x in state1.scenarios.filter(measures__isnull=True)]
-        building_files = [x for x in state2.building_files.all()] + [x for x in state1.building_files.all()]
-        simulations = [x for x in SimulationClass.objects.filter(property_state__in=[state1, state2])]
-        measures = [x for x in PropertyMeasureClass.objects.filter(property_state__in=[state1, state2])]
+        state_ids = set()
+        for _, state1, state2 in merges:
+            state_ids.update([state1.pk, state2.pk])
 
-        # copy in the no measure scenarios
-        for new_s in no_measure_scenarios:
-            new_s.pk = None
-            new_s.save()
-            merged_state.scenarios.add(new_s)
-
-        for new_bf in building_files:
-            new_bf.pk = None
-            new_bf.save()
-            merged_state.building_files.add(new_bf)
-
-        for new_sim in simulations:
-            new_sim.pk = None
-            new_sim.property_state = merged_state
-            new_sim.save()
-
-        if len(measures) > 0:
-            measure_fields = [f.name for f in measures[0]._meta.fields]
-            measure_fields.remove('id')
-            measure_fields.remove('property_state')
+        def by_state(queryset):
+            result = {}
+            for obj in queryset.filter(property_state_id__in=state_ids).order_by('pk'):
+                result.setdefault(obj.property_state_id, []).append(obj)
+            return result
 
-            new_items = []
+        # get some items off of the parents
+        no_measure_scenarios = by_state(ScenarioClass.objects.filter(measures__isnull=True))
+        building_files = by_state(BuildingFileClass.objects.all())
+        simulations = by_state(SimulationClass.objects.all())
+        measures = by_state(PropertyMeasureClass.objects.all())
+        measure_scenario_ids = {}
+        for measure_id, scenario_id in ScenarioMeasureClass.objects.filter(
+                propertymeasure__property_state_id__in=state_ids
+        ).order_by('scenario_id').values_list('propertymeasure_id', 'scenario_id'):
+            measure_scenario_ids.setdefault(measure_id, []).append(scenario_id)
+
+        def copy_to(obj, merged_state):
+            new_obj = copy.copy(obj)
+            new_obj.pk = None
+            new_obj.property_state = merged_state
+            return new_obj
+
+        new_scenarios = []
+        new_building_files = []
+        new_simulations = []
+        new_measures = []
+        # (merged state, scenario id, new measures) of the scenarios to copy with their measures
+        measure_scenarios = []
+        for merged_state, state1, state2 in merges:
+            parent_ids = [state2.pk, state1.pk]
+            for parent_id in parent_ids:
+                new_scenarios.extend(
+                    copy_to(s, merged_state) for s in no_measure_scenarios.get(parent_id, []))
+                new_building_files.extend(
+                    copy_to(bf, merged_state) for bf in building_files.get(parent_id, []))
+
+            # there is at most one simulation per state, the second parent's takes precedence
+            for parent_id in parent_ids:
+                if parent_id in simulations:
+                    new_simulations.append(copy_to(simulations[parent_id][0], merged_state))
+                    break
 
             # Create a list of scenarios and measures to reconstruct
             # {
-            #   scenario_id_1: [ new_measure_id_1, new_measure_id_2 ],
-            #   scenario_id_2: [ new_measure_id_2, new_measure_id_3 ],  # measure ids can be repeated
+            #   scenario_id_1: [ new_measure_1, new_measure_2 ],
+            #   scenario_id_2: [ new_measure_2, new_measure_3 ],  # measures can be repeated
             # }
             scenario_measure_map = {}
-            for measure in measures:
-                test_dict = model_to_dict(measure, fields=measure_fields)
-
-                if test_dict in new_items:
-                    continue
-                else:
-                    try:
-                        new_measure = copy.deepcopy(measure)
-                        new_measure.pk = None
-                        new_measure.property_state = merged_state
-                        new_measure.save()
-
-                        # grab the scenario that is attached to the orig measure and create a new connection
-                        for scenario in measure.scenario_set.all():
-                            if scenario.pk not in scenario_measure_map.keys():
-                                scenario_measure_map[scenario.pk] = []
-                            scenario_measure_map[scenario.pk].append(new_measure.pk)
-
-                    except IntegrityError:
-                        _log.error(
-                            "Measure state_id, measure_id, application_sacle, and implementation_status already exists -- skipping for now")
-
-                new_items.append(test_dict)
-
-            # connect back up the scenario measures
-            for scenario_id, measure_list in scenario_measure_map.items():
-                # create a new scenario from the old one
-                scenario = ScenarioClass.objects.get(pk=scenario_id)
-                scenario.pk = None
-                scenario.property_state = merged_state
-                scenario.save()  # save to get new id
-
-                # get the measures
-                measures = PropertyMeasureClass.objects.filter(pk__in=measure_list)
-                for measure in measures:
-                    scenario.measures.add(measure)
-                scenario.save()
+            unique_keys = set()
+            for parent_id in parent_ids:
+                for measure in measures.get(parent_id, []):
+                    unique_key = (measure.measure_id, measure.application_scale,
+                                  measure.implementation_status)
+                    if unique_key in unique_keys:
+                        _log.error("Measure state_id, measure_id, application_sacle, and "
+                                   "implementation_status already exists -- skipping for now")
+                        continue
+                    unique_keys.add(unique_key)
+
+                    new_measure = copy_to(measure, merged_state)
+                    new_measures.append(new_measure)
+
+                    # grab the scenario that is attached to the orig measure and create a new
+                    # connection
+                    for scenario_id in measure_scenario_ids.get(measure.pk, []):
+                        scenario_measure_map.setdefault(scenario_id, []).append(new_measure)
+
+            for scenario_id, measure_list in sorted(scenario_measure_map.items()):
+                measure_scenarios.append((merged_state, scenario_id, measure_list))
+
+        ScenarioClass.objects.bulk_create(new_scenarios)
+        BuildingFileClass.objects.bulk_create(new_building_files)
+        SimulationClass.objects.bulk_create(new_simulations)
+        PropertyMeasureClass.objects.bulk_create(new_measures)
+
+        # connect back up the scenario measures, with a new scenario from each old one
+        scenarios = ScenarioClass.objects.in_bulk(
+            [scenario_id for _, scenario_id, _ in measure_scenarios])
+        new_measure_scenarios = ScenarioClass.objects.bulk_create([
+            copy_to(scenarios[scenario_id], merged_state)
+            for merged_state, scenario_id, _ in measure_scenarios
+        ])
+        ScenarioMeasureClass.objects.bulk_create([
+            ScenarioMeasureClass(scenario_id=scenario.pk, propertymeasure_id=measure.pk)
+            for scenario, (_, _, measure_list) in zip(new_measure_scenarios, measure_scenarios)
+            for measure in measure_list
+        ])
 
-        return merged_state
+    @classmethod
+    def move_relationships(cls, moves):
+        """
+        Move the scenarios, measures and building files of states to other states, e.g. from the
+        state of a view to the state that replaces it. The simulations are copied.
+
+        :param moves: list of (old_state, new_state)
+        """
+        SimulationClass = apps.get_model('seed', 'Simulation')
+        ScenarioClass = apps.get_model('seed', 'Scenario')
+        PropertyMeasureClass = apps.get_model('seed', 'PropertyMeasure')
+        BuildingFileClass = apps.get_model('seed', 'BuildingFile')
+
+        old_state_ids = [old_state.pk for old_state, _ in moves]
+        new_state_ids = models.Case(
+            *[models.When(property_state_id=old_state.pk, then=models.Value(new_state.pk))
+              for old_state, new_state in moves],
+            output_field=models.IntegerField()
+        )
+        for model in [ScenarioClass, PropertyMeasureClass, BuildingFileClass]:
+            model.objects.filter(property_state_id__in=old_state_ids).update(
+                property_state_id=new_state_ids)
+
+        # the simulations are keyed by their state, a copy replaces the simulation of the new state
+        new_states = {old_state.pk: new_state for old_state, new_state in moves}
+        simulations = list(SimulationClass.objects.filter(property_state_id__in=old_state_ids))
+        for simulation in simulations:
+            simulation.property_state = new_states[simulation.property_state_id]
+        SimulationClass.objects.filter(
+            property_state_id__in=[simulation.property_state_id for simulation in simulations]
+        ).delete()
+        SimulationClass.objects.bulk_create(simulations)
 
 
 @receiver(pre_delete, sender=PropertyState)
@@ -601,6 +689,28 @@ def post_save_property_view(sender, **kwargs):
     if kwargs['instance'].property:
         kwargs['instance'].property.save()
 
+    invalidate_report_cache(kwargs['instance'].cycle_id)
+    if kwargs['created']:
+        invalidate_inventory_counts(kwargs['instance'].cycle_id)
+
+
+@receiver(post_delete, sender=PropertyView)
+def post_delete_property_view(sender, **kwargs):
+    """Invalidate the cached reports and counts of the cycle of the removed PropertyView"""
+    invalidate_report_cache(kwargs['instance'].cycle_id)
+    invalidate_inventory_counts(kwargs['instance'].cycle_id)
+
+
+@receiver(post_save, sender=Property)
+def post_save_property(sender, **kwargs):
+    """
+    Invalidate the cached reports of the cycles of the Property's views, the reports filter on
+    its campus flag
+    """
+    for cycle_id in set(PropertyView.objects.filter(
+            property_id=kwargs['instance'].pk).values_list('cycle_id', flat=True)):
+        invalidate_report_cache(cycle_id)
+
 
 class PropertyAuditLog(models.Model):
     organization = models.ForeignKey(Organization)
@@ -627,5 +737,16 @@ class PropertyAuditLog(models.Model):
     record_type = models.IntegerField(choices=DATA_UPDATE_TYPE, null=True, blank=True)
     created = models.DateTimeField(auto_now_add=True, null=True)
 
+    # ids of all of the ancestors (parents, their parents, etc.) of the audit log, set when the
+    # audit log is saved without one, see get_ancestor_ids
+    ancestor_ids = ArrayField(models.IntegerField(), null=True, blank=True)
+
     class Meta:
         index_together = [['state', 'name'], ['parent_state1', 'parent_state2']]
+
+    def save(self, *args, **kwargs):
+        if self.ancestor_ids is None:
+            self.ancestor_ids = get_ancestor_ids(
+                PropertyAuditLog, [self.parent1_id, self.parent2_id]
+            )
+        return super(PropertyAuditLog, self).save(*args, **kwargs)
@@ -53,7 +53,8 @@ class TaxLotProperty(models.Model):
         here so that we can use this method to create the data for exporting to CSV on the backend.
 
         :param object_list: list
-        :param columns: list, columns (as defined by frontend)
+        :param columns: list, columns (as defined by frontend). If None, then all of the related
+            columns are returned.
         :return: list
         """
         results = []
@@ -135,8 +136,12 @@ class TaxLotProperty(models.Model):
             # Only return the requested rows. speeds up the json string time.
             # The front end requests for related columns have 'tax_'/'property_' prepended
             # to them, so check for that too.
-            related_dict = {key: value for key, value in related_dict.items() if
-                            (key in columns) or ("{}_{}".format(lookups['related_column_key'], key) in columns)}
+            if columns is not None:
+                related_dict = {
+                    key: value for key, value in related_dict.items() if
+                    (key in columns) or
+                    ("{}_{}".format(lookups['related_column_key'], key) in columns)
+                }
             related_map[related_view.pk] = related_dict
 
             # Replace taxlot_view id with taxlot id
@@ -8,13 +8,14 @@ from __future__ import unicode_literals
 
 import logging
 
-from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.fields import ArrayField, JSONField
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from auditlog import AUDIT_IMPORT
 from auditlog import DATA_UPDATE_TYPE
+from auditlog import get_ancestor_ids
 from seed.data_importer.models import ImportFile
 from seed.lib.superperms.orgs.models import Organization
 from seed.models import (
@@ -29,6 +30,7 @@ from seed.models import (
 )
 from seed.utils.address import normalize_address_str
 from seed.utils.generic import split_model_fields, obj_to_dict
+from seed.utils.organizations import invalidate_inventory_counts
 
 _log = logging.getLogger(__name__)
 
@@ -79,6 +81,8 @@ class TaxLotState(models.Model):
     extra_data = JSONField(default=dict, blank=True)
 
     class Meta:
+        # The organization scoped indexes on the matching identifiers are created concurrently in
+        # migration 0082 and are not declared here.
         index_together = [
             ['import_file', 'data_state'],
             ['import_file', 'data_state', 'merge_state']
@@ -195,6 +199,24 @@ class TaxLotState(models.Model):
         :return: dict
         """
 
+        coparents = cls.coparents([state_id]).get(int(state_id), [])
+        return coparents, len(coparents)
+
+    @classmethod
+    def coparents(cls, state_ids):
+        """
+        Return the coparents of a list of TaxLotStates in a single query of the
+        TaxLotAuditLog table. The state ids need to be the base IDs of when the original
+        records were imported.
+
+        :param state_ids: list of integers, state ids to find the coparents of.
+        :return: dict, state id: list of coparent dicts
+        """
+        result = {}
+        state_ids = [int(state_id) for state_id in state_ids]
+        if not state_ids:
+            return result
+
         coparents = list(
             TaxLotState.objects.raw("""
                     WITH creation_id AS (
@@ -202,7 +224,7 @@ class TaxLotState(models.Model):
                           pal.id,
                           pal.state_id AS original_state_id
                         FROM seed_taxlotauditlog pal
-                        WHERE pal.state_id = %s AND
+                        WHERE pal.state_id = ANY(%s) AND
                               pal.name = 'Import Creation' AND
                               pal.import_filename IS NOT NULL
                     ), audit_id AS (
@@ -230,12 +252,12 @@ class TaxLotState(models.Model):
                       ps.extra_data,
                       ps.number_properties,
                       ps.jurisdiction_tax_lot_id,
-                      NULL
+                      aid.original_state_id AS coparent_of
                     FROM seed_taxlotstate ps, audit_id aid
                     WHERE (ps.id = aid.parent_state1_id AND
                            aid.parent_state1_id <> aid.original_state_id) OR
                           (ps.id = aid.parent_state2_id AND
-                           aid.parent_state2_id <> aid.original_state_id);""", [int(state_id)])
+                           aid.parent_state2_id <> aid.original_state_id);""", [state_ids])
         )
 
         # reduce this down to just the fields that were returns and convert to dict. This is
@@ -244,15 +266,22 @@ class TaxLotState(models.Model):
         keep_fields = ['id', 'custom_id_1', 'jurisdiction_tax_lot_id', 'block_number', 'district',
                        'address_line_1', 'address_line_2', 'city', 'state', 'postal_code',
                        'number_properties', 'extra_data']
-        coparents = [{key: getattr(c, key) for key in keep_fields} for c in coparents]
+        for c in coparents:
+            result.setdefault(c.coparent_of, []).append(
+                {key: getattr(c, key) for key in keep_fields})
 
-        return coparents, len(coparents)
+        return result
 
     @classmethod
     def merge_relationships(cls, merged_state, state1, state2):
         """Stub to implement if merging TaxLotState relationships is needed"""
         return None
 
+    @classmethod
+    def merge_relationships_batch(cls, merges):
+        """Stub to implement if merging TaxLotState relationships is needed"""
+        return None
+
 
 class TaxLotView(models.Model):
     taxlot = models.ForeignKey(TaxLot, related_name='views', null=True,
@@ -333,6 +362,15 @@ def post_save_taxlot_view(sender, **kwargs):
     if kwargs['instance'].taxlot:
         kwargs['instance'].taxlot.save()
 
+    if kwargs['created']:
+        invalidate_inventory_counts(kwargs['instance'].cycle_id)
+
+
+@receiver(post_delete, sender=TaxLotView)
+def post_delete_taxlot_view(sender, **kwargs):
+    """Invalidate the cached counts of the cycle that the TaxLotView was removed from"""
+    invalidate_inventory_counts(kwargs['instance'].cycle_id)
+
 
 class TaxLotAuditLog(models.Model):
     organization = models.ForeignKey(Organization)
@@ -361,5 +399,16 @@ class TaxLotAuditLog(models.Model):
                                       blank=True)
     created = models.DateTimeField(auto_now_add=True, null=True)
 
+    # ids of all of the ancestors (parents, their parents, etc.) of the audit log, set when the
+    # audit log is saved without one, see get_ancestor_ids
+    ancestor_ids = ArrayField(models.IntegerField(), null=True, blank=True)
+
     class Meta:
         index_together = [['state', 'name'], ['parent_state1', 'parent_state2']]
+
+    def save(self, *args, **kwargs):
+        if self.ancestor_ids is None:
+            self.ancestor_ids = get_ancestor_ids(
+                TaxLotAuditLog, [self.parent1_id, self.parent2_id]
+            )
+        return super(TaxLotAuditLog, self).save(*args, **kwargs)
@@ -12,7 +12,9 @@ import json
 import re
 import logging
 
+from django.contrib.postgres.search import TrigramSimilarity
 from django.db.models import Q
+from django.db.models.functions import Greatest
 from django.http.request import RawPostDataException
 from seed.lib.superperms.orgs.models import Organization
 from .models import (
@@ -32,6 +34,16 @@ from functools import reduce
 
 _log = logging.getLogger(__name__)
 
+# State fields of the inventory quick search and autocomplete. These have trigram indexes on
+# UPPER(field), see migration 0083.
+INVENTORY_SEARCH_FIELDS = {
+    'property': [
+        'address_line_1', 'property_name', 'pm_property_id', 'jurisdiction_property_id',
+        'custom_id_1',
+    ],
+    'taxlot': ['address_line_1', 'jurisdiction_tax_lot_id', 'custom_id_1'],
+}
+
 
 # TODO: obsolete?
 def get_building_fieldnames():
@@ -700,14 +712,16 @@ def orchestrate_search_filter_sort(params, user, skip_sort=False):
 
     # sorting
     if extra_data_sort and not skip_sort:
+        ed_unit = None
         ed_mapping = ColumnMapping.objects.filter(
             super_organization__in=orgs,
             column_mapped__column_name=params['order_by'],
         ).first()
-        ed_column = ed_mapping.column_mapped.filter(
-            column_name=params['order_by']
-        ).first()
-        ed_unit = ed_column.unit
+        if ed_mapping:
+            ed_column = ed_mapping.column_mapped.filter(
+                column_name=params['order_by']
+            ).first()
+            ed_unit = ed_column.unit
 
         buildings_queryset = buildings_queryset.json_order_by(
             params['order_by'],
@@ -757,6 +771,65 @@ def search_inventory(inventory_type, q, fieldnames=None, queryset=None):
     return queryset.filter(qgroup)
 
 
+def search_inventory_ranked(inventory_type, organization_id, cycle_id, q, limit=25):
+    """returns the Property/TaxLot views of a cycle whose identifiers or address contain
+    the search string, ordered by relevance (the best trigram similarity of the fields)
+
+    :param inventory_type: property or taxlot
+    :param organization_id: int, organization of the inventory
+    :param cycle_id: int, cycle of the views
+    :param q: str, search string
+    :param limit: int, maximum number of views to return
+    :returns: queryset of PropertyViews or TaxLotViews annotated with ``rank``
+    """
+    Model = {'property': PropertyView, 'taxlot': TaxLotView}[inventory_type]
+    fields = ['state__{}'.format(f) for f in INVENTORY_SEARCH_FIELDS[inventory_type]]
+
+    views = Model.objects.select_related(inventory_type, 'state', 'cycle').filter(**{
+        '{}__organization_id'.format(inventory_type): organization_id,
+        'cycle_id': cycle_id,
+    })
+    if not q:
+        return views.none()
+
+    qgroup = reduce(operator.or_, (
+        Q(**{fieldname + '__icontains': q}) for fieldname in fields
+    ))
+    rank = Greatest(*[TrigramSimilarity(fieldname, q) for fieldname in fields])
+    return views.filter(qgroup).annotate(rank=rank).order_by('-rank', 'id')[:limit]
+
+
+def inventory_autocomplete(inventory_type, organization_id, q, cycle_id=None, limit=10):
+    """returns the identifiers and addresses of the inventory that start with the search
+    string, for autocompleting the quick search
+
+    :param inventory_type: property or taxlot
+    :param organization_id: int, organization of the inventory
+    :param q: str, prefix to complete
+    :param cycle_id: int, optional cycle to limit the suggestions to
+    :param limit: int, maximum number of suggestions
+    :returns: list of dicts with the ``field`` and the ``value`` that matched, sorted by value
+    """
+    if not q:
+        return []
+
+    Model = {'property': PropertyState, 'taxlot': TaxLotState}[inventory_type]
+    view_name = {'property': 'propertyview', 'taxlot': 'taxlotview'}[inventory_type]
+    states = Model.objects.filter(organization_id=organization_id)
+    if cycle_id:
+        states = states.filter(**{'{}__cycle_id'.format(view_name): cycle_id})
+    else:
+        states = states.filter(**{'{}__isnull'.format(view_name): False})
+
+    suggestions = []
+    for fieldname in INVENTORY_SEARCH_FIELDS[inventory_type]:
+        values = states.filter(**{fieldname + '__istartswith': q}).order_by(
+            fieldname).values_list(fieldname, flat=True).distinct()[:limit]
+        suggestions.extend({'field': fieldname, 'value': value} for value in values)
+
+    return sorted(suggestions, key=lambda s: (s['value'].lower(), s['field']))[:limit]
+
+
 def create_inventory_queryset(inventory_type, orgs, exclude, order_by, other_orgs=None):
     """creates a queryset of properties or taxlots within orgs.
     If ``other_orgs``, properties/taxlots in both orgs and other_orgs
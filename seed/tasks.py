@@ -7,6 +7,7 @@
 from __future__ import absolute_import
 
 import sys
+from contextlib import contextmanager
 
 from celery import chord, chain
 from celery import shared_task
@@ -23,13 +24,63 @@ from seed.landing.models import SEEDUser as User
 from seed.lib.mcm.utils import batch
 from seed.lib.superperms.orgs.models import Organization, OrganizationUser
 from seed.models import (
+    BuildingFile,
+    Column,
+    Cycle,
     Property, PropertyState,
+    StatusLabel,
     TaxLot, TaxLotState
 )
 from seed.utils.cache import set_cache, increment_cache
+from seed.utils.deletion import fast_delete
+from seed.utils.extra_data import drop_index, sync_index
+from seed.utils.organizations import invalidate_inventory_counts
+from seed.utils.reports import invalidate_report_cache
 
 logger = get_task_logger(__name__)
 
+# The cascading deletes of the inventory recurse deeper than the default limit of 1000
+DELETE_RECURSION_LIMIT = 5000
+
+# Number of records per delete chunk, the set-based deletes (SEED_FAST_INVENTORY_DELETE) handle
+# larger chunks
+DELETE_CHUNK_SIZE = 100
+FAST_DELETE_CHUNK_SIZE = 1000
+
+
+@contextmanager
+def _recursion_limit(limit):
+    """
+    Raises the recursion limit for the block and restores it afterwards, the workers run many
+    tasks in the same process.
+    """
+    previous = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, previous))
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(previous)
+
+
+def _fast_delete_enabled():
+    return getattr(settings, 'SEED_FAST_INVENTORY_DELETE', False)
+
+
+def _delete_inventory_chunk(queryset, org_pk):
+    """
+    Deletes the records of the queryset along with everything that cascades from them. The fast
+    path does not send the delete signals, so the caches that the signals of the views invalidate
+    are invalidated here.
+    """
+    if _fast_delete_enabled():
+        fast_delete(queryset.model, list(queryset.values_list('pk', flat=True)))
+        for cycle_id in Cycle.objects.filter(organization_id=org_pk).values_list('pk', flat=True):
+            invalidate_report_cache(cycle_id)
+            invalidate_inventory_counts(cycle_id)
+    else:
+        with _recursion_limit(DELETE_RECURSION_LIMIT):
+            queryset.delete()
+
 
 @shared_task
 def invite_to_seed(domain, email_address, token, user_pk, first_name):
@@ -95,7 +146,21 @@ def _delete_organization_related_data(org_pk, prog_key):
         organization_id=org_pk).values_list('user_id', flat=True)
     users = list(User.objects.filter(pk__in=user_ids))
 
-    Organization.objects.get(pk=org_pk).delete()
+    # the expression indexes of the columns are not removed by deleting the rows
+    for column in Column.objects.filter(organization_id=org_pk, is_indexed=True):
+        drop_index(column)
+
+    if _fast_delete_enabled():
+        # the labels and columns cascade to the m2m tables of the inventory and the mappings
+        fast_delete(StatusLabel, list(
+            StatusLabel.objects.filter(super_organization_id=org_pk).values_list('pk', flat=True)
+        ))
+        fast_delete(Column, list(
+            Column.objects.filter(organization_id=org_pk).values_list('pk', flat=True)
+        ))
+
+    with _recursion_limit(DELETE_RECURSION_LIMIT):
+        Organization.objects.get(pk=org_pk).delete()
 
     # TODO: Delete measures in BRICR branch
 
@@ -120,16 +185,15 @@ def _finish_delete(results, org_pk, prog_key):
         'progress_key': prog_key
     }
 
-    # set recursion limits back to 1000
-    sys.setrecursionlimit(1000)
     set_cache(prog_key, result['status'], result)
 
 
 @shared_task
 @lock_and_track
-def delete_organization_inventory(org_pk, deleting_cache_key, chunk_size=100, *args, **kwargs):
+def delete_organization_inventory(org_pk, deleting_cache_key, chunk_size=None, *args, **kwargs):
     """Deletes all properties & taxlots within an organization."""
-    sys.setrecursionlimit(5000)  # default is 1000
+    if chunk_size is None:
+        chunk_size = FAST_DELETE_CHUNK_SIZE if _fast_delete_enabled() else DELETE_CHUNK_SIZE
 
     result = {
         'status': 'success',
@@ -194,7 +258,7 @@ def delete_organization_inventory(org_pk, deleting_cache_key, chunk_size=100, *a
 @shared_task
 def _delete_organization_property_chunk(del_ids, prog_key, increment, org_pk, *args, **kwargs):
     """deletes a list of ``del_ids`` and increments the cache"""
-    Property.objects.filter(organization_id=org_pk, pk__in=del_ids).delete()
+    _delete_inventory_chunk(Property.objects.filter(organization_id=org_pk, pk__in=del_ids), org_pk)
     increment_cache(prog_key, increment * 100)
 
 
@@ -202,19 +266,129 @@ def _delete_organization_property_chunk(del_ids, prog_key, increment, org_pk, *a
 def _delete_organization_property_state_chunk(del_ids, prog_key, increment, org_pk, *args,
                                               **kwargs):
     """deletes a list of ``del_ids`` and increments the cache"""
-    PropertyState.objects.filter(pk__in=del_ids).delete()
+    _delete_inventory_chunk(PropertyState.objects.filter(pk__in=del_ids), org_pk)
     increment_cache(prog_key, increment * 100)
 
 
 @shared_task
 def _delete_organization_taxlot_chunk(del_ids, prog_key, increment, org_pk, *args, **kwargs):
     """deletes a list of ``del_ids`` and increments the cache"""
-    TaxLot.objects.filter(organization_id=org_pk, pk__in=del_ids).delete()
+    _delete_inventory_chunk(TaxLot.objects.filter(organization_id=org_pk, pk__in=del_ids), org_pk)
     increment_cache(prog_key, increment * 100)
 
 
 @shared_task
 def _delete_organization_taxlot_state_chunk(del_ids, prog_key, increment, org_pk, *args, **kwargs):
     """deletes a list of ``del_ids`` and increments the cache"""
-    TaxLotState.objects.filter(organization_id=org_pk, pk__in=del_ids).delete()
+    _delete_inventory_chunk(
+        TaxLotState.objects.filter(organization_id=org_pk, pk__in=del_ids), org_pk
+    )
     increment_cache(prog_key, increment * 100)
+
+
+@shared_task
+def sync_extra_data_index(column_pk):
+    """creates or drops the index of an extra data column to match its is_indexed flag"""
+    try:
+        column = Column.objects.select_related('unit').get(pk=column_pk)
+    except Column.DoesNotExist:
+        logger.info("Column {} no longer exists, not indexing".format(column_pk))
+        return
+
+    sync_index(column)
+
+
+@shared_task
+def process_building_files(building_file_ids, org_pk, cycle_pk, prog_key, chunk_size=10,
+                           skip_validation=False):
+    """
+    Processes a batch of uploaded BuildingSync/HPXML files in chunks across the workers. The
+    organization's measures and extra data columns are loaded, and the missing extra data
+    columns created, once for the batch.
+    """
+    result = {
+        'status': 'success',
+        'progress': 0,
+        'progress_key': prog_key
+    }
+    set_cache(prog_key, result['status'], result)
+
+    preloaded = BuildingFile.preload(org_pk)
+    # create the new extra data columns here, the chunks run in parallel and would each create
+    # the same columns
+    BuildingFile.create_extra_data_columns(
+        org_pk,
+        BuildingFile.objects.filter(pk__in=building_file_ids).values_list(
+            'file_type', flat=True).distinct(),
+        preloaded
+    )
+    # the task arguments are serialized as JSON, so send the measures as a list
+    measures = [[category, name, pk] for (category, name), pk in preloaded['measures'].items()]
+    columns = sorted(preloaded['columns'])
+
+    step = 100.0 / len(building_file_ids) if building_file_ids else 100
+    tasks = [
+        _process_building_files_chunk.s(
+            ids, org_pk, cycle_pk, measures, columns, prog_key, step * len(ids), skip_validation
+        )
+        for ids in batch(building_file_ids, chunk_size)
+    ]
+    if tasks:
+        chord(tasks, interval=15)(_finish_process_building_files.s(prog_key))
+    else:
+        _finish_process_building_files([], prog_key)
+
+
+@shared_task
+def _process_building_files_chunk(building_file_ids, org_pk, cycle_pk, measures, columns,
+                                  prog_key, increment, skip_validation=False):
+    """processes a list of building files and increments the cache"""
+    cycle = Cycle.objects.get(pk=cycle_pk)
+    preloaded = {
+        'measures': {(category, name): pk for category, name, pk in measures},
+        'columns': set(columns),
+    }
+
+    results = []
+    for building_file in BuildingFile.objects.filter(pk__in=building_file_ids).order_by('id'):
+        file_result = {
+            'building_file_id': building_file.pk,
+            'filename': building_file.filename,
+        }
+        try:
+            p_status, property_state, property_view, messages = building_file.process(
+                org_pk, cycle, skip_validation=skip_validation, preloaded=preloaded
+            )
+        except Exception as e:
+            logger.exception('Could not process building file {}'.format(building_file.pk))
+            p_status, property_view, messages = False, None, str(e)
+
+        if p_status:
+            file_result['status'] = 'success'
+            file_result['property_view_id'] = property_view.pk
+        else:
+            file_result['status'] = 'error'
+            file_result['message'] = 'Could not process building file with messages {}'.format(
+                messages)
+        results.append(file_result)
+
+    increment_cache(prog_key, increment)
+    return results
+
+
+@shared_task
+def _finish_process_building_files(results, prog_key):
+    files = [file_result for chunk in results for file_result in chunk]
+    result = {
+        'status': 'success',
+        'progress': 100,
+        'progress_key': prog_key,
+        'data': {
+            'total': len(files),
+            'success': len([f for f in files if f['status'] == 'success']),
+            'error': len([f for f in files if f['status'] == 'error']),
+            'files': files,
+        }
+    }
+    set_cache(prog_key, result['status'], result)
+    return result
@@ -20,7 +20,7 @@ from seed.lib.superperms.orgs.models import (
     Organization
 )
 from seed.models.cycles import Cycle
-from seed.models.properties import PropertyState
+from seed.models.properties import PropertyState, PropertyView
 from seed.models.tax_lots import TaxLotState
 from seed.public.models import SharedBuildingField
 from seed.tests.util import FakeRequest
@@ -106,6 +106,14 @@ class AccountsViewTests(TestCase):
             expected_single_org_payload
         )
 
+        # the cached counts are invalidated when views are removed
+        PropertyView.objects.filter(cycle=self.cycle).first().delete()
+        expected_single_org_payload['cycles'][0]['num_properties'] = 9
+        self.assertDictEqual(
+            _dict_org(self.fake_request, [self.org])[0],
+            expected_single_org_payload
+        )
+
     def test_dic_org_w_member_in_parent_and_child(self):
         """What happens when a user has a role in parent and child."""
 
@@ -730,15 +738,13 @@ class AccountsViewTests(TestCase):
             })
 
     def test_generate_api_key(self):
-        """test for generate_api_key
-            will pick up user.api_key when it's ready
-        """
+        """test for generate_api_key"""
         resp = self.client.get(
             reverse_lazy('api:v2:users-generate-api-key', args=[self.user.pk]),
             content_type='application/json',
         )
         user = User.objects.get(pk=self.user.pk)
-        api_key = user.api_key
+        api_key = json.loads(resp.content)['api_key']
 
         self.assertEquals(
             json.loads(resp.content),
@@ -746,6 +752,9 @@ class AccountsViewTests(TestCase):
                 'status': 'success',
                 'api_key': api_key,
             })
+        # only the digest of the key is stored
+        self.assertEqual(user.api_key, '')
+        self.assertTrue(user.check_api_key(api_key))
 
     def test_set_password(self):
         """test for set_password"""
@@ -12,7 +12,7 @@ import time
 from unittest import skip
 
 from django.core.urlresolvers import reverse_lazy, reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from seed.factory import SEEDFactory
@@ -39,7 +39,7 @@ class ApiAuthenticationTests(TestCase):
             'email': 'test_user@demo.com'
         }
         self.user = User.objects.create_user(**user_details)
-        self.user.generate_key()
+        self.api_key = self.user.generate_key()
         self.org = Organization.objects.create()
         OrganizationUser.objects.create(user=self.user, organization=self.org)
 
@@ -60,7 +60,7 @@ class ApiAuthenticationTests(TestCase):
             'organization_id': self.org.pk,
         }
         auth_string = base64.urlsafe_b64encode(
-            '{}:{}'.format(self.user.username, self.user.api_key)
+            '{}:{}'.format(self.user.username, self.api_key)
         )
         self.auth_string = 'Basic {}'.format(auth_string)
 
@@ -120,7 +120,7 @@ class TestApi(TestCase):
             'last_name': 'H\'ghar'
         }
         self.user = User.objects.create_user(**user_details)
-        self.user.generate_key()
+        self.api_key = self.user.generate_key()
         self.org = Organization.objects.create()
         self.default_cycle = Cycle.objects.filter(organization_id=self.org).first()
         OrganizationUser.objects.create(user=self.user, organization=self.org)
@@ -131,7 +131,7 @@ class TestApi(TestCase):
             end=datetime.datetime(2015, 12, 31, tzinfo=timezone.get_current_timezone()),
         )
         auth_string = base64.urlsafe_b64encode(
-            '{}:{}'.format(self.user.username, self.user.api_key)
+            '{}:{}'.format(self.user.username, self.api_key)
         )
         self.auth_string = 'Basic {}'.format(auth_string)
         self.headers = {'Authorization': self.auth_string}
@@ -169,6 +169,33 @@ class TestApi(TestCase):
         r = json.loads(r.content)
         self.assertNotEqual(r, None)
 
+    def test_api_key_stored_as_digest(self):
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.api_key, '')
+        self.assertNotIn(self.api_key, user.api_key_hash)
+        self.assertEqual(user.api_key_prefix, self.api_key[:8])
+        self.assertTrue(user.check_api_key(self.api_key))
+        self.assertFalse(user.check_api_key(self.api_key[:-1]))
+
+    @override_settings(SEED_API_KEY_CACHE_TIMEOUT=60)
+    def test_cached_api_key_revoked(self):
+        url = '/api/v2/users/{}/'.format(self.user.pk)
+        r = self.client.get(url, **self.headers)
+        self.assertEqual(r.status_code, 200)
+
+        # the verified key is cached
+        with self.assertNumQueries(0):
+            self.assertEqual(User.process_header_request(r.wsgi_request), self.user)
+
+        # generating a new key revokes the old one right away
+        new_key = self.user.generate_key()
+        r = self.client.get(url, **self.headers)
+        self.assertIn(r.status_code, [401, 403])
+
+        auth_string = base64.urlsafe_b64encode('{}:{}'.format(self.user.username, new_key))
+        r = self.client.get(url, HTTP_AUTHORIZATION='Basic {}'.format(auth_string))
+        self.assertEqual(r.status_code, 200)
+
     def test_organization(self):
         self.client.login(username='test_user@demo.com', password='test_pass')
         r = self.client.get('/api/v2/organizations/', follow=True, **self.headers)
@@ -5,15 +5,21 @@
 :author
 """
 
+import io
+import struct
+import zipfile
 from os import path
 
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
 
 from config.settings.common import BASE_DIR
+from seed import tasks
 from seed.lib.superperms.orgs.models import Organization, OrganizationUser
-from seed.models import User
+from seed.models import Column, Measure, PropertyMeasure, Scenario, User
 from seed.models.building_file import BuildingFile
+from seed.utils.cache import get_cache
 
 
 class TestBuildingFiles(TestCase):
@@ -85,3 +91,112 @@ class TestBuildingFiles(TestCase):
         status, property_state, property_view, messages = bf.process(self.org.id, self.org.cycles.first())
         self.assertFalse(status)
         self.assertEqual(property_view, None)
+
+    def _building_file(self, filename, file_type=BuildingFile.BUILDINGSYNC):
+        with open(filename, 'rb') as f:
+            simple_uploaded_file = SimpleUploadedFile(f.name, f.read())
+        return BuildingFile.objects.create(
+            file=simple_uploaded_file,
+            filename=filename,
+            file_type=file_type,
+        )
+
+    def test_buildingsync_measures_and_scenarios(self):
+        Measure.populate_measures(self.org.id)
+        filename = path.join(BASE_DIR, 'seed', 'building_sync', 'tests', 'data',
+                             'buildingsync_ex01_measures.xml')
+        bf = self._building_file(filename)
+
+        status, property_state, property_view, messages = bf.process(
+            self.org.id, self.org.cycles.first(), preloaded=BuildingFile.preload(self.org.id)
+        )
+        self.assertTrue(status)
+        self.assertEqual(
+            sorted(PropertyMeasure.objects.filter(property_state=bf.property_state).values_list(
+                'property_measure_name', flat=True)),
+            ['Measure1', 'Measure2']
+        )
+
+        scenarios = {s.name: s for s in Scenario.objects.filter(property_state=bf.property_state)}
+        self.assertEqual(len(scenarios), 4)
+        self.assertEqual(scenarios['Lighting Only'].reference_case, scenarios['Baseline'])
+        self.assertEqual(
+            sorted(scenarios['Max Tech'].measures.values_list('property_measure_name', flat=True)),
+            ['Measure1', 'Measure2']
+        )
+        self.assertEqual(scenarios['Baseline'].measures.count(), 0)
+
+    def test_process_building_files_batch(self):
+        base_path = path.join(BASE_DIR, 'seed', 'building_sync', 'tests', 'data')
+        good = self._building_file(path.join(base_path, 'ex_1.xml'))
+        bad = self._building_file(path.join(base_path, 'ex_1.xml'), BuildingFile.GEOJSON)
+
+        prog_key = 'test_process_building_files'
+        tasks.process_building_files(
+            [good.pk, bad.pk], self.org.id, self.org.cycles.first().pk, prog_key, chunk_size=1
+        )
+
+        result = get_cache(prog_key)
+        self.assertEqual(result['progress'], 100)
+        self.assertEqual(result['data']['total'], 2)
+        self.assertEqual(result['data']['success'], 1)
+        self.assertEqual(result['data']['error'], 1)
+        files = {f['building_file_id']: f for f in result['data']['files']}
+        self.assertEqual(files[good.pk]['status'], 'success')
+        self.assertIn('property_view_id', files[good.pk])
+        self.assertEqual(files[bad.pk]['status'], 'error')
+
+    def test_process_building_files_creates_columns_once(self):
+        base_path = path.join(BASE_DIR, 'seed', 'building_sync', 'tests', 'data')
+        files = [self._building_file(path.join(base_path, 'ex_1.xml')) for _ in range(2)]
+
+        preloaded = BuildingFile.preload(self.org.id)
+        BuildingFile.create_extra_data_columns(
+            self.org.id, [BuildingFile.BUILDINGSYNC], preloaded)
+        columns = Column.objects.filter(organization=self.org, is_extra_data=True)
+        self.assertIn('premise_identifier', columns.values_list('column_name', flat=True))
+        self.assertEqual(set(columns.values_list('column_name', flat=True)), preloaded['columns'])
+        count = columns.count()
+
+        tasks.process_building_files(
+            [f.pk for f in files], self.org.id, self.org.cycles.first().pk,
+            'test_process_building_files_creates_columns_once', chunk_size=1
+        )
+        self.assertEqual(columns.count(), count)
+
+    def test_batch_zip_limits(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('a.xml', '<a/>' * 100)
+            zf.writestr('b.xml', '<b/>')
+
+        self.client.login(username='test_user@demo.com', password='test_pass')
+        url = reverse('api:v2:building_file-batch') + '?organization_id={}'.format(self.org.pk)
+
+        def post():
+            archive.seek(0)
+            return self.client.post(url, {
+                'organization_id': self.org.pk,
+                'cycle_id': self.org.cycles.first().pk,
+                'file_type': 'BuildingSync',
+                'file': SimpleUploadedFile('files.zip', archive.read()),
+            })
+
+        with override_settings(SEED_BUILDING_FILE_ZIP_MAX_FILES=1):
+            self.assertEqual(post().status_code, 400)
+        with override_settings(SEED_BUILDING_FILE_ZIP_MAX_FILE_SIZE=100):
+            self.assertEqual(post().status_code, 400)
+        with override_settings(SEED_BUILDING_FILE_ZIP_MAX_TOTAL_SIZE=300):
+            self.assertEqual(post().status_code, 400)
+
+        # headers that understate the uncompressed size of a.xml as 1 byte are caught while
+        # reading the entry, either by the size limit or by the CRC check of a short read (the
+        # first local and central directory headers are those of a.xml)
+        data = archive.getvalue()
+        for signature, offset in [(b'PK\x03\x04', 22), (b'PK\x01\x02', 24)]:
+            start = data.index(signature) + offset
+            data = data[:start] + struct.pack('<I', 1) + data[start + 4:]
+        archive = io.BytesIO(data)
+        with override_settings(SEED_BUILDING_FILE_ZIP_MAX_FILE_SIZE=100):
+            self.assertEqual(post().status_code, 400)
+        self.assertFalse(BuildingFile.objects.exists())
@@ -0,0 +1,139 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+import json
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from seed.filtersets import PropertyStateFilterSet
+from seed.landing.models import SEEDUser as User
+from seed.lib.superperms.orgs.models import Organization, OrganizationUser
+from seed.models import (
+    Column,
+    FLOAT,
+    PropertyState,
+    Unit,
+)
+from seed.test_helpers.fake import FakePropertyStateFactory
+from seed.utils.extra_data import ExtraDataValue, index_name, sync_index
+
+
+class TestExtraDataIndexes(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='test')
+        self.org = Organization.objects.create()
+        OrganizationUser.objects.create(user=self.user, organization=self.org)
+        self.state_factory = FakePropertyStateFactory(organization=self.org)
+
+        for eui in [10, '55.5', 'not a number', 200]:
+            self.state_factory.get_property_state(
+                self.org, extra_data={'Site EUI': eui, 'Building Type': 'Office'}
+            )
+        self.state_factory.get_property_state(self.org, extra_data={'Building Type': 'Retail'})
+
+        self.column = Column.objects.create(
+            organization=self.org,
+            table_name='PropertyState',
+            column_name='Site EUI',
+            is_extra_data=True,
+            unit=Unit.objects.create(unit_name='EUI', unit_type=FLOAT),
+        )
+
+    def _index_exists(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM pg_indexes WHERE indexname = %s', [name])
+            return cursor.fetchone()[0] == 1
+
+    def test_sync_index(self):
+        name = index_name(self.column)
+        self.assertFalse(self._index_exists(name))
+
+        self.column.is_indexed = True
+        self.assertEqual(sync_index(self.column), name)
+        self.assertTrue(self._index_exists(name))
+
+        # an existing index is rebuilt and swapped in
+        self.assertEqual(sync_index(self.column), name)
+        self.assertTrue(self._index_exists(name))
+        self.assertFalse(self._index_exists('{}_new'.format(name)))
+
+        self.column.is_indexed = False
+        sync_index(self.column)
+        self.assertFalse(self._index_exists(name))
+
+    def test_rename_drops_old_index(self):
+        self.column.is_indexed = True
+        self.column.save()
+        old_name = sync_index(self.column)
+
+        self.column.column_name = 'Site EUI (kBtu/sf)'
+        self.column.save()
+        self.assertFalse(self._index_exists(old_name))
+        self.assertNotEqual(index_name(self.column), old_name)
+
+    def test_index_view(self):
+        superuser = User.objects.create_superuser(
+            email='super@demo.com', username='super@demo.com', password='secret'
+        )
+        OrganizationUser.objects.create(user=superuser, organization=self.org)
+        client = APIClient()
+        client.login(username=superuser.username, password='secret')
+        url = reverse('api:v2:columns-index', args=(self.column.pk,))
+        url += '?organization_id={}'.format(self.org.pk)
+
+        resp = client.put(url, {'is_indexed': 'true'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertTrue(Column.objects.get(pk=self.column.pk).is_indexed)
+
+        # form values are strings, 'false' must not be taken as True
+        resp = client.put(url, {'is_indexed': 'false'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertFalse(Column.objects.get(pk=self.column.pk).is_indexed)
+
+        resp = client.put(url, {'is_indexed': 'maybe'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_numeric_value_ignores_non_numbers(self):
+        qs = PropertyState.objects.filter(organization=self.org).annotate(
+            eui=ExtraDataValue('Site EUI', numeric=True)
+        )
+        self.assertEqual(sorted(qs.filter(eui__gt=20).values_list('eui', flat=True)), [55.5, 200])
+        self.assertEqual(qs.filter(eui__isnull=True).count(), 2)
+
+    def test_extra_data_filter(self):
+        qs = PropertyState.objects.filter(organization=self.org)
+
+        filterset = PropertyStateFilterSet(
+            {'extra_data': json.dumps({'Site EUI': '>= 55.5', 'Building Type': 'Office'})},
+            queryset=qs
+        )
+        self.assertEqual(filterset.qs.count(), 2)
+
+        filterset = PropertyStateFilterSet(
+            {'extra_data': json.dumps({'Building Type': 'Retail'})}, queryset=qs
+        )
+        self.assertEqual(filterset.qs.count(), 1)
+
+        filterset = PropertyStateFilterSet({'extra_data': 'not json'}, queryset=qs)
+        self.assertEqual(filterset.qs.count(), 0)
+
+        # the states are filtered on the organization of the request
+        filterset = PropertyStateFilterSet({
+            'extra_data': json.dumps({'Building Type': 'Retail'}),
+            'organization_id': self.org.pk,
+        }, queryset=PropertyState.objects.all())
+        self.assertEqual(filterset.qs.count(), 1)
+
+        filterset = PropertyStateFilterSet({
+            'extra_data': json.dumps({'Building Type': 'Retail'}),
+            'organization_id': Organization.objects.create().pk,
+        }, queryset=PropertyState.objects.all())
+        self.assertEqual(filterset.qs.count(), 0)
@@ -0,0 +1,145 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from django.test import TestCase, override_settings
+
+from seed.landing.models import SEEDUser as User
+from seed.lib.superperms.orgs.models import Organization, OrganizationUser
+from seed.models import (
+    PropertyInventoryRow,
+    PropertyView,
+    TaxLotInventoryRow,
+    TaxLotProperty,
+)
+from seed.models.inventory_rows import (
+    get_inventory_page,
+    get_inventory_related,
+    refresh_inventory_rows,
+)
+from seed.test_helpers.fake import (
+    FakeCycleFactory,
+    FakePropertyViewFactory,
+    FakeTaxLotViewFactory,
+)
+
+
+@override_settings(SEED_INVENTORY_READ_MODEL=True)
+class TestInventoryRows(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            email='test_user@demo.com', username='test_user@demo.com', password='test_pass'
+        )
+        self.org = Organization.objects.create()
+        OrganizationUser.objects.create(user=self.user, organization=self.org)
+        self.cycle = FakeCycleFactory(organization=self.org, user=self.user).get_cycle()
+        self.property_view_factory = FakePropertyViewFactory(
+            organization=self.org, user=self.user
+        )
+        self.taxlot_view_factory = FakeTaxLotViewFactory(organization=self.org, user=self.user)
+
+    def test_rows_match_get_related(self):
+        pv = self.property_view_factory.get_property_view(cycle=self.cycle)
+        tlv = self.taxlot_view_factory.get_taxlot_view(cycle=self.cycle)
+        TaxLotProperty.objects.create(property_view=pv, taxlot_view=tlv, cycle=self.cycle)
+
+        columns = ['address_line_1', 'tax_jurisdiction_tax_lot_id']
+        expected = TaxLotProperty.get_related([pv], columns)
+
+        # rows are built on first read
+        self.assertFalse(PropertyInventoryRow.objects.filter(view=pv).exists())
+        data = get_inventory_related([pv], columns)
+        self.assertTrue(PropertyInventoryRow.objects.filter(view=pv).exists())
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['id'], expected[0]['id'])
+        self.assertEqual(data[0]['address_line_1'], expected[0]['address_line_1'])
+        self.assertEqual(data[0]['related'][0]['jurisdiction_tax_lot_id'],
+                         tlv.state.jurisdiction_tax_lot_id)
+        self.assertNotIn('block_number', data[0]['related'][0])
+
+        row = PropertyInventoryRow.objects.get(view=pv)
+        self.assertEqual(row.related_ids, [tlv.taxlot_id])
+        self.assertEqual(row.cycle_id, self.cycle.id)
+
+    def test_refresh_cascades_to_paired_views(self):
+        pv = self.property_view_factory.get_property_view(cycle=self.cycle)
+        tlv = self.taxlot_view_factory.get_taxlot_view(cycle=self.cycle)
+        TaxLotProperty.objects.create(property_view=pv, taxlot_view=tlv, cycle=self.cycle)
+        refresh_inventory_rows(property_view_ids=[pv.id])
+
+        self.assertEqual(PropertyInventoryRow.objects.get(view=pv).related_ids, [tlv.taxlot_id])
+        self.assertEqual(TaxLotInventoryRow.objects.get(view=tlv).related_ids, [pv.property_id])
+
+        TaxLotProperty.objects.filter(property_view=pv, taxlot_view=tlv).delete()
+        refresh_inventory_rows(property_view_ids=[pv.id], taxlot_view_ids=[tlv.id])
+        self.assertEqual(PropertyInventoryRow.objects.get(view=pv).related_ids, [])
+        self.assertEqual(TaxLotInventoryRow.objects.get(view=tlv).related_ids, [])
+
+    def test_refresh_cycle_removes_stale_rows(self):
+        pv1 = self.property_view_factory.get_property_view(cycle=self.cycle)
+        pv2 = self.property_view_factory.get_property_view(cycle=self.cycle)
+        self.assertEqual(PropertyInventoryRow.refresh_cycle(self.org.id, self.cycle.id), 2)
+
+        PropertyView.objects.filter(pk=pv2.pk).delete()
+        self.assertEqual(
+            list(PropertyInventoryRow.objects.values_list('view_id', flat=True)), [pv1.id]
+        )
+
+    def test_campus_change_refreshes_rows(self):
+        pv = self.property_view_factory.get_property_view(cycle=self.cycle)
+        refresh_inventory_rows(property_view_ids=[pv.id])
+        self.assertFalse(PropertyInventoryRow.objects.get(view=pv).campus)
+
+        pv.property.campus = True
+        pv.property.save()
+        row = PropertyInventoryRow.objects.get(view=pv)
+        self.assertTrue(row.campus)
+        self.assertTrue(row.data['campus'])
+
+    def test_delete_paired_view_removes_partner_row(self):
+        pv = self.property_view_factory.get_property_view(cycle=self.cycle)
+        tlv = self.taxlot_view_factory.get_taxlot_view(cycle=self.cycle)
+        TaxLotProperty.objects.create(property_view=pv, taxlot_view=tlv, cycle=self.cycle)
+        refresh_inventory_rows(property_view_ids=[pv.id])
+        self.assertTrue(TaxLotInventoryRow.objects.filter(view=tlv).exists())
+
+        PropertyView.objects.filter(pk=pv.pk).delete()
+        self.assertFalse(TaxLotInventoryRow.objects.filter(view=tlv).exists())
+        # the row is rebuilt without the deleted view on the next read
+        self.assertEqual(get_inventory_related([tlv], [])[0]['related'], [])
+
+    def test_inventory_page(self):
+        view_ids = [
+            self.property_view_factory.get_property_view(cycle=self.cycle).id for _ in range(3)
+        ]
+        views_list = PropertyView.objects.filter(cycle=self.cycle).order_by('id')
+
+        # the rows of the cycle are built and paginated in the order of the views
+        params = {'per_page': 2, 'cursor': '', 'count': 'exact'}
+        data, pagination = get_inventory_page(views_list, self.org.id, self.cycle.id, params, [])
+        self.assertEqual(PropertyInventoryRow.objects.count(), 3)
+        self.assertEqual([d['property_view_id'] for d in data], view_ids[:2])
+        self.assertEqual(pagination['total'], 3)
+
+        params['cursor'] = pagination['next']
+        data, pagination = get_inventory_page(views_list, self.org.id, self.cycle.id, params, [])
+        self.assertEqual([d['property_view_id'] for d in data], view_ids[2:])
+        self.assertFalse(pagination['has_next'])
+
+        data, pagination = get_inventory_page(
+            views_list, self.org.id, self.cycle.id, {'per_page': 2, 'page': 2}, []
+        )
+        self.assertEqual([d['property_view_id'] for d in data], view_ids[2:])
+        self.assertEqual(pagination['num_pages'], 2)
+
+    @override_settings(SEED_INVENTORY_READ_MODEL=False)
+    def test_disabled(self):
+        pv = self.property_view_factory.get_property_view(cycle=self.cycle)
+        refresh_inventory_rows(property_view_ids=[pv.id])
+        data = get_inventory_related([pv], [])
+        self.assertEqual(len(data), 1)
+        self.assertFalse(PropertyInventoryRow.objects.exists())
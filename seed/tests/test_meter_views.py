@@ -5,9 +5,11 @@
 :author
 """
 import json
+from datetime import datetime, timedelta
 
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
@@ -19,6 +21,7 @@ from seed.models import (
     TimeSeries,
 )
 from seed.utils.organizations import create_organization
+from seed.utils.timeseries import bulk_insert_timeseries
 
 
 class TestMeterViewSet(TestCase):
@@ -150,42 +153,127 @@ class TestMeterViewSet(TestCase):
         self.assertEqual(len(jdata['meter']['data']), 100)
         self.assertDictEqual(jdata['meter']['data'][0], expected)
 
-        # Not yet implemented
-        # def test_add_timeseries(self):
-        #     """Adding time series works."""
-        #     meter = Meter.objects.create(
-        #         name='test',
-        #         energy_type=Meter.ELECTRICITY,
-        #         energy_units=Meter.KILOWATT_HOURS
-        #     )
-        #
-        #     client = APIClient()
-        #     client.login(username=self.user.username, password='secret')
-        #     url = reverse('apiv2:meters-add-timeseries', args=(meter.pk,))
-        #
-        #     resp = client.post(url)
-        #
-        #             'timeseries': [
-        #                 {
-        #                     'begin_time': '2014-07-10T18:14:54.726Z',
-        #                     'end_time': '2014-07-10T18:14:54.726Z',
-        #                     'cost': 345,
-        #                     'reading': 23.0,
-        #                 },
-        #                 {
-        #                     'begin_time': '2014-07-09T18:14:54.726Z',
-        #                     'end_time': '2014-07-09T18:14:54.726Z',
-        #                     'cost': 33,
-        #                     'reading': 11.0,
-        #                 }
-        #
-        #             ]
-        #         })
-        #     )
-        #
-        #     self.assertEqual(TimeSeries.objects.all().count(), 0)
-        #
-        #     resp = json.loads(meters.add_timeseries(fake_request).content)
-
-        #     self.assertEqual(resp, {'status': 'success'})
-        #     self.assertEqual(TimeSeries.objects.all().count(), 2)
+    def test_get_timeseries_rollups(self):
+        """We get the time series downsampled from the rollups."""
+        meter = Meter.objects.create(
+            name='test',
+            energy_type=Meter.ELECTRICITY,
+            energy_units=Meter.KILOWATT_HOURS
+        )
+
+        # hourly readings for three days, the reading is the day of the month
+        start = timezone.make_aware(datetime(2015, 1, 1), timezone.get_current_timezone())
+        bulk_insert_timeseries(meter, [
+            (start + timedelta(hours=i), start + timedelta(hours=i + 1), 1 + i // 24, 2)
+            for i in range(72)
+        ], batch_size=50)
+        self.assertEqual(meter.rollups.filter(period='hour').count(), 72)
+        self.assertEqual(meter.rollups.filter(period='day').count(), 3)
+        self.assertEqual(meter.rollups.filter(period='month').count(), 1)
+
+        client = APIClient()
+        client.login(username=self.user.username, password='secret')
+        url = reverse('api:v2:meters-get-timeseries', args=(meter.pk,))
+
+        data = json.loads(client.get(url, {'interval': 'day'}).content)['meter']['data']
+        self.assertEqual([d['value'] for d in data], [24, 48, 72])
+        self.assertEqual([d['count'] for d in data], [24, 24, 24])
+        self.assertEqual([d['cost'] for d in data], [48, 48, 48])
+        self.assertEqual(data[1]['min'], 2)
+        self.assertEqual(data[1]['max'], 2)
+
+        data = json.loads(client.get(url, {'interval': 'month'}).content)['meter']['data']
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['value'], 144)
+        self.assertEqual(data[0]['min'], 1)
+        self.assertEqual(data[0]['max'], 3)
+
+        data = json.loads(client.get(url, {
+            'interval': 'hour', 'start': '2015-01-02', 'end': '2015-01-02T06:00:00'
+        }).content)['meter']['data']
+        self.assertEqual(len(data), 6)
+
+        # adding readings updates the rollups
+        bulk_insert_timeseries(meter, [(start, start + timedelta(hours=1), 10, None)])
+        data = json.loads(client.get(url, {'interval': 'day'}).content)['meter']['data']
+        self.assertEqual([d['value'] for d in data], [34, 48, 72])
+
+        resp = client.get(url, {'interval': 'fortnight'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_add_timeseries(self):
+        """Adding time series works."""
+        property_view = PropertyState.objects.create(organization=self.org).promote(self.cycle)
+        meter = Meter.objects.create(
+            name='test',
+            energy_type=Meter.ELECTRICITY,
+            energy_units=Meter.KILOWATT_HOURS,
+            property_view=property_view,
+        )
+
+        client = APIClient()
+        client.login(username=self.user.username, password='secret')
+        url = reverse('api:v2:meters-get-timeseries', args=(meter.pk,))
+        url += '?organization_id={}'.format(self.org.pk)
+
+        self.assertEqual(TimeSeries.objects.all().count(), 0)
+
+        resp = client.post(url, data=json.dumps({
+            'timeseries': [
+                {
+                    'begin_time': '2014-07-10T18:14:54.726Z',
+                    'end_time': '2014-07-10T18:14:54.726Z',
+                    'cost': 345,
+                    'reading': 23.0,
+                },
+                {
+                    'begin_time': '2014-07-09T18:14:54.726Z',
+                    'end_time': '2014-07-09T18:14:54.726Z',
+                    'cost': 33,
+                    'reading': 11.0,
+                }
+            ]
+        }), content_type='application/json')
+
+        self.assertEqual(json.loads(resp.content), {'status': 'success', 'count': 2})
+        self.assertEqual(TimeSeries.objects.filter(meter=meter).count(), 2)
+
+        # invalid times are rejected without saving any of the readings
+        resp = client.post(url, data=json.dumps({
+            'timeseries': [
+                {'begin_time': '2014-07-11T18:14:54Z', 'end_time': None, 'reading': 1.0},
+                {'begin_time': 'not a time', 'end_time': None, 'reading': 1.0},
+            ]
+        }), content_type='application/json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(TimeSeries.objects.filter(meter=meter).count(), 2)
+
+    def test_add_timeseries_other_organization(self):
+        """Time series cannot be added to the meters of another organization."""
+        other_user = User.objects.create_user(
+            email='other_user@demo.com',
+            username='other_user@demo.com',
+            password='secret',
+        )
+        other_org, _, _ = create_organization(other_user, 'test-organization-b')
+        property_view = PropertyState.objects.create(organization=self.org).promote(self.cycle)
+        meter = Meter.objects.create(
+            name='test',
+            energy_type=Meter.ELECTRICITY,
+            energy_units=Meter.KILOWATT_HOURS,
+            property_view=property_view,
+        )
+
+        client = APIClient()
+        client.login(username=other_user.username, password='secret')
+        url = reverse('api:v2:meters-get-timeseries', args=(meter.pk,))
+        url += '?organization_id={}'.format(other_org.pk)
+
+        resp = client.post(url, data=json.dumps({
+            'timeseries': [
+                {'begin_time': '2014-07-10T18:14:54Z', 'end_time': None, 'reading': 1.0},
+            ]
+        }), content_type='application/json')
+
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(TimeSeries.objects.filter(meter=meter).count(), 0)
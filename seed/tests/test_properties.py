@@ -17,6 +17,7 @@ from seed.data_importer.tests.util import (
 )
 from seed.models import (
     Column,
+    PropertyAuditLog,
     PropertyState,
     ASSESSED_RAW,
     DATA_STATE_MAPPING,
@@ -24,6 +25,7 @@ from seed.models import (
     MERGE_STATE_UNKNOWN,
     MERGE_STATE_NEW,
 )
+from seed.models.auditlog import prefetch_lineage
 
 
 class TestProperties(DataMappingBaseTestCase):
@@ -81,3 +83,29 @@ class TestProperties(DataMappingBaseTestCase):
         ).first()
 
         self.assertEqual(expected.pk, coparent[0]['id'])
+
+    def test_audit_log_lineage(self):
+        # the merged states of the second import descend from both imports
+        log = PropertyAuditLog.objects.filter(
+            organization=self.org, name='System Match'
+        ).order_by('-id').first()
+        self.assertTrue(log.ancestor_ids)
+
+        ancestors = set()
+        parents = [log.parent1, log.parent2]
+        while parents:
+            parent = parents.pop()
+            if parent is not None:
+                ancestors.add(parent.id)
+                parents.extend([parent.parent1, parent.parent2])
+        self.assertEqual(sorted(ancestors), log.ancestor_ids)
+
+        # walking the prefetched lineage does not query the database
+        log = prefetch_lineage(PropertyAuditLog.objects.get(pk=log.pk))
+        with self.assertNumQueries(0):
+            parents = [log.parent1, log.parent2]
+            while parents:
+                parent = parents.pop()
+                if parent is not None:
+                    parent.state.address_line_1
+                    parents.extend([parent.parent1, parent.parent2])
@@ -128,3 +128,90 @@ class PropertyViewTests(TestCase):
                              microsecond=0))
         self.assertGreater(datetime.strptime(result['property']['db_property_updated'], "%Y-%m-%dT%H:%M:%S.%fZ"),
                            datetime.strptime(db_updated_time, "%Y-%m-%dT%H:%M:%S.%fZ"))
+
+    def test_list_properties_with_cursor(self):
+        for _ in range(5):
+            PropertyView.objects.create(
+                property=self.property_factory.get_property(), cycle=self.cycle,
+                state=self.property_state_factory.get_property_state(self.org)
+            )
+        view_ids = list(PropertyView.objects.filter(cycle=self.cycle).order_by('id').values_list(
+            'id', flat=True))
+
+        url = reverse('api:v2:properties-list')
+        params = {
+            'organization_id': self.org.pk,
+            'cycle': self.cycle.pk,
+            'per_page': 2,
+            'cursor': '',
+            'count': 'exact',
+        }
+        seen = []
+        while True:
+            result = json.loads(self.client.get(url, params).content)
+            seen.extend([r['property_view_id'] for r in result['results']])
+            self.assertEqual(result['pagination']['total'], 5)
+            if not result['pagination']['has_next']:
+                self.assertIsNone(result['pagination']['next'])
+                break
+            params['cursor'] = result['pagination']['next']
+        self.assertEqual(seen, view_ids)
+
+        # offset pages are still available
+        params = {'organization_id': self.org.pk, 'cycle': self.cycle.pk, 'per_page': 2, 'page': 3}
+        result = json.loads(self.client.get(url, params).content)
+        self.assertEqual(result['pagination']['num_pages'], 3)
+        self.assertEqual(result['pagination']['start'], 5)
+        self.assertEqual([r['property_view_id'] for r in result['results']], view_ids[4:])
+
+        params = {'organization_id': self.org.pk, 'cycle': self.cycle.pk, 'cursor': 'invalid'}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_and_autocomplete_properties(self):
+        for address, pm_property_id in [('123 Main Street', '4410'), ('12 Mainsail Road', '991'),
+                                        ('77 Elm Street', '123456')]:
+            PropertyView.objects.create(
+                property=self.property_factory.get_property(), cycle=self.cycle,
+                state=self.property_state_factory.get_property_state(
+                    self.org, address_line_1=address, pm_property_id=pm_property_id,
+                    jurisdiction_property_id='J-{}'.format(pm_property_id))
+            )
+
+        url = reverse('api:v2:properties-search')
+        params = {'organization_id': self.org.pk, 'cycle': self.cycle.pk, 'q': 'main street'}
+        result = json.loads(self.client.get(url, params).content)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual([r['address_line_1'] for r in result['results']], ['123 Main Street'])
+
+        params['q'] = 'Main'
+        result = json.loads(self.client.get(url, params).content)
+        self.assertEqual(result['results'][0]['address_line_1'], '123 Main Street')
+        self.assertEqual(len(result['results']), 2)
+        self.assertGreaterEqual(result['results'][0]['rank'], result['results'][1]['rank'])
+
+        url = reverse('api:v2:properties-autocomplete')
+        params = {'organization_id': self.org.pk, 'q': '12'}
+        result = json.loads(self.client.get(url, params).content)
+        self.assertEqual(result['suggestions'], [
+            {'field': 'address_line_1', 'value': '12 Mainsail Road'},
+            {'field': 'address_line_1', 'value': '123 Main Street'},
+            {'field': 'pm_property_id', 'value': '123456'},
+        ])
+
+        url = reverse('api:v2:properties-search')
+        params = {'organization_id': self.org.pk, 'cycle': self.cycle.pk, 'q': 'Main', 'limit': 0}
+        result = json.loads(self.client.get(url, params).content)
+        self.assertEqual(len(result['results']), 1)
+
+        params['limit'] = 'abc'
+        self.assertEqual(self.client.get(url, params).status_code, 400)
+
+        params = {'organization_id': self.org.pk, 'cycle': 'abc', 'q': 'Main'}
+        self.assertEqual(self.client.get(url, params).status_code, 400)
+        url = reverse('api:v2:properties-autocomplete')
+        self.assertEqual(self.client.get(url, params).status_code, 400)
+        url = reverse('api:v2:properties-search')
+
+        response = self.client.get(url, {'q': 'main'})
+        self.assertEqual(response.status_code, 400)
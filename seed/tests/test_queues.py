@@ -0,0 +1,70 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from django.test import TestCase, override_settings
+
+from seed.data_importer.models import ImportFile, ImportRecord
+from seed.landing.models import SEEDUser as User
+from seed.lib.superperms.orgs.models import Organization
+from seed.utils import queues
+
+
+@override_settings(CELERY_TASK_DEFAULT_QUEUE='seed-test', SEED_CELERY_QUEUE_SHARDS=4)
+class TestQueues(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test_user@demo.com', password='test_pass')
+        self.org = Organization.objects.create()
+        self.import_record = ImportRecord.objects.create(
+            owner=self.user, super_organization=self.org
+        )
+        self.import_file = ImportFile.objects.create(import_record=self.import_record)
+
+    def route(self, name, args=(), kwargs=None):
+        route = queues.route_task(name, args, kwargs or {}, {})
+        return route['queue'] if route else None
+
+    def test_task_queues(self):
+        names = [q.name for q in queues.task_queues('seed-test', 2)]
+        self.assertEqual(names[0], 'seed-test')
+        self.assertIn('seed-test-mapping', names)
+        self.assertIn('seed-test-mapping-1', names)
+        self.assertNotIn('seed-test-mapping-2', names)
+        self.assertEqual(len(names), 1 + len(queues.WORKLOADS) * 3)
+
+    def test_route_by_workload(self):
+        self.assertEqual(self.route('seed.data_importer.tasks.finish_mapping', (1, True)),
+                         'seed-test-mapping')
+        self.assertEqual(self.route('seed.data_importer.tasks.do_checks', ([], [])),
+                         'seed-test-data-quality')
+        self.assertEqual(self.route('seed.tasks.invite_to_seed'), 'seed-test-email')
+        self.assertIsNone(self.route('seed.tasks.sync_extra_data_index', (1,)))
+
+    def test_route_chunks_by_organization(self):
+        shard = self.org.pk % 4
+        self.assertEqual(
+            self.route('seed.data_importer.tasks.map_row_chunk',
+                       ([1, 2], self.import_file.pk, 'Assessed Raw', 'key', 0.1)),
+            'seed-test-mapping-{}'.format(shard)
+        )
+        self.assertEqual(
+            self.route('seed.tasks._delete_organization_property_chunk',
+                       ([1, 2], 'key', 0.1, self.org.pk)),
+            'seed-test-delete-{}'.format(shard)
+        )
+        self.assertEqual(
+            self.route('seed.data_importer.tasks._save_raw_data_spooled_chunk',
+                       kwargs={'file_pk': self.import_file.pk}),
+            'seed-test-raw-save-{}'.format(shard)
+        )
+
+    @override_settings(SEED_CELERY_QUEUE_SHARDS=0)
+    def test_route_without_shards(self):
+        self.assertEqual(
+            self.route('seed.tasks._delete_organization_property_chunk',
+                       ([1, 2], 'key', 0.1, self.org.pk)),
+            'seed-test-delete'
+        )
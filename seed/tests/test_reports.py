@@ -0,0 +1,103 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from datetime import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from seed.landing.models import SEEDUser as User
+from seed.lib.superperms.orgs.models import Organization, OrganizationUser
+from seed.models import PropertyView
+from seed.test_helpers.fake import (
+    FakeCycleFactory,
+    FakePropertyFactory,
+    FakePropertyStateFactory,
+)
+from seed.utils.reports import get_aggregated_report_data, get_report_data
+
+
+class TestReports(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            email='test_user@demo.com', username='test_user@demo.com', password='test_pass'
+        )
+        self.org = Organization.objects.create()
+        OrganizationUser.objects.create(user=self.user, organization=self.org)
+        self.property_factory = FakePropertyFactory(organization=self.org)
+        self.state_factory = FakePropertyStateFactory(organization=self.org)
+        cycle_factory = FakeCycleFactory(organization=self.org, user=self.user)
+        self.cycle_2015 = cycle_factory.get_cycle(
+            start=datetime(2015, 1, 1, tzinfo=timezone.get_current_timezone()))
+        self.cycle_2016 = cycle_factory.get_cycle(
+            start=datetime(2016, 1, 1, tzinfo=timezone.get_current_timezone()))
+
+        for site_eui, year_built, use in [(10, 1991, 'Office'), (20, 1995, 'office'),
+                                          (60, 1995, 'Retail'), (None, 2001, 'Retail')]:
+            self._create_view(self.cycle_2015, site_eui=site_eui, year_built=year_built,
+                              use_description=use, gross_floor_area=150000)
+        # campus properties are only reported with campus_only
+        self._create_view(self.cycle_2015, campus=True, site_eui=100, year_built=2010,
+                          use_description='Office', gross_floor_area=2500000)
+
+    def _create_view(self, cycle, campus=False, **kw):
+        prprty = self.property_factory.get_property(campus=campus)
+        state = self.state_factory.get_property_state(self.org, **kw)
+        return PropertyView.objects.create(property=prprty, cycle=cycle, state=state)
+
+    def test_report_data(self):
+        cycles = [self.cycle_2015, self.cycle_2016]
+        data = get_report_data(self.org.pk, cycles, 'site_eui', 'year_built', False)
+
+        self.assertEqual([d['cycle_id'] for d in data], [self.cycle_2015.pk, self.cycle_2016.pk])
+        self.assertEqual(data[0]['property_counts'], {
+            'yr_e': '2015', 'num_properties': 4, 'num_properties_w-data': 3
+        })
+        self.assertEqual(sorted((d['x'], d['y'], d['yr_e']) for d in data[0]['chart_data']),
+                         [(10, 1991, '2015'), (20, 1995, '2015'), (60, 1995, '2015')])
+        self.assertEqual(data[1]['property_counts']['num_properties'], 0)
+        self.assertEqual(data[1]['chart_data'], [])
+
+        data = get_report_data(self.org.pk, cycles, 'site_eui', 'year_built', True)
+        self.assertEqual(data[0]['property_counts']['num_properties'], 5)
+
+    def test_aggregated_report_data(self):
+        data = get_aggregated_report_data(
+            self.org.pk, [self.cycle_2015], 'site_eui', 'use_description', False)
+        self.assertEqual(data[0]['property_counts']['num_properties_w-data'], 3)
+        self.assertEqual(sorted((d['y'], d['x']) for d in data[0]['chart_data']),
+                         [('Office', 15.0), ('Retail', 60.0)])
+
+        data = get_aggregated_report_data(
+            self.org.pk, [self.cycle_2015], 'site_eui', 'year_built', True)
+        self.assertEqual(sorted((d['y'], d['x']) for d in data[0]['chart_data']),
+                         [('1990-1999', 20.0), ('2010-2019', 100.0)])
+
+        data = get_aggregated_report_data(
+            self.org.pk, [self.cycle_2015], 'site_eui', 'gross_floor_area', True)
+        self.assertEqual(sorted((d['y'], d['x']) for d in data[0]['chart_data']),
+                         [('100-199k', 20.0), ('over 1,000k', 100.0)])
+
+    def test_report_cache_is_invalidated(self):
+        cycles = [self.cycle_2015]
+        data = get_report_data(self.org.pk, cycles, 'site_eui', 'year_built', False)
+        self.assertEqual(data[0]['property_counts']['num_properties'], 4)
+
+        self._create_view(self.cycle_2015, site_eui=30, year_built=1980)
+        data = get_report_data(self.org.pk, cycles, 'site_eui', 'year_built', False)
+        self.assertEqual(data[0]['property_counts']['num_properties'], 5)
+
+        # the reports filter on the campus flag of the properties
+        view = PropertyView.objects.filter(cycle=self.cycle_2015, property__campus=True).first()
+        view.property.campus = False
+        view.property.save()
+        data = get_report_data(self.org.pk, cycles, 'site_eui', 'year_built', False)
+        self.assertEqual(data[0]['property_counts']['num_properties'], 6)
+
+        PropertyView.objects.filter(cycle=self.cycle_2015).delete()
+        data = get_report_data(self.org.pk, cycles, 'site_eui', 'year_built', False)
+        self.assertEqual(data[0]['property_counts']['num_properties'], 0)
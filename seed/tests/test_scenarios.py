@@ -7,8 +7,10 @@
 
 from django.test import TestCase
 
+from seed.models.measures import Measure
 from seed.models.scenarios import Scenario
-from seed.models import Organization
+from seed.models.simulations import Simulation
+from seed.models import Organization, PropertyState
 from seed.test_helpers.fake import FakePropertyMeasureFactory
 
 
@@ -37,3 +39,50 @@ class TestMeasures(TestCase):
 
         # create a new meter
         # s.meters.add()
+
+    def test_merge_relationships_batch(self):
+        Measure.populate_measures(self.org.id)
+        merges = []
+        for _ in range(2):
+            state1 = FakePropertyMeasureFactory(self.org).get_property_state(number_of_measures=3)
+            state2 = FakePropertyMeasureFactory(self.org).get_property_state(number_of_measures=0)
+            scenario = Scenario.objects.create(name='Package', property_state=state1)
+            scenario.measures.add(*state1.propertymeasure_set.all()[:2])
+            Scenario.objects.create(name='No Measures', property_state=state2)
+            Simulation.objects.create(property_state=state2, data={'eui': 10})
+            merged_state = PropertyState.objects.create(organization=self.org)
+            merges.append((merged_state, state1, state2))
+
+        PropertyState.merge_relationships_batch(merges)
+
+        for merged_state, state1, state2 in merges:
+            self.assertEqual(merged_state.propertymeasure_set.count(), 3)
+            self.assertEqual(
+                sorted(merged_state.scenarios.values_list('name', flat=True)),
+                ['No Measures', 'Package']
+            )
+            package = merged_state.scenarios.get(name='Package')
+            self.assertEqual(package.measures.count(), 2)
+            self.assertEqual(package.measures.exclude(property_state=merged_state).count(), 0)
+            self.assertEqual(Simulation.objects.get(property_state=merged_state).data, {'eui': 10})
+
+            # the parents keep their relationships
+            self.assertEqual(state1.propertymeasure_set.count(), 3)
+            self.assertEqual(state2.scenarios.count(), 1)
+
+    def test_move_relationships(self):
+        Measure.populate_measures(self.org.id)
+        old_state = FakePropertyMeasureFactory(self.org).get_property_state(number_of_measures=2)
+        Scenario.objects.create(name='Package', property_state=old_state)
+        Simulation.objects.create(property_state=old_state, data={'eui': 10})
+        new_state = PropertyState.objects.create(organization=self.org)
+        # the new state already has a simulation, which is replaced
+        Simulation.objects.create(property_state=new_state, data={'eui': 20})
+
+        PropertyState.move_relationships([(old_state, new_state)])
+
+        self.assertEqual(new_state.propertymeasure_set.count(), 2)
+        self.assertEqual(list(new_state.scenarios.values_list('name', flat=True)), ['Package'])
+        self.assertEqual(Simulation.objects.get(property_state=new_state).data, {'eui': 10})
+        self.assertEqual(old_state.propertymeasure_set.count(), 0)
+        self.assertEqual(old_state.scenarios.count(), 0)
@@ -8,12 +8,25 @@ import logging
 from os import path
 
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
 
 from seed import tasks
 from seed.data_importer.models import ImportFile, ImportRecord
 from seed.landing.models import SEEDUser as User
 from seed.lib.superperms.orgs.models import Organization, OrganizationUser
+from seed.models import (
+    Column,
+    Cycle,
+    Property, PropertyAuditLog, PropertyState, PropertyView,
+    StatusLabel,
+    TaxLot, TaxLotState
+)
+from seed.test_helpers.fake import (
+    FakePropertyViewFactory, FakeStatusLabelFactory, FakeTaxLotFactory,
+    FakeTaxLotStateFactory
+)
+from seed.utils.extra_data import index_name, sync_index
 
 logger = logging.getLogger(__name__)
 
@@ -103,6 +116,51 @@ class TestTasks(TestCase):
         self.assertFalse(
             ImportFile.objects.filter(pk=self.import_file.pk).exists())
 
+    @override_settings(SEED_FAST_INVENTORY_DELETE=True)
+    def test_delete_organization_inventory(self):
+        label = FakeStatusLabelFactory(organization=self.fake_org).get_statuslabel()
+        view_factory = FakePropertyViewFactory(organization=self.fake_org, user=self.fake_user)
+        for _ in range(3):
+            view = view_factory.get_property_view()
+            view.property.labels.add(label)
+            PropertyAuditLog.objects.create(
+                organization=self.fake_org, state=view.state, view=view, name='Import Creation'
+            )
+        FakeTaxLotFactory(organization=self.fake_org).get_taxlot(labels=[label])
+        FakeTaxLotStateFactory(organization=self.fake_org).get_taxlot_state()
+
+        other_org = Organization.objects.create()
+        other_view = FakePropertyViewFactory(organization=other_org).get_property_view()
+
+        tasks.delete_organization_inventory(self.fake_org.pk, 'fake-progress-key')
+
+        for model in [Property, PropertyState, TaxLot, TaxLotState, PropertyAuditLog]:
+            self.assertFalse(model.objects.filter(organization=self.fake_org).exists())
+        self.assertFalse(PropertyView.objects.filter(cycle__organization=self.fake_org).exists())
+        # the labels and cycles are only deleted with the organization
+        self.assertTrue(StatusLabel.objects.filter(pk=label.pk).exists())
+        self.assertTrue(Cycle.objects.filter(organization=self.fake_org).exists())
+        self.assertTrue(PropertyView.objects.filter(pk=other_view.pk).exists())
+
+    @override_settings(SEED_FAST_INVENTORY_DELETE=True)
+    def test_delete_organization_drops_extra_data_indexes(self):
+        column = Column.objects.create(
+            organization=self.fake_org,
+            table_name='PropertyState',
+            column_name='Site EUI',
+            is_extra_data=True,
+            is_indexed=True,
+        )
+        name = sync_index(column)
+        self.assertEqual(name, index_name(column))
+
+        tasks.delete_organization(self.fake_org.pk, 'fake-progress-key')
+
+        self.assertFalse(Column.objects.filter(pk=column.pk).exists())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM pg_indexes WHERE indexname = %s', [name])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
     def test_delete_organization_doesnt_delete_user_if_multiple_memberships(self):
         """
         Deleting an org should not delete the orgs users if the user belongs to many orgs.
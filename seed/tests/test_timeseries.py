@@ -0,0 +1,79 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from datetime import datetime, timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from seed.models import Meter, TimeSeries, TimeSeriesBlock
+from seed.utils.timeseries import (
+    bulk_insert_timeseries,
+    count_readings,
+    get_timeseries,
+    iter_readings,
+)
+
+
+@override_settings(SEED_TIMESERIES_COMPACT_STORAGE=True)
+class TestCompactTimeSeries(TestCase):
+
+    def setUp(self):
+        self.meter = Meter.objects.create(
+            name='test',
+            energy_type=Meter.ELECTRICITY,
+            energy_units=Meter.KILOWATT_HOURS
+        )
+        self.start = timezone.make_aware(datetime(2015, 1, 31, 12),
+                                         timezone.get_current_timezone())
+
+    def test_readings_are_packed_per_month(self):
+        # hourly readings over a month boundary, with a gap
+        readings = [
+            (self.start + timedelta(hours=i), self.start + timedelta(hours=i + 1), i, 0.5)
+            for i in range(24) if i != 3
+        ]
+        self.assertEqual(bulk_insert_timeseries(self.meter, readings, batch_size=10), 23)
+
+        self.assertEqual(TimeSeries.objects.filter(meter=self.meter).count(), 0)
+        blocks = list(TimeSeriesBlock.objects.filter(meter=self.meter).order_by('start_time'))
+        self.assertEqual(len(blocks), 2)
+        self.assertEqual(blocks[0].interval_seconds, 3600)
+        self.assertEqual(timezone.localtime(blocks[1].start_time).day, 1)
+
+        # 30 days and 12 hours of empty readings before the first reading of January
+        self.assertEqual(len(blocks[0].readings), 30 * 24 + 12 + 12)
+        self.assertEqual(
+            blocks[0].expand()[0], (self.start, self.start + timedelta(hours=1), 0, 0.5)
+        )
+
+        expanded = list(iter_readings(self.meter))
+        self.assertEqual(len(expanded), 23)
+        self.assertEqual([r[2] for r in expanded], [i for i in range(24) if i != 3])
+        self.assertEqual(expanded[3][0], self.start + timedelta(hours=4))
+        self.assertEqual(count_readings(self.meter), 23)
+
+        data = get_timeseries(self.meter, 'day')
+        self.assertEqual([d['count'] for d in data], [11, 12])
+        self.assertEqual(data[0]['cost'], 5.5)
+
+    def test_irregular_readings_are_stored_as_rows(self):
+        bulk_insert_timeseries(self.meter, [
+            (self.start, self.start + timedelta(hours=1), 1, None),
+            (self.start + timedelta(hours=1), self.start + timedelta(minutes=90), 2, None),
+            (self.start + timedelta(minutes=150), self.start + timedelta(minutes=210), 3, None),
+            (None, None, 4, None),
+        ])
+
+        block = TimeSeriesBlock.objects.get(meter=self.meter)
+        self.assertEqual(len(block.readings), 30 * 24 + 12 + 1)
+        self.assertEqual(block.readings[-1], 1)
+        self.assertEqual(TimeSeries.objects.filter(meter=self.meter).count(), 3)
+        self.assertEqual([r[2] for r in iter_readings(self.meter)], [1, 2, 3])
+        self.assertEqual(
+            [r[2] for r in iter_readings(self.meter, start=self.start + timedelta(hours=1))],
+            [2, 3]
+        )
@@ -20,6 +20,7 @@ from django.core.exceptions import (
 )
 
 from seed.landing.models import SEEDUser as User
+from seed.lib.superperms.orgs.membership import get_membership
 from seed.lib.superperms.orgs.permissions import get_org_id, get_user_org
 
 # Data Structures
@@ -243,9 +244,8 @@ class OrgMixin(object):
                 org = get_user_org(request.user)
                 org_id = getattr(org, 'pk')
             if return_obj and not org:
-                try:
-                    org = request.user.orgs.get(pk=org_id)
-                except ObjectDoesNotExist:
+                org, org_user = get_membership(request, org_id)
+                if org_user is None:
                     raise PermissionDenied('Incorrect org id.')
             self._organization = org_id if not return_obj else org
         return self._organization
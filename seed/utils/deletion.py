@@ -0,0 +1,120 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+
+Set-based deletes of large numbers of rows, e.g. the inventory of an organization. Django's
+collector loads every object that a delete cascades to, sends the delete signals for each of them
+and recurses through the relations, which takes hours for a large organization. `fast_delete`
+follows the same relations as the collector, but only queries the ids of the rows and deletes
+each table with one DELETE statement per batch of ids, without sending signals.
+
+The foreign keys are deferred until the end of the transaction in Postgres, so the rows are
+deleted inside of a single transaction and the order of the statements does not matter. The
+database would refuse to delete rows that relations with on_delete=DO_NOTHING still point to, so
+those rows are deleted as well (e.g. the PropertyMeasures, which the pre_delete signal of
+PropertyState removes), or their foreign key is set to NULL if it is nullable.
+"""
+from collections import OrderedDict
+
+from django.contrib.contenttypes.fields import GenericRelation
+from django.db import connection, models, transaction
+from django.db.models.deletion import ProtectedError, get_candidate_relations_to_delete
+
+from seed.lib.mcm.utils import batch
+
+# Number of ids in each query
+BATCH_SIZE = 1000
+
+DELETE_SQL = 'DELETE FROM {table} WHERE {pk} = ANY(%s)'
+
+
+def collect(model, ids):
+    """
+    Return the rows to delete along with the rows of a model and the foreign keys to set to NULL.
+
+    :param model: Model class
+    :param ids: list of primary keys
+    :return: tuple, (OrderedDict of Model class: set of primary keys,
+                     list of (Model class, field name, list of primary keys it refers to))
+    :raises ProtectedError: if a PROTECT relation refers to one of the rows
+    """
+    collected = OrderedDict()
+    set_null = []
+    pending = [(model, set(ids))]
+    while pending:
+        model, ids = pending.pop(0)
+        new_ids = ids - collected.get(model, set())
+        if not new_ids:
+            continue
+        collected.setdefault(model, set()).update(new_ids)
+
+        if any(isinstance(f, GenericRelation) for f in model._meta.private_fields):
+            # the generic relations are only known to the objects, use Model.delete
+            raise ValueError('Unsupported generic relation of {}'.format(model.__name__))
+
+        for related in get_candidate_relations_to_delete(model._meta):
+            field = related.field
+            on_delete = field.remote_field.on_delete
+            for ids_batch in batch(sorted(new_ids), BATCH_SIZE):
+                related_rows = related.related_model._base_manager.filter(
+                    **{'{}__in'.format(field.name): ids_batch}
+                )
+                if on_delete == models.DO_NOTHING:
+                    # the rows would violate the foreign key, keep them if it can be cleared
+                    on_delete = models.SET_NULL if field.null else models.CASCADE
+
+                if on_delete == models.CASCADE:
+                    pending.append((
+                        related.related_model,
+                        set(related_rows.values_list('pk', flat=True))
+                    ))
+                elif on_delete == models.SET_NULL:
+                    set_null.append((related.related_model, field.name, ids_batch))
+                elif on_delete == models.PROTECT:
+                    protected = list(related_rows[:10])
+                    if protected:
+                        raise ProtectedError(
+                            'Cannot delete {} rows that are referenced by {}.{}'.format(
+                                model.__name__, related.related_model.__name__, field.name),
+                            protected
+                        )
+                else:
+                    raise ValueError('Unsupported on_delete of {}.{}'.format(
+                        related.related_model.__name__, field.name))
+
+    return collected, set_null
+
+
+def fast_delete(model, ids):
+    """
+    Delete rows of a model and all of the rows that cascade from them with set-based statements
+    in one transaction. No signals are sent, the callers need to invalidate any caches that the
+    signals would have invalidated.
+
+    :param model: Model class
+    :param ids: list of primary keys
+    :return: dict, model name: number of deleted rows
+    """
+    with transaction.atomic():
+        collected, set_null = collect(model, ids)
+
+        for related_model, field_name, ids_batch in set_null:
+            related_model._base_manager.filter(
+                **{'{}__in'.format(field_name): ids_batch}
+            ).update(**{field_name: None})
+
+        deleted = OrderedDict()
+        with connection.cursor() as cursor:
+            # the dependent rows were collected last, delete them first
+            for collected_model, collected_ids in reversed(collected.items()):
+                sql = DELETE_SQL.format(
+                    table=connection.ops.quote_name(collected_model._meta.db_table),
+                    pk=connection.ops.quote_name(collected_model._meta.pk.column),
+                )
+                for ids_batch in batch(sorted(collected_ids), BATCH_SIZE):
+                    cursor.execute(sql, [ids_batch])
+                deleted[collected_model._meta.label] = len(collected_ids)
+
+    return deleted
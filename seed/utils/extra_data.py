@@ -0,0 +1,151 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+
+Query expressions and indexes for the values of the extra_data JSONB fields.
+
+An organization can mark an extra data column as indexed, in which case a btree expression index
+is created on the value of that key for the organization's states. Numeric columns (columns whose
+unit is a Float or Decimal) are indexed on the value cast with `seed_try_float`, which returns NULL
+instead of raising for values that are not numbers, all other columns on the text value. The
+expressions built by `ExtraDataValue` are identical to the indexed expressions so that filters and
+sorts on the extra data values can use the indexes.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import logging
+
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Func, TextField, Value
+
+from seed.models.models import DECIMAL, FLOAT
+
+_log = logging.getLogger(__name__)
+
+# Immutable function to cast the text values of extra data to a float, created in migration 0081
+TRY_FLOAT_FUNCTION = 'seed_try_float'
+
+STATE_TABLES = {
+    'PropertyState': 'seed_propertystate',
+    'TaxLotState': 'seed_taxlotstate',
+}
+
+
+class ExtraDataValue(Func):
+    """
+    The value of a key in extra_data as text, or as a float if `numeric` is True.
+
+    Example::
+
+        PropertyState.objects.annotate(
+            site_eui=ExtraDataValue('Site EUI', numeric=True)
+        ).filter(site_eui__gt=100)
+    """
+    arg_joiner = ' ->> '
+
+    def __init__(self, key, numeric=False, field='extra_data', **extra):
+        self.numeric = numeric
+        output_field = FloatField() if numeric else TextField()
+        super(ExtraDataValue, self).__init__(
+            F(field), Value(key), output_field=output_field, **extra
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        if self.numeric:
+            extra_context['template'] = '{}(%(expressions)s)'.format(TRY_FLOAT_FUNCTION)
+        else:
+            extra_context['template'] = '(%(expressions)s)'
+        return super(ExtraDataValue, self).as_sql(compiler, connection, **extra_context)
+
+
+def is_numeric_column(column):
+    """Return True if the values of an extra data Column should be indexed and compared as floats"""
+    return column.unit is not None and column.unit.unit_type in [FLOAT, DECIMAL]
+
+
+def index_name(column):
+    """
+    Return the name of the expression index for an extra data Column. Postgres limits names to
+    63 characters, so the key is hashed.
+    """
+    key_hash = hashlib.md5(column.column_name.encode('utf-8')).hexdigest()[:12]
+    prefix = 'ps' if column.table_name == 'PropertyState' else 'tls'
+    return 'seed_{}_ed_{}_{}'.format(prefix, column.organization_id, key_hash)
+
+
+def _run_ddl(sql, params=None):
+    # CONCURRENTLY cannot be used inside of a transaction (e.g. in tests or ATOMIC_REQUESTS)
+    concurrently = '' if connection.in_atomic_block else 'CONCURRENTLY '
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(concurrently=concurrently), params)
+
+
+def index_exists(name):
+    """Return True if an index exists, CREATE INDEX IF NOT EXISTS requires Postgres 9.5"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_class WHERE relname = %s AND relkind = 'i'", [name])
+        return cursor.fetchone() is not None
+
+
+def _build_index(column, name):
+    if not column.is_extra_data or column.table_name not in STATE_TABLES:
+        raise ValueError('Only extra data columns of PropertyState or TaxLotState can be indexed')
+
+    if is_numeric_column(column):
+        expression = '{}(extra_data ->> %s)'.format(TRY_FLOAT_FUNCTION)
+    else:
+        expression = '(extra_data ->> %s)'
+
+    _log.debug('Creating extra data index {} on {}'.format(name, column.column_name))
+    _run_ddl(
+        'CREATE INDEX {{concurrently}}{} ON {} (({})) WHERE organization_id = %s'.format(
+            name, STATE_TABLES[column.table_name], expression
+        ),
+        [column.column_name, column.organization_id]
+    )
+
+
+def create_index(column):
+    """
+    Create the expression index for an extra data column, scoped to the column's organization.
+
+    :param column: Column, extra data column of a PropertyState or TaxLotState
+    :return: str, name of the index
+    """
+    name = index_name(column)
+    if not index_exists(name):
+        _build_index(column, name)
+    return name
+
+
+def drop_index(column):
+    """Drop the expression index of an extra data column if it exists"""
+    _run_ddl('DROP INDEX {{concurrently}}IF EXISTS {}'.format(index_name(column)))
+
+
+def sync_index(column):
+    """
+    Create or drop the index of a column to match its is_indexed flag. An existing index is
+    rebuilt (e.g. for a change of the column's unit) under a temporary name and swapped in
+    afterwards, so that the column is not left without an index while the new one is built.
+    """
+    if not column.is_indexed:
+        drop_index(column)
+        return
+
+    name = index_name(column)
+    if not index_exists(name):
+        return create_index(column)
+
+    new_name = '{}_new'.format(name)
+    # left over from an interrupted rebuild
+    _run_ddl('DROP INDEX {{concurrently}}IF EXISTS {}'.format(new_name))
+    _build_index(column, new_name)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX {}'.format(name))
+            cursor.execute('ALTER INDEX {} RENAME TO {}'.format(new_name, name))
+    return name
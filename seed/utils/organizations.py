@@ -4,11 +4,17 @@
 :copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
+from django.core.cache import cache
+from django.db.models import Count
+
 from seed.lib.superperms.orgs.models import (
     Organization as SuperOrganization,
     OrganizationUser as SuperOrganizationUser
 )
 
+# Seconds to keep the inventory counts of a cycle, creating or deleting a view invalidates them
+INVENTORY_COUNTS_TIMEOUT = 60 * 60 * 24
+
 
 def create_organization(user, org_name='', *args, **kwargs):
     """Helper script to create a user/org relationship from scratch.
@@ -34,3 +40,50 @@ def create_organization(user, org_name='', *args, **kwargs):
         )
 
     return org, org_user, user_added
+
+
+def _inventory_counts_key(cycle_id):
+    return 'inventory_counts:{}'.format(cycle_id)
+
+
+def invalidate_inventory_counts(cycle_id):
+    """Discard the cached property and tax lot view counts of a cycle"""
+    cache.delete(_inventory_counts_key(cycle_id))
+
+
+def get_inventory_counts(cycle_ids):
+    """
+    Return the number of property views and tax lot views of each cycle. The counts are cached
+    per cycle; the counts of the cycles that are not cached are computed with one grouped query
+    per inventory type.
+
+    :param cycle_ids: list of cycle ids
+    :return: dict, cycle id: (number of property views, number of tax lot views)
+    """
+    from seed.models import PropertyView, TaxLotView
+
+    cycle_ids = list(cycle_ids)
+    cached = cache.get_many([_inventory_counts_key(cycle_id) for cycle_id in cycle_ids])
+
+    counts = {}
+    missing = []
+    for cycle_id in cycle_ids:
+        cycle_counts = cached.get(_inventory_counts_key(cycle_id))
+        if cycle_counts is None:
+            missing.append(cycle_id)
+        else:
+            counts[cycle_id] = tuple(cycle_counts)
+
+    if missing:
+        num_properties = dict(PropertyView.objects.filter(cycle_id__in=missing).order_by()
+                              .values_list('cycle_id').annotate(Count('id')))
+        num_taxlots = dict(TaxLotView.objects.filter(cycle_id__in=missing).order_by()
+                           .values_list('cycle_id').annotate(Count('id')))
+        for cycle_id in missing:
+            counts[cycle_id] = (num_properties.get(cycle_id, 0), num_taxlots.get(cycle_id, 0))
+        cache.set_many(
+            {_inventory_counts_key(cycle_id): counts[cycle_id] for cycle_id in missing},
+            INVENTORY_COUNTS_TIMEOUT
+        )
+
+    return counts
@@ -9,10 +9,18 @@ required approvals from the U.S. Department of Energy) and contributors.
 All rights reserved.  # NOQA
 :author
 """
+import base64
+import hashlib
+import json
 from collections import OrderedDict
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connection
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from seed.utils.cache import get_cache_raw, set_cache_raw
+
 
 class ResultsListPagination(PageNumberPagination):
     page_size_query_param = 'per_page'
@@ -30,3 +38,139 @@ class ResultsListPagination(PageNumberPagination):
             ('total', self.page.paginator.count),
             ('results', data)
         ]))
+
+
+def parse_page_size(value, default, maximum):
+    """
+    Return a page size or result limit from a query parameter, clamped to between 1 and `maximum`.
+    A missing value is the default.
+
+    :raises ValueError: if the value is not an integer
+    """
+    if value is None or value == '':
+        return default
+    return min(max(int(value), 1), maximum)
+
+
+# Seconds that an exact inventory count is reused as the approximate count of cursor pages
+COUNT_CACHE_TIMEOUT = 300
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_id):
+    """Return an opaque token pointing after the view with id `last_id`"""
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}))
+
+
+def decode_cursor(token):
+    """
+    Return the view id encoded in a token from `encode_cursor`. An empty token is the first page.
+
+    :raises InvalidCursor: if the token was not created by `encode_cursor`
+    """
+    if not token:
+        return 0
+    try:
+        return int(json.loads(base64.urlsafe_b64decode(str(token)))['id'])
+    except (TypeError, ValueError, KeyError):
+        raise InvalidCursor('Invalid cursor: {}'.format(token))
+
+
+def _count_cache_key(queryset):
+    sql, params = queryset.query.sql_with_params()
+    return 'inventory_count:{}'.format(hashlib.md5(repr((sql, params))).hexdigest())
+
+
+def exact_count(queryset):
+    """COUNT(*) of the queryset, remembered so later cursor pages can reuse it as an estimate"""
+    count = queryset.count()
+    set_cache_raw(_count_cache_key(queryset.order_by()), count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def approximate_count(queryset):
+    """
+    Cheap estimate of the size of the queryset. Uses a recently cached exact count if there is one,
+    otherwise the planner's row estimate, which is derived from pg_class.reltuples and the column
+    statistics and does not scan the table.
+    """
+    queryset = queryset.order_by()
+    count = get_cache_raw(_count_cache_key(queryset))
+    if count is not None:
+        return count
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def paginate_views(views_list, query_params, key='id'):
+    """
+    Paginate an inventory view queryset (ordered by id) using either offset pages or, when a
+    `cursor` query parameter is passed, keyset pages that filter on the view id instead of using
+    OFFSET. Cursor pages take an optional `count` parameter of `approximate` (default), `exact` or
+    `none`.
+
+    :param views_list: QuerySet, PropertyViews or TaxLotViews ordered by id, or any queryset
+        ordered by the unique field `key` (e.g. the inventory rows ordered by view_id)
+    :param query_params: dict, request query parameters
+    :param key: str, field that the queryset is ordered by and the cursor points at
+    :return: tuple, (list of views, pagination dict)
+    :raises InvalidCursor: if the cursor token is not valid
+    """
+    per_page = query_params.get('per_page', 1)
+
+    if 'cursor' not in query_params:
+        paginator = Paginator(views_list, per_page)
+        page = query_params.get('page', 1)
+        try:
+            views = paginator.page(page)
+        except PageNotAnInteger:
+            views = paginator.page(1)
+        except EmptyPage:
+            views = paginator.page(paginator.num_pages)
+
+        return views, {
+            'page': views.number,
+            'start': views.start_index(),
+            'end': views.end_index(),
+            'num_pages': paginator.num_pages,
+            'has_next': views.has_next(),
+            'has_previous': views.has_previous(),
+            'total': paginator.count
+        }
+
+    try:
+        per_page = max(int(per_page), 1)
+    except (TypeError, ValueError):
+        per_page = 1
+    last_id = decode_cursor(query_params.get('cursor'))
+
+    # fetch one extra row to find out if there is a next page without counting
+    views = list(views_list.filter(**{'{}__gt'.format(key): last_id})[:per_page + 1])
+    has_next = len(views) > per_page
+    views = views[:per_page]
+
+    count_mode = query_params.get('count', 'approximate')
+    if count_mode == 'exact':
+        total = exact_count(views_list)
+    elif count_mode == 'none':
+        total = None
+    else:
+        total = approximate_count(views_list)
+
+    return views, {
+        'per_page': per_page,
+        'has_next': has_next,
+        'has_previous': last_id > 0,
+        'next': encode_cursor(getattr(views[-1], key)) if has_next else None,
+        'total': total,
+        'total_is_approximate': count_mode not in ['exact', 'none'],
+    }
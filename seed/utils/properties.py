@@ -22,6 +22,7 @@ from seed.models import (
     TaxLotProperty,
     TaxLotView
 )
+from seed.models.inventory_rows import refresh_inventory_rows
 
 
 def get_changed_fields(old, new):
@@ -124,6 +125,7 @@ def pair_unpair_property_taxlot(property_id, taxlot_id, organization_id, pair):
         success = True
 
     if success:
+        refresh_inventory_rows(property_view_ids=[property_id], taxlot_view_ids=[taxlot_id])
         return JsonResponse({
             'status': 'success',
             'message': 'taxlot {} and property {} are now {}ed'.format(taxlot_id, property_id,
@@ -0,0 +1,163 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+
+Routing of the Celery tasks to a queue per workload (raw save, mapping, matching, data quality,
+deletion and email), so that the workers of each workload can be scaled on their own and a large
+import does not hold up the data quality checks or emails of other organizations. The queues are
+named after the default queue, e.g. seed-common-mapping.
+
+The chunk tasks, which a large import or delete enqueues by the thousand, are spread over
+SEED_CELERY_QUEUE_SHARDS queues per workload by organization (e.g. seed-common-mapping-0 to 3).
+A worker that consumes several queues takes the tasks from them in turn, so the chunks of one
+organization only hold up the organizations that share its shard. The orchestration tasks
+(e.g. finish_mapping) stay on the unsharded queue of the workload.
+
+This module is imported by the settings, so it must not import the models at the module level.
+"""
+import zlib
+
+from django.conf import settings
+from kombu import Exchange, Queue
+
+DEFAULT = 'default'
+RAW_SAVE = 'raw-save'
+MAPPING = 'mapping'
+MATCHING = 'matching'
+DATA_QUALITY = 'data-quality'
+DELETE = 'delete'
+EMAIL = 'email'
+WORKLOADS = [RAW_SAVE, MAPPING, MATCHING, DATA_QUALITY, DELETE, EMAIL]
+
+# Kinds of arguments that the chunk tasks are spread over the shards by
+ORG = 'org'
+IMPORT_FILE = 'import_file'
+KEY = 'key'
+
+# Task name: (workload, None or (kind, position, name) of the argument to shard by). The tasks
+# that are not listed run on the default queue.
+TASK_ROUTES = {
+    'seed.data_importer.tasks.save_raw_data': (RAW_SAVE, None),
+    'seed.data_importer.tasks._save_raw_data': (RAW_SAVE, None),
+    'seed.data_importer.tasks._save_raw_data_chunk': (RAW_SAVE, (IMPORT_FILE, 1, 'file_pk')),
+    'seed.data_importer.tasks._save_raw_data_spooled_chunk':
+        (RAW_SAVE, (IMPORT_FILE, 3, 'file_pk')),
+    'seed.data_importer.tasks._save_raw_green_button_data': (RAW_SAVE, None),
+    'seed.data_importer.tasks.finish_raw_save': (RAW_SAVE, None),
+    'seed.tasks.process_building_files': (RAW_SAVE, None),
+    'seed.tasks._process_building_files_chunk': (RAW_SAVE, (ORG, 1, 'org_pk')),
+    'seed.tasks._finish_process_building_files': (RAW_SAVE, None),
+
+    'seed.data_importer.tasks.map_data': (MAPPING, None),
+    'seed.data_importer.tasks._map_data': (MAPPING, None),
+    'seed.data_importer.tasks.map_row_chunk': (MAPPING, (IMPORT_FILE, 1, 'file_pk')),
+    'seed.data_importer.tasks.finish_mapping': (MAPPING, None),
+
+    'seed.data_importer.tasks.match_buildings': (MATCHING, None),
+    'seed.data_importer.tasks._match_properties_and_taxlots': (MATCHING, None),
+    'seed.data_importer.tasks._bulk_match': (MATCHING, None),
+
+    'seed.data_importer.tasks.do_checks': (DATA_QUALITY, None),
+    'seed.data_importer.tasks.trigger_data_quality_checks': (DATA_QUALITY, None),
+    'seed.data_importer.tasks._data_quality_check': (DATA_QUALITY, None),
+    # the checks of one run are kept together, the chunks do not know their organization
+    'seed.data_importer.tasks.check_data_chunk': (DATA_QUALITY, (KEY, 2, 'identifier')),
+    'seed.data_importer.tasks.finish_checking': (DATA_QUALITY, None),
+
+    'seed.tasks.delete_organization': (DELETE, None),
+    'seed.tasks.delete_organization_inventory': (DELETE, None),
+    'seed.tasks._delete_organization_related_data': (DELETE, None),
+    'seed.tasks._delete_organization_property_chunk': (DELETE, (ORG, 3, 'org_pk')),
+    'seed.tasks._delete_organization_property_state_chunk': (DELETE, (ORG, 3, 'org_pk')),
+    'seed.tasks._delete_organization_taxlot_chunk': (DELETE, (ORG, 3, 'org_pk')),
+    'seed.tasks._delete_organization_taxlot_state_chunk': (DELETE, (ORG, 3, 'org_pk')),
+    'seed.tasks._finish_delete': (DELETE, None),
+
+    'seed.tasks.invite_to_seed': (EMAIL, None),
+}
+
+# Organizations of the import files that chunk tasks were routed for, see _import_file_org
+_import_file_orgs = {}
+MAX_IMPORT_FILE_ORGS = 1000
+
+
+def queue_name(default_queue, workload=DEFAULT, shard=None):
+    """Return the name of the queue of a workload, or of one of its shards"""
+    if workload == DEFAULT:
+        return default_queue
+    if shard is None:
+        return '{}-{}'.format(default_queue, workload)
+    return '{}-{}-{}'.format(default_queue, workload, shard)
+
+
+def workload_queue_names(default_queue, workload, shards):
+    """Return the names of all queues of a workload, i.e. the queues its workers consume"""
+    names = [queue_name(default_queue, workload)]
+    if workload != DEFAULT and shards > 1:
+        names.extend(queue_name(default_queue, workload, shard) for shard in range(shards))
+    return names
+
+
+def task_queues(default_queue, shards):
+    """
+    Return the Queues to declare for CELERY_TASK_QUEUES. A worker that is started without a list
+    of queues consumes all of them.
+
+    :param default_queue: str, name of the default queue (CELERY_TASK_DEFAULT_QUEUE)
+    :param shards: int, number of shards of each workload (SEED_CELERY_QUEUE_SHARDS)
+    :return: tuple of Queues
+    """
+    names = []
+    for workload in [DEFAULT] + WORKLOADS:
+        names.extend(workload_queue_names(default_queue, workload, shards))
+    return tuple(Queue(name, Exchange(name), routing_key=name) for name in names)
+
+
+def _import_file_org(file_pk):
+    # the chunks of an import are all routed by the process that enqueues them, so the
+    # organization is looked up once per import file
+    from seed.data_importer.models import ImportFile
+
+    if file_pk not in _import_file_orgs:
+        if len(_import_file_orgs) >= MAX_IMPORT_FILE_ORGS:
+            _import_file_orgs.clear()
+        _import_file_orgs[file_pk] = ImportFile.objects.filter(pk=file_pk).values_list(
+            'import_record__super_organization_id', flat=True
+        ).first()
+    return _import_file_orgs[file_pk]
+
+
+def _shard(shard_by, args, kwargs, shards):
+    kind, position, name = shard_by
+    if name in kwargs:
+        value = kwargs[name]
+    elif len(args) > position:
+        value = args[position]
+    else:
+        return None
+
+    if kind == IMPORT_FILE:
+        value = _import_file_org(value) or value
+    if kind in [ORG, IMPORT_FILE]:
+        return int(value) % shards
+    return zlib.crc32(str(value).encode('utf-8')) % shards
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """
+    Celery router (CELERY_TASK_ROUTES) that sends the tasks to the queue of their workload.
+
+    :return: dict with the queue, or None for the default queue
+    """
+    route = TASK_ROUTES.get(name)
+    if route is None:
+        return None
+
+    workload, shard_by = route
+    shards = getattr(settings, 'SEED_CELERY_QUEUE_SHARDS', 0)
+    shard = None
+    if shard_by is not None and shards > 1:
+        shard = _shard(shard_by, args or (), kwargs or {}, shards)
+    return {'queue': queue_name(settings.CELERY_TASK_DEFAULT_QUEUE, workload, shard)}
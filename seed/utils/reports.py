@@ -0,0 +1,249 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+
+Aggregation of the property report data in the database. Each report is a single query that
+returns the property counts and the chart data (or the medians of the grouped chart data) of all
+of the requested cycles. The results are cached per organization, cycles, variables and campus
+flag; the cache of a cycle is invalidated by bumping the cycle's version whenever the data of one
+of its property views changes.
+"""
+from __future__ import unicode_literals
+
+import hashlib
+import uuid
+
+from django.db import connection
+
+from seed.utils.cache import get_cache_raw, set_cache_raw
+
+# Seconds to keep a report, changes to the data invalidate the report before this
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# PropertyState fields that can be used in the reports
+REPORT_VARIABLES = [
+    'site_eui', 'source_eui', 'site_eui_weather_normalized', 'source_eui_weather_normalized',
+    'energy_score', 'gross_floor_area', 'use_description', 'year_built'
+]
+STRING_VARIABLES = ['use_description']
+
+# Variables that the aggregated report can group on and the SQL expression of the group
+GROSS_FLOOR_AREA_MAX_BIN = 1000000
+AGGREGATE_GROUPS = {
+    'use_description': 'LOWER(s.use_description)',
+    'year_built': '(s.year_built / 10) * 10',
+    'gross_floor_area':
+        'GREATEST(0, LEAST({}, FLOOR(s.gross_floor_area / 100000.0) * 100000))'.format(
+            GROSS_FLOOR_AREA_MAX_BIN),
+}
+
+GROSS_FLOOR_AREA_DISPLAY = {
+    0: '0-99k',
+    100000: '100-199k',
+    200000: '200k-299k',
+    300000: '300k-399k',
+    400000: '400-499k',
+    500000: '500-599k',
+    600000: '600-699k',
+    700000: '700-799k',
+    800000: '800-899k',
+    900000: '900-999k',
+    1000000: 'over 1,000k',
+}
+
+REPORT_FROM = """
+    FROM seed_propertyview v
+    JOIN seed_property p ON p.id = v.property_id
+    JOIN seed_propertystate s ON s.id = v.state_id
+    WHERE p.organization_id = %s AND v.cycle_id = ANY(%s) {campus_filter}
+"""
+
+REPORT_SQL = """
+    SELECT v.cycle_id,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE {has_data}),
+           COALESCE(
+               json_agg(json_build_object('id', v.property_id, 'x', s.{x_var}, 'y', s.{y_var}))
+               FILTER (WHERE {has_data}),
+               '[]'
+           )
+    {report_from}
+    GROUP BY v.cycle_id
+"""
+
+# The first query returns the property counts of each cycle (is_total = 1), the second the medians
+# of each group of the cycle. Postgres 9.4 has no GROUPING SETS, so the two are a UNION ALL.
+AGGREGATED_REPORT_SQL = """
+    SELECT v.cycle_id,
+           1,
+           NULL,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE {has_data}),
+           NULL
+    {report_from}
+    GROUP BY v.cycle_id
+    UNION ALL
+    SELECT v.cycle_id,
+           0,
+           {group},
+           COUNT(*),
+           COUNT(*) FILTER (WHERE {has_data}),
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY s.{x_var}) FILTER (WHERE {has_data})
+    {report_from}
+    GROUP BY v.cycle_id, {group}
+"""
+
+
+def _has_data(var):
+    # the same test as the truthiness of the value in python
+    if var in STRING_VARIABLES:
+        return "s.{0} IS NOT NULL AND s.{0} <> ''".format(var)
+    return 's.{0} IS NOT NULL AND s.{0} <> 0'.format(var)
+
+
+def _report_query(sql, organization_id, cycles, x_var, y_var, campus_only, **kwargs):
+    if x_var not in REPORT_VARIABLES or y_var not in REPORT_VARIABLES:
+        raise ValueError('Invalid report variables {}, {}'.format(x_var, y_var))
+
+    report_from = REPORT_FROM.format(campus_filter='' if campus_only else 'AND NOT p.campus')
+    query = sql.format(
+        report_from=report_from,
+        has_data='{} AND {}'.format(_has_data(x_var), _has_data(y_var)),
+        x_var=x_var,
+        y_var=y_var,
+        **kwargs
+    )
+    # the parameters of the FROM clause, once for each of the unioned queries
+    params = [organization_id, [c.pk for c in cycles]] * sql.count('{report_from}')
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def _cycle_version_key(cycle_id):
+    return 'report_cycle_version:{}'.format(cycle_id)
+
+
+def _cycle_version(cycle_id):
+    key = _cycle_version_key(cycle_id)
+    version = get_cache_raw(key)
+    if version is None:
+        # a new random version, so that reports cached before the version was evicted are unused
+        version = uuid.uuid4().hex
+        set_cache_raw(key, version, None)
+    return version
+
+
+def invalidate_report_cache(cycle_id):
+    """Invalidate all cached reports that include the cycle"""
+    set_cache_raw(_cycle_version_key(cycle_id), uuid.uuid4().hex, None)
+
+
+def _report_cache_key(report_type, organization_id, cycles, x_var, y_var, campus_only):
+    parts = [report_type, organization_id, x_var, y_var, bool(campus_only)]
+    parts.extend('{}:{}'.format(c.pk, _cycle_version(c.pk)) for c in cycles)
+    return 'report:{}'.format(
+        hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest())
+
+
+def _cached(report_type, fn, organization_id, cycles, x_var, y_var, campus_only):
+    cycles = list(cycles)
+    key = _report_cache_key(report_type, organization_id, cycles, x_var, y_var, campus_only)
+    result = get_cache_raw(key)
+    if result is None:
+        result = fn(organization_id, cycles, x_var, y_var, campus_only)
+        set_cache_raw(key, result, REPORT_CACHE_TIMEOUT)
+    return result
+
+
+def _property_counts(cycle, count_total, count_with_data):
+    return {
+        'yr_e': cycle.end.strftime('%Y'),
+        'num_properties': count_total,
+        'num_properties_w-data': count_with_data,
+    }
+
+
+def _get_report_data(organization_id, cycles, x_var, y_var, campus_only):
+    rows = {row[0]: row[1:] for row in _report_query(
+        REPORT_SQL, organization_id, cycles, x_var, y_var, campus_only
+    )}
+
+    results = []
+    for cycle in cycles:
+        count_total, count_with_data, data = rows.get(cycle.pk, (0, 0, []))
+        yr_e = cycle.end.strftime('%Y')
+        for datum in data:
+            datum['yr_e'] = yr_e
+        results.append({
+            'cycle_id': cycle.pk,
+            'chart_data': data,
+            'property_counts': _property_counts(cycle, count_total, count_with_data),
+        })
+    return results
+
+
+def _group_display(y_var, group):
+    if y_var == 'use_description':
+        return group.capitalize()
+    elif y_var == 'year_built':
+        decade = str(group)
+        return '%s-%s' % (decade, '%s9' % decade[:-1])  # 1990-1999
+    else:
+        return GROSS_FLOOR_AREA_DISPLAY[int(group)]
+
+
+def _get_aggregated_report_data(organization_id, cycles, x_var, y_var, campus_only):
+    if y_var not in AGGREGATE_GROUPS:
+        raise ValueError('Invalid aggregation variable {}'.format(y_var))
+
+    counts = {}
+    chart_data = {}
+    for cycle_id, is_total, group, count_total, count_with_data, median in _report_query(
+            AGGREGATED_REPORT_SQL, organization_id, cycles, x_var, y_var, campus_only,
+            group=AGGREGATE_GROUPS[y_var]):
+        if is_total:
+            counts[cycle_id] = (count_total, count_with_data)
+        elif count_with_data:
+            chart_data.setdefault(cycle_id, []).append((group, median))
+
+    results = []
+    for cycle in cycles:
+        yr_e = cycle.end.strftime('%Y')
+        results.append({
+            'cycle_id': cycle.pk,
+            'chart_data': [
+                {'x': median, 'y': _group_display(y_var, group), 'yr_e': yr_e}
+                for group, median in chart_data.get(cycle.pk, [])
+            ],
+            'property_counts': _property_counts(cycle, *counts.get(cycle.pk, (0, 0))),
+        })
+    return results
+
+
+def get_report_data(organization_id, cycles, x_var, y_var, campus_only):
+    """
+    Return the property counts and the x/y chart data of each cycle.
+
+    :param organization_id: int, organization of the properties
+    :param cycles: list, Cycles to report on
+    :param x_var: str, PropertyState field of the x values
+    :param y_var: str, PropertyState field of the y values
+    :param campus_only: bool, include campus properties (otherwise they are excluded)
+    :return: list of dicts, one per cycle, with cycle_id, chart_data and property_counts
+    """
+    return _cached('raw', _get_report_data, organization_id, cycles, x_var, y_var, campus_only)
+
+
+def get_aggregated_report_data(organization_id, cycles, x_var, y_var, campus_only):
+    """
+    Return the property counts of each cycle and the median of the x values of each group of
+    the y values (use, decade built or floor area range) in the cycle.
+
+    :param y_var: str, one of use_description, year_built or gross_floor_area
+    :return: list of dicts, one per cycle, with cycle_id, chart_data and property_counts
+    """
+    return _cached('aggregated', _get_aggregated_report_data, organization_id, cycles, x_var,
+                   y_var, campus_only)
@@ -0,0 +1,424 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+
+Bulk writing and downsampled reading of meter readings. Interval data (e.g. a year of 15 minute
+readings from a utility feed) is inserted in batches with a single INSERT per batch instead of one
+INSERT per reading.
+
+The hourly, daily and monthly TimeSeriesRollups of a meter are recomputed for the range of the
+inserted readings after each bulk insert. Requests for downsampled data are answered from the
+coarsest rollup that can be aggregated to the requested interval, so a chart of several years of
+15 minute data reads a few hundred rows instead of hundreds of thousands.
+
+When SEED_TIMESERIES_COMPACT_STORAGE is enabled, new readings are packed in one TimeSeriesBlock
+row per meter per month instead of one TimeSeries row per reading. Readings that cannot be packed
+(irregular durations or unaligned times) are still stored as TimeSeries rows; the read helpers
+combine both storages.
+"""
+from __future__ import unicode_literals
+
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from seed.lib.mcm.utils import batch
+from seed.models.meters import TimeSeries, TimeSeriesBlock, TimeSeriesRollup
+
+_log = logging.getLogger(__name__)
+
+# Number of TimeSeries rows per INSERT
+TIMESERIES_BATCH_SIZE = 5000
+
+ROLLUP_STEPS = OrderedDict([
+    (TimeSeriesRollup.HOUR, '1 hour'),
+    (TimeSeriesRollup.DAY, '1 day'),
+    (TimeSeriesRollup.MONTH, '1 month'),
+])
+
+# Intervals that can be requested, with the rollup they are computed from (None for the raw
+# readings) and the length of the interval
+RAW = 'raw'
+QUERY_INTERVALS = OrderedDict([
+    (RAW, (None, None)),
+    ('hour', (TimeSeriesRollup.HOUR, '1 hour')),
+    ('day', (TimeSeriesRollup.DAY, '1 day')),
+    ('week', (TimeSeriesRollup.DAY, '1 week')),
+    ('month', (TimeSeriesRollup.MONTH, '1 month')),
+    ('quarter', (TimeSeriesRollup.MONTH, '3 months')),
+    ('year', (TimeSeriesRollup.MONTH, '1 year')),
+])
+
+# The readings of a meter between the SQL expressions {lo} and {hi}, from both the TimeSeries rows
+# and the compact TimeSeriesBlocks. The readings are filtered on begin_time so that the
+# (meter, begin_time) index is used.
+READINGS_SQL = """
+    SELECT begin_time, end_time, reading, cost
+    FROM seed_timeseries
+    WHERE meter_id = %(meter)s AND begin_time >= {lo} AND begin_time < {hi}
+    UNION ALL
+    SELECT begin_time, begin_time + interval_seconds * INTERVAL '1 second', reading, cost
+    FROM (
+        SELECT b.start_time + (r.i - 1) * b.interval_seconds * INTERVAL '1 second' AS begin_time,
+               b.interval_seconds, r.reading, r.cost::numeric AS cost
+        FROM seed_timeseriesblock b,
+             unnest(b.readings, b.costs) WITH ORDINALITY AS r(reading, cost, i)
+        WHERE b.meter_id = %(meter)s AND b.end_time > {lo} AND b.start_time < {hi}
+    ) blocks
+    WHERE begin_time >= {lo} AND begin_time < {hi} AND (reading IS NOT NULL OR cost IS NOT NULL)
+"""
+
+# Rebuilds the rollups of a period for the buckets between start and end (in the time zone tz)
+ROLLUP_LO = "date_trunc(%(period)s, %(start)s AT TIME ZONE %(tz)s) AT TIME ZONE %(tz)s"
+ROLLUP_HI = ("(date_trunc(%(period)s, %(end)s AT TIME ZONE %(tz)s) + %(step)s::interval) "
+             "AT TIME ZONE %(tz)s")
+
+ROLLUP_DELETE_SQL = """
+    DELETE FROM seed_timeseriesrollup
+    WHERE meter_id = %(meter)s AND period = %(period)s
+      AND begin_time >= {lo} AND begin_time < {hi}
+""".format(lo=ROLLUP_LO, hi=ROLLUP_HI)
+
+ROLLUP_INSERT_SQL = """
+    INSERT INTO seed_timeseriesrollup
+        (meter_id, period, begin_time, end_time, reading_count, reading_sum, reading_min,
+         reading_max, cost)
+    SELECT %(meter)s, %(period)s,
+           bucket AT TIME ZONE %(tz)s,
+           (bucket + %(step)s::interval) AT TIME ZONE %(tz)s,
+           COUNT(reading), SUM(reading), MIN(reading), MAX(reading), SUM(cost)
+    FROM (
+        SELECT date_trunc(%(period)s, begin_time AT TIME ZONE %(tz)s) AS bucket, reading, cost
+        FROM ({readings}) readings
+    ) buckets
+    GROUP BY bucket
+""".format(readings=READINGS_SQL.format(lo=ROLLUP_LO, hi=ROLLUP_HI))
+
+ROLLUP_QUERY_SQL = """
+    SELECT bucket AT TIME ZONE %(tz)s,
+           (bucket + %(step)s::interval) AT TIME ZONE %(tz)s,
+           SUM(reading_count), SUM(reading_sum), MIN(reading_min), MAX(reading_max), SUM(cost)
+    FROM (
+        SELECT date_trunc(%(interval)s, begin_time AT TIME ZONE %(tz)s) AS bucket, reading_count,
+               reading_sum, reading_min, reading_max, cost
+        FROM seed_timeseriesrollup
+        WHERE meter_id = %(meter)s AND period = %(period)s {filters}
+    ) rollups
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+
+def _time_zone_name():
+    return settings.TIME_ZONE or 'UTC'
+
+
+def compact_storage_enabled():
+    """Return True if new readings are stored in TimeSeriesBlocks instead of TimeSeries rows"""
+    return getattr(settings, 'SEED_TIMESERIES_COMPACT_STORAGE', False)
+
+
+def parse_timestamp(value, tz=None):
+    """
+    Parse an ISO 8601 date or datetime. Naive values are interpreted in `tz`.
+
+    :param value: str, or None
+    :param tz: tzinfo, defaults to the current timezone
+    :return: aware datetime, or None if value is None
+    """
+    if value is None:
+        return None
+    result = parse_datetime(value)
+    if result is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError('Invalid datetime: {}'.format(value))
+        result = datetime(date.year, date.month, date.day)
+    if timezone.is_naive(result):
+        result = timezone.make_aware(result, tz or timezone.get_current_timezone())
+    return result
+
+
+def epoch_reading_converter(tz=None):
+    """
+    Return a function that converts a reading with epoch seconds (as returned by the Green Button
+    parsers, with keys start_time, duration, value and cost) to the tuple expected by
+    `bulk_insert_timeseries`. The timezone is looked up once for all of the readings.
+
+    :param tz: tzinfo, defaults to the current timezone
+    :return: function
+    """
+    tz = tz or timezone.get_current_timezone()
+
+    def convert(reading):
+        start_time = int(reading['start_time'])
+        end_time = start_time + int(reading['duration'])
+        return (
+            datetime.fromtimestamp(start_time, tz=tz),
+            datetime.fromtimestamp(end_time, tz=tz),
+            reading['value'],
+            reading.get('cost'),
+        )
+
+    return convert
+
+
+def iso_reading_converter(tz=None):
+    """
+    Return a function that converts a reading with ISO 8601 times (as posted to the API, with keys
+    begin_time, end_time, reading and cost) to the tuple expected by `bulk_insert_timeseries`.
+    Naive times are interpreted in `tz`.
+
+    :param tz: tzinfo, defaults to the current timezone
+    :return: function
+    """
+    tz = tz or timezone.get_current_timezone()
+
+    def convert(reading):
+        return (
+            parse_timestamp(reading.get('begin_time'), tz),
+            parse_timestamp(reading.get('end_time'), tz),
+            reading.get('reading'),
+            reading.get('cost'),
+        )
+
+    return convert
+
+
+def bulk_insert_timeseries(meter, readings, converter=None, batch_size=TIMESERIES_BATCH_SIZE):
+    """
+    Insert the readings of a meter in batches and update the meter's rollups. `readings` can be
+    any iterable, including a generator, and is consumed one batch at a time so that the readings
+    never have to be held in memory all at once.
+
+    :param meter: Meter, meter of the readings
+    :param readings: iterable, of (begin_time, end_time, reading, cost) tuples, or of any value
+        that `converter` turns into such a tuple
+    :param converter: function, optional conversion applied to each reading
+    :param batch_size: int, number of rows per INSERT
+    :return: int, number of readings stored
+    """
+    compact = compact_storage_enabled()
+    count = 0
+    first_time = last_time = None
+    for readings_batch in batch(readings, batch_size):
+        if converter is not None:
+            readings_batch = [converter(reading) for reading in readings_batch]
+
+        begin_times = [r[0] for r in readings_batch if r[0] is not None]
+        if begin_times:
+            first_time = min([first_time or begin_times[0]] + begin_times)
+            last_time = max([last_time or begin_times[0]] + begin_times)
+
+        count += len(readings_batch)
+        if compact:
+            readings_batch = pack_readings(meter, readings_batch)
+
+        with transaction.atomic():
+            TimeSeries.objects.bulk_create([
+                TimeSeries(
+                    meter_id=meter.pk,
+                    begin_time=begin_time,
+                    end_time=end_time,
+                    reading=reading,
+                    cost=cost,
+                ) for begin_time, end_time, reading, cost in readings_batch
+            ], batch_size=batch_size)
+
+    _log.debug('Inserted {} readings for meter {}'.format(count, meter.pk))
+    if first_time is not None:
+        update_rollups(meter, first_time, last_time)
+    return count
+
+
+def _month_start(value, tz):
+    local = timezone.localtime(value, tz)
+    return timezone.make_aware(datetime(local.year, local.month, 1), tz)
+
+
+def pack_readings(meter, readings):
+    """
+    Store readings in the monthly TimeSeriesBlocks of a meter. A block holds readings of a single
+    duration that begin on a multiple of that duration after the start of the month; readings
+    that do not fit in a block (no begin or end time, a duration that differs from the block's or
+    a begin time that is not aligned) are returned to be stored as TimeSeries rows.
+
+    :param meter: Meter
+    :param readings: list, of (begin_time, end_time, reading, cost) tuples
+    :return: list, of the readings that were not packed
+    """
+    tz = timezone.get_current_timezone()
+    unpacked = []
+    months = OrderedDict()
+    for begin_time, end_time, reading, cost in readings:
+        duration = int((end_time - begin_time).total_seconds()) if (
+            begin_time is not None and end_time is not None) else 0
+        if duration <= 0:
+            unpacked.append((begin_time, end_time, reading, cost))
+            continue
+        months.setdefault(_month_start(begin_time, tz), []).append(
+            (begin_time, end_time, duration, reading, cost))
+
+    if not months:
+        return unpacked
+
+    with transaction.atomic():
+        blocks = {
+            block.start_time: block for block in TimeSeriesBlock.objects.select_for_update().filter(
+                meter=meter, start_time__in=list(months.keys()))
+        }
+        for start_time, month_readings in months.items():
+            block = blocks.get(start_time)
+            if block is None:
+                block = TimeSeriesBlock(
+                    meter=meter,
+                    start_time=start_time,
+                    end_time=start_time,
+                    interval_seconds=month_readings[0][2],
+                )
+
+            packed = False
+            for begin_time, end_time, duration, reading, cost in month_readings:
+                if duration == block.interval_seconds and block.set_reading(
+                        begin_time, reading, float(cost) if cost is not None else None):
+                    packed = True
+                else:
+                    unpacked.append((begin_time, end_time, reading, cost))
+
+            if packed:
+                block.save()
+
+    return unpacked
+
+
+def update_rollups(meter, start, end):
+    """
+    Recompute the hourly, daily and monthly rollups of a meter for all of the buckets that
+    contain a time between start and end (inclusive).
+
+    :param meter: Meter
+    :param start: datetime, earliest begin_time of the changed readings
+    :param end: datetime, latest begin_time of the changed readings
+    :return: None
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        for period, step in ROLLUP_STEPS.items():
+            params = {
+                'meter': meter.pk,
+                'period': period,
+                'step': step,
+                'start': start,
+                'end': end,
+                'tz': _time_zone_name(),
+            }
+            cursor.execute(ROLLUP_DELETE_SQL, params)
+            cursor.execute(ROLLUP_INSERT_SQL, params)
+
+
+def refresh_rollups(meter):
+    """Rebuild all of the rollups of a meter from its readings"""
+    TimeSeriesRollup.objects.filter(meter=meter).delete()
+    times = TimeSeries.objects.filter(meter=meter, begin_time__isnull=False).aggregate(
+        start=Min('begin_time'), end=Max('begin_time'))
+    block_times = TimeSeriesBlock.objects.filter(meter=meter).aggregate(
+        start=Min('start_time'), end=Max('end_time'))
+
+    starts = [t for t in [times['start'], block_times['start']] if t is not None]
+    ends = [t for t in [times['end'], block_times['end']] if t is not None]
+    if starts:
+        update_rollups(meter, min(starts), max(ends))
+
+
+def iter_readings(meter, start=None, end=None):
+    """
+    Return the readings of a meter from both the TimeSeries rows and the compact TimeSeriesBlocks,
+    ordered by begin time. Readings without a begin time are not included.
+
+    :param meter: Meter
+    :param start: datetime, optional, only readings that begin at or after start
+    :param end: datetime, optional, only readings that begin before end
+    :return: generator of (begin_time, end_time, reading, cost) tuples
+    """
+    sql = READINGS_SQL.format(
+        lo='%(start)s' if start is not None else "'-infinity'::timestamptz",
+        hi='%(end)s' if end is not None else "'infinity'::timestamptz",
+    ) + ' ORDER BY begin_time'
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'meter': meter.pk, 'start': start, 'end': end})
+        for row in cursor:
+            yield row
+
+
+def count_readings(meter):
+    """Return the number of readings of a meter in both the TimeSeries rows and the blocks"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT COUNT(*) FROM ({}) readings'.format(READINGS_SQL.format(
+                lo="'-infinity'::timestamptz", hi="'infinity'::timestamptz")),
+            {'meter': meter.pk}
+        )
+        return cursor.fetchone()[0]
+
+
+def get_timeseries(meter, interval=RAW, start=None, end=None):
+    """
+    Return the readings of a meter, downsampled to an interval. Downsampled data is aggregated
+    from the coarsest rollup that fits in the interval (e.g. weeks from the daily rollups) and
+    start and end are applied to the begin time of the rollups, so the range is extended to whole
+    rollup periods.
+
+    :param meter: Meter
+    :param interval: str, one of QUERY_INTERVALS
+    :param start: datetime, optional, only readings that begin at or after start
+    :param end: datetime, optional, only readings that begin before end
+    :return: list of dicts with begin, end, value and, for downsampled data, min, max, cost and
+        count, ordered by begin
+    """
+    if interval not in QUERY_INTERVALS:
+        raise ValueError('Invalid interval {}, must be one of {}'.format(
+            interval, ', '.join(QUERY_INTERVALS.keys())))
+
+    period, step = QUERY_INTERVALS[interval]
+    if period is None:
+        return [
+            {'begin': str(begin_time), 'end': str(end_time), 'value': reading}
+            for begin_time, end_time, reading, _ in iter_readings(meter, start, end)
+        ]
+
+    filters = ''
+    if start is not None:
+        filters += ' AND begin_time >= %(start)s'
+    if end is not None:
+        filters += ' AND begin_time < %(end)s'
+
+    with connection.cursor() as cursor:
+        cursor.execute(ROLLUP_QUERY_SQL.format(filters=filters), {
+            'meter': meter.pk,
+            'period': period,
+            'interval': interval,
+            'step': step,
+            'start': start,
+            'end': end,
+            'tz': _time_zone_name(),
+        })
+        return [
+            {
+                'begin': str(begin_time),
+                'end': str(end_time),
+                'value': value,
+                'min': reading_min,
+                'max': reading_max,
+                'cost': float(cost) if cost is not None else None,
+                'count': count,
+            } for begin_time, end_time, count, value, reading_min, reading_max, cost in
+            cursor.fetchall()
+        ]
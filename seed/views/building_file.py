@@ -4,9 +4,19 @@
 :copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
 :author
 """
+import os
+import uuid
+import zipfile
+import zlib
+
+from django.conf import settings
+from django.core.files.base import ContentFile
 from django.http import JsonResponse
 from rest_framework import status
+from rest_framework.decorators import list_route
 
+from seed import tasks
+from seed.decorators import get_prog_key
 from seed.lib.superperms.orgs.decorators import has_perm_class
 from seed.models import BuildingFile, Cycle
 from seed.serializers.building_file import BuildingFileSerializer
@@ -14,6 +24,33 @@ from seed.serializers.properties import PropertyViewAsStateSerializer
 from seed.utils.viewsets import SEEDOrgReadOnlyModelViewSet
 
 
+# Bytes read at a time from the entries of an uploaded zip
+ZIP_READ_CHUNK_SIZE = 2 ** 16
+
+
+def _read_zip_entry(archive, info, limit):
+    """
+    Return the content of a zip entry, or None if it expands to more than limit bytes. The size
+    in the header of the entry is not trusted, Python 2.7 only stops reading at the compressed
+    size.
+    """
+    chunks = []
+    size = 0
+    entry = archive.open(info)
+    try:
+        while True:
+            chunk = entry.read(ZIP_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > limit:
+                return None
+            chunks.append(chunk)
+    finally:
+        entry.close()
+    return b''.join(chunks)
+
+
 class BuildingFileViewSet(SEEDOrgReadOnlyModelViewSet):
     model = BuildingFile
     serializer_class = BuildingFileSerializer
@@ -86,3 +123,140 @@ class BuildingFileViewSet(SEEDOrgReadOnlyModelViewSet):
                 "status": "error",
                 "message": "Could not process building file with messages {}".format(messages)
             }, status=status.HTTP_400_BAD_REQUEST)
+
+    @has_perm_class('can_modify_data')
+    @list_route(methods=['POST'])
+    def batch(self, request):
+        """
+        Does not work in Swagger!
+
+        Create new Properties from a zip of building files. The files are processed in the
+        background, the progress and the result of each file are returned under the progress key.
+        ---
+        consumes:
+            - multipart/form-data
+        parameters:
+            - name: organization_id
+              type: integer
+              required: true
+            - name: cycle_id
+              type: integer
+              required: true
+            - name: file_type
+              type: string
+              enum: ["BuildingSync", "HPXML"]
+              required: true
+            - name: file
+              description: Zip file of the building files
+              required: true
+              type: file
+        """
+        if len(request.FILES) == 0:
+            return JsonResponse({
+                'success': False,
+                'message': "Must pass file in as a Multipart/Form post"
+            })
+
+        the_file = request.data['file']
+        file_type = BuildingFile.str_to_file_type(request.data.get('file_type', 'Unknown'))
+        organization_id = request.data['organization_id']
+        cycle = request.data.get('cycle_id', None)
+
+        if file_type not in BuildingFile.BUILDING_FILE_PARSERS:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'file_type must be BuildingSync or HPXML'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            cycle = Cycle.objects.get(pk=cycle, organization_id=organization_id)
+        except (Cycle.DoesNotExist, ValueError):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Cycle ID is not defined'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            archive = zipfile.ZipFile(the_file)
+        except zipfile.BadZipfile:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'File must be a zip file'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        building_file_ids = []
+        with archive:
+            entries = []
+            for info in archive.infolist():
+                filename = os.path.basename(info.filename)
+                # skip directories and hidden files (e.g. __MACOSX/._file.xml)
+                if not filename or filename.startswith('.') or '__MACOSX' in info.filename:
+                    continue
+                entries.append((info, filename))
+
+            # reject zips whose headers are over the limits before extracting anything
+            max_files = getattr(settings, 'SEED_BUILDING_FILE_ZIP_MAX_FILES', 1000)
+            max_file_size = getattr(settings, 'SEED_BUILDING_FILE_ZIP_MAX_FILE_SIZE', 50 * 2 ** 20)
+            max_total_size = getattr(
+                settings, 'SEED_BUILDING_FILE_ZIP_MAX_TOTAL_SIZE', 500 * 2 ** 20)
+            if len(entries) > max_files:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Zip file contains more than {} files'.format(max_files)
+                }, status=status.HTTP_400_BAD_REQUEST)
+            too_large = [filename for info, filename in entries if info.file_size > max_file_size]
+            if too_large:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Files larger than {} bytes: {}'.format(
+                        max_file_size, ', '.join(too_large))
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if sum(info.file_size for info, _ in entries) > max_total_size:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'Zip file expands to more than {} bytes'.format(max_total_size)
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # the sizes in the headers can be wrong, so the limits are enforced while reading
+            total_size = 0
+            building_files = []
+            for info, filename in entries:
+                try:
+                    content = _read_zip_entry(
+                        archive, info, min(max_file_size, max_total_size - total_size))
+                    message = 'Zip file expands to more than the allowed size'
+                except (zipfile.BadZipfile, zlib.error):
+                    content = None
+                    message = 'Could not extract {} from the zip file'.format(filename)
+                if content is None:
+                    for building_file in building_files:
+                        building_file.file.delete(save=False)
+                        building_file.delete()
+                    return JsonResponse({
+                        'status': 'error',
+                        'message': message
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                total_size += len(content)
+
+                building_files.append(BuildingFile.objects.create(
+                    file=ContentFile(content, name=filename),
+                    filename=filename,
+                    file_type=file_type,
+                ))
+            building_file_ids = [building_file.pk for building_file in building_files]
+
+        if not building_file_ids:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Zip file does not contain any files'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        prog_key = get_prog_key('process_building_files', uuid.uuid4().hex)
+        tasks.process_building_files.delay(building_file_ids, cycle.organization_id, cycle.pk,
+                                           prog_key)
+        return JsonResponse({
+            'status': 'success',
+            'progress': 0,
+            'progress_key': prog_key,
+            'count': len(building_file_ids),
+        })
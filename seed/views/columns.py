@@ -11,13 +11,14 @@ from django.http import JsonResponse
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.authentication import SessionAuthentication
-from rest_framework.decorators import list_route
+from rest_framework.decorators import detail_route, list_route
 
 from seed.authentication import SEEDAuthentication
 from seed.decorators import ajax_request_class, require_organization_id_class
 from seed.lib.superperms.orgs.decorators import has_perm_class
 from seed.lib.superperms.orgs.models import Organization, OrganizationUser
 from seed.models.columns import Column, ColumnMapping
+from seed.tasks import sync_extra_data_index
 from seed.utils.api import api_endpoint_class
 
 _log = logging.getLogger(__name__)
@@ -213,6 +214,69 @@ class ColumnViewSet(viewsets.ViewSet):
                 'message': 'organization with with id {} does not exist'.format(organization_id)
             }, status=status.HTTP_404_NOT_FOUND)
 
+    @api_endpoint_class
+    @ajax_request_class
+    @has_perm_class('can_modify_data')
+    @require_organization_id_class
+    @detail_route(methods=['PUT'])
+    def index(self, request, pk=None):
+        """
+        Mark an extra data column as indexed (or not). Filters and sorts on indexed columns use a
+        database index on the column's values, which is built in the background.
+        ---
+        parameters:
+            - name: organization_id
+              description: The organization_id
+              required: true
+              paramType: query
+            - name: is_indexed
+              description: Whether the column should be indexed
+              required: true
+              paramType: body
+        type:
+            status:
+                description: success or error
+                type: string
+                required: true
+            column:
+                description: Returns a dictionary of the updated column
+                type: dictionary
+                required: true
+        """
+        organization_id = request.query_params.get('organization_id', None)
+        try:
+            column = Column.objects.get(pk=pk, organization_id=organization_id)
+        except Column.DoesNotExist:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'column with id {} does not exist'.format(pk)
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if not column.is_extra_data or column.table_name not in ['PropertyState', 'TaxLotState']:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'only extra data columns can be indexed'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # form data is a string, e.g. 'false', which bool() would take as True
+        is_indexed = request.data.get('is_indexed', True)
+        if isinstance(is_indexed, basestring):
+            is_indexed = {'true': True, 'false': False}.get(is_indexed.strip().lower())
+        if not isinstance(is_indexed, bool):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'is_indexed must be true or false'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        column.is_indexed = is_indexed
+        column.save()
+        sync_extra_data_index.delay(column.pk)
+
+        return JsonResponse({
+            'status': 'success',
+            'column': column.to_dict(),
+        })
+
 
 class ColumnMappingViewSet(viewsets.ViewSet):
     raise_exception = True
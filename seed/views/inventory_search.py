@@ -0,0 +1,136 @@
+# !/usr/bin/env python
+# encoding: utf-8
+"""
+:copyright (c) 2014 - 2017, The Regents of the University of California, through Lawrence Berkeley National Laboratory (subject to receipt of any required approvals from the U.S. Department of Energy) and contributors. All rights reserved.  # NOQA
+:author
+"""
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.decorators import list_route
+
+from seed.decorators import ajax_request_class
+from seed.lib.superperms.orgs.decorators import has_perm_class
+from seed.models.inventory_rows import get_inventory_related
+from seed.search import inventory_autocomplete, search_inventory_ranked
+from seed.serializers.pint import PintJSONEncoder
+from seed.utils.api import api_endpoint_class
+from seed.utils.pagination import parse_page_size
+
+SEARCH_LIMIT_DEFAULT = 25
+SEARCH_LIMIT_MAX = 100
+
+
+class InventorySearchMixin(object):
+    """
+    Quick search and autocomplete routes shared by the Property and TaxLot viewsets, which set
+    `inventory_type` to 'property' or 'taxlot'.
+    """
+    inventory_type = None
+
+    @api_endpoint_class
+    @ajax_request_class
+    @has_perm_class('requires_viewer')
+    @list_route(methods=['GET'])
+    def search(self, request):
+        """
+        Quick search of the inventory in a cycle by identifier, name or address. The results are
+        ordered by relevance and include the search ``rank``.
+        ---
+        parameters:
+            - name: organization_id
+              description: The organization_id for this user's organization
+              required: true
+              paramType: query
+            - name: cycle
+              description: The ID of the cycle to search
+              required: true
+              paramType: query
+            - name: q
+              description: The search string
+              required: true
+              paramType: query
+            - name: limit
+              description: The maximum number of results to return (default 25, max 100)
+              required: false
+              paramType: query
+        """
+        org_id = request.query_params.get('organization_id', None)
+        cycle_id = request.query_params.get('cycle', None)
+        if not org_id or not cycle_id:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Need to pass organization_id and cycle as query parameters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cycle_id = int(cycle_id)
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'cycle must be an integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = parse_page_size(
+                request.query_params.get('limit'), SEARCH_LIMIT_DEFAULT, SEARCH_LIMIT_MAX
+            )
+        except ValueError:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'limit must be an integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        views = list(search_inventory_ranked(
+            self.inventory_type, org_id, cycle_id, request.query_params.get('q', ''), limit
+        ))
+        results = get_inventory_related(views, [])
+        for result, view in zip(results, views):
+            result['rank'] = view.rank
+
+        return JsonResponse({
+            'status': 'success',
+            'cycle_id': cycle_id,
+            'results': results,
+        }, encoder=PintJSONEncoder)
+
+    @api_endpoint_class
+    @ajax_request_class
+    @has_perm_class('requires_viewer')
+    @list_route(methods=['GET'])
+    def autocomplete(self, request):
+        """
+        Suggest the identifiers, names and addresses of the inventory that start with a prefix.
+        ---
+        parameters:
+            - name: organization_id
+              description: The organization_id for this user's organization
+              required: true
+              paramType: query
+            - name: cycle
+              description: The ID of the cycle to limit the suggestions to
+              required: false
+              paramType: query
+            - name: q
+              description: The prefix to complete
+              required: true
+              paramType: query
+        """
+        org_id = request.query_params.get('organization_id', None)
+        if not org_id:
+            return JsonResponse(
+                {'status': 'error', 'message': 'Need to pass organization_id as query parameter'},
+                status=status.HTTP_400_BAD_REQUEST)
+        cycle_id = request.query_params.get('cycle', None)
+        if cycle_id:
+            try:
+                cycle_id = int(cycle_id)
+            except ValueError:
+                return JsonResponse(
+                    {'status': 'error', 'message': 'cycle must be an integer'},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+        return JsonResponse({
+            'status': 'success',
+            'suggestions': inventory_autocomplete(
+                self.inventory_type, org_id, request.query_params.get('q', ''),
+                cycle_id=cycle_id
+            ),
+        })
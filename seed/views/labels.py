@@ -26,8 +26,11 @@ from seed.filters import (
 from seed.models import (
     StatusLabel as Label,
     Property,
+    PropertyView,
     TaxLot,
+    TaxLotView,
 )
+from seed.models.inventory_rows import refresh_inventory_rows
 from seed.pagination import NoPagination
 from seed.serializers.labels import (
     LabelSerializer,
@@ -216,6 +219,15 @@ class UpdateInventoryLabelsAPIView(APIView):
             rqs.delete()
         return removed
 
+    def refresh_inventory_rows(self, inventory_type, inventory_ids):
+        """Rebuild the inventory rows of the views whose labels were changed"""
+        if inventory_type == 'property':
+            refresh_inventory_rows(property_view_ids=PropertyView.objects.filter(
+                property_id__in=inventory_ids).values_list('id', flat=True))
+        else:
+            refresh_inventory_rows(taxlot_view_ids=TaxLotView.objects.filter(
+                taxlot_id__in=inventory_ids).values_list('id', flat=True))
+
     def put(self, request, inventory_type):
         """
         Updates label assignments to inventory items.
@@ -268,6 +280,7 @@ class UpdateInventoryLabelsAPIView(APIView):
             removed = self.remove_labels(qs, inventory_type, remove_label_ids)
             added = self.add_labels(qs, inventory_type, inventory_ids, add_label_ids)
             num_updated = len(set(added).union(removed))
+            self.refresh_inventory_rows(inventory_type, set(added).union(removed))
             labels = self.get_label_desc(add_label_ids, remove_label_ids)
             result = {
                 'status': 'success',
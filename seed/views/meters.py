@@ -6,8 +6,9 @@
 """
 # import json
 
+from django.db import transaction
 from django.http import JsonResponse
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.decorators import detail_route
 from rest_framework.parsers import JSONParser, FormParser
@@ -21,6 +22,14 @@ from seed.models import (
     PropertyView,
 )
 from seed.utils.api import api_endpoint_class
+from seed.utils.timeseries import (
+    bulk_insert_timeseries,
+    count_readings,
+    get_timeseries,
+    iso_reading_converter,
+    parse_timestamp,
+    RAW,
+)
 
 
 class MeterViewSet(viewsets.ViewSet):
@@ -111,7 +120,7 @@ class MeterViewSet(viewsets.ViewSet):
             res = {}
             res['status'] = 'success'
             res['meter'] = obj_to_dict(meter)
-            res['meter']['timeseries_count'] = meter.timeseries_set.count()
+            res['meter']['timeseries_count'] = count_readings(meter)
             return JsonResponse(res)
         else:
             return JsonResponse({
@@ -190,7 +199,9 @@ class MeterViewSet(viewsets.ViewSet):
     @has_perm_class('requires_viewer')
     def timeseries(self, request, pk=None):
         """
-        Returns timeseries for meter
+        Returns timeseries for meter, optionally downsampled to an interval. Downsampled data is
+        read from the hourly, daily or monthly rollups of the meter and contains the sum (value),
+        min, max, cost and count of the readings of each interval.
         ---
         type:
             status:
@@ -210,52 +221,101 @@ class MeterViewSet(viewsets.ViewSet):
               description: Meter primary key
               required: true
               paramType: path
+            - name: interval
+              description: raw (default), hour, day, week, month, quarter or year
+              required: false
+              paramType: query
+            - name: start
+              description: ISO 8601 date or time, only data that begins at or after start
+              required: false
+              paramType: query
+            - name: end
+              description: ISO 8601 date or time, only data that begins before end
+              required: false
+              paramType: query
         """
         meter = Meter.objects.get(pk=pk)
+        try:
+            data = get_timeseries(
+                meter,
+                interval=request.query_params.get('interval', RAW),
+                start=parse_timestamp(request.query_params.get('start')),
+                end=parse_timestamp(request.query_params.get('end')),
+            )
+        except ValueError as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e),
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         res = {
             'status': 'success',
             'meter': obj_to_dict(meter),
         }
-        res['meter']['data'] = []
-
-        ts = meter.timeseries_set.order_by('begin_time')
-        for t in ts:
-            res['meter']['data'].append({
-                'begin': str(t.begin_time),
-                'end': str(t.begin_time),
-                'value': t.reading,
-            })
+        res['meter']['data'] = data
 
         return JsonResponse(res)
 
     @api_endpoint_class
+    @require_organization_id_class
     @has_perm_class('can_modify_data')
     @detail_route(methods=['POST'])
     def add_timeseries(self, request, pk=None):
         """
-        Returns timeseries for meter
+        Adds timeseries to a meter. Naive times are interpreted in the server's timezone.
         ---
         type:
             status:
                 required: true
                 type: string
                 description: Either success or error
-            meter:
-                required: true
-                type: dict
-                description: meter information
-            timeseries:
+            count:
                 required: true
-                type: list
-                description: timeseries information
+                type: integer
+                description: number of timeseries added
         parameters:
             - name: pk
               description: Meter primary key
               required: true
               paramType: path
+            - name: organization_id
+              description: The organization_id of the meter's property
+              required: true
+              paramType: query
+            - name: timeseries
+              description: list of {begin_time, end_time, reading, cost}, times in ISO 8601
+              required: true
+              paramType: body
         """
-        # TODO: Finish implementing this
+        # only the meters of the organization that the permission was checked for
+        try:
+            meter = Meter.objects.get(
+                pk=pk,
+                property_view__property__organization_id=request.query_params['organization_id']
+            )
+        except Meter.DoesNotExist:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'No meter object found',
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        timeseries = request.data.get('timeseries')
+        if not isinstance(timeseries, list):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'timeseries must be a list',
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                count = bulk_insert_timeseries(meter, timeseries, iso_reading_converter())
+        except (ValueError, TypeError, AttributeError) as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Invalid timeseries: {}'.format(e),
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         return JsonResponse({
             'status': 'success',
-            'message': 'Not yet implemented'
+            'count': count,
         })
@@ -22,6 +22,7 @@ from seed.decorators import get_prog_key
 from seed.landing.models import SEEDUser as User
 from seed.lib.superperms.orgs.decorators import has_perm_class
 from seed.lib.superperms.orgs.exceptions import TooManyNestedOrgs
+from seed.lib.superperms.orgs.membership import invalidate_memberships
 from seed.lib.superperms.orgs.models import (
     ROLE_OWNER,
     ROLE_MEMBER,
@@ -29,26 +30,35 @@ from seed.lib.superperms.orgs.models import (
     Organization,
     OrganizationUser,
 )
-from seed.models import Cycle, PropertyView, TaxLotView
+from seed.models import Cycle
 from seed.public.models import INTERNAL, PUBLIC, SharedBuildingField
 from seed.utils.api import api_endpoint_class
 from seed.utils.buildings import get_columns as utils_get_columns
-from seed.utils.organizations import create_organization
+from seed.utils.organizations import create_organization, get_inventory_counts
 
 
 def _dict_org(request, organizations):
     """returns a dictionary of an organization's data."""
 
+    organizations = list(organizations)
+
+    # load the cycles and their inventory counts of all of the organizations at once
+    org_cycles = {}
+    for c in Cycle.objects.filter(organization__in=organizations).only(
+            'id', 'name', 'organization_id').order_by('name'):
+        org_cycles.setdefault(c.organization_id, []).append(c)
+    counts = get_inventory_counts([c.pk for cs in org_cycles.values() for c in cs])
+
     orgs = []
     for o in organizations:
-        org_cycles = Cycle.objects.filter(organization=o).only('id', 'name').order_by('name')
         cycles = []
-        for c in org_cycles:
+        for c in org_cycles.get(o.id, []):
+            num_properties, num_taxlots = counts[c.pk]
             cycles.append({
                 'name': c.name,
                 'cycle_id': c.pk,
-                'num_properties': PropertyView.objects.filter(cycle=c).count(),
-                'num_taxlots': TaxLotView.objects.filter(cycle=c).count()
+                'num_properties': num_properties,
+                'num_taxlots': num_taxlots
             })
 
         # We don't wish to double count sub organization memberships.
@@ -471,6 +481,7 @@ class OrganizationViewSet(viewsets.ViewSet):
 
         ou = OrganizationUser.objects.get(user=user, organization=org)
         ou.delete()
+        invalidate_memberships(user.pk)
 
         return JsonResponse({'status': 'success'})
 
@@ -555,6 +566,7 @@ class OrganizationViewSet(viewsets.ViewSet):
         user = User.objects.get(pk=body['user_id'])
 
         org.add_member(user)
+        invalidate_memberships(user.pk)
 
         return JsonResponse({'status': 'success'})
 
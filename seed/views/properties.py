@@ -33,13 +33,14 @@ from seed.models import (
     AUDIT_USER_EDIT,
     Column,
     Cycle,
-    Simulation,
     PropertyAuditLog,
     PropertyState,
     PropertyView,
     TaxLotProperty,
     TaxLotView,
 )
+from seed.models.auditlog import prefetch_lineage
+from seed.models.inventory_rows import get_inventory_page, refresh_inventory_rows
 from seed.serializers.pint import PintJSONEncoder
 from seed.serializers.properties import (
     PropertySerializer,
@@ -53,12 +54,15 @@ from seed.serializers.taxlots import (
     TaxLotStateSerializer,
 )
 from seed.utils.api import api_endpoint_class
+from seed.utils.pagination import InvalidCursor
 from seed.utils.properties import (
     get_changed_fields,
     pair_unpair_property_taxlot,
     update_result_with_master,
 )
+from seed.utils.reports import invalidate_report_cache
 from seed.utils.time import convert_to_js_timestamp
+from seed.views.inventory_search import InventorySearchMixin
 from seed.utils.viewsets import (
     SEEDOrgCreateUpdateModelViewSet,
     SEEDOrgModelViewSet
@@ -190,14 +194,12 @@ class PropertyViewViewSet(SEEDOrgModelViewSet):
     data_name = "property_views"
 
 
-class PropertyViewSet(GenericViewSet):
+class PropertyViewSet(InventorySearchMixin, GenericViewSet):
     renderer_classes = (JSONRenderer,)
+    inventory_type = 'property'
     serializer_class = PropertySerializer
 
     def _get_filtered_results(self, request, columns):
-
-        page = request.query_params.get('page', 1)
-        per_page = request.query_params.get('per_page', 1)
         org_id = request.query_params.get('organization_id', None)
         cycle_id = request.query_params.get('cycle')
         if not org_id:
@@ -225,30 +227,18 @@ class PropertyViewSet(GenericViewSet):
             .filter(property__organization_id=request.query_params['organization_id'],
                     cycle=cycle).order_by('id')
 
-        paginator = Paginator(property_views_list, per_page)
-
         try:
-            property_views = paginator.page(page)
-            page = int(page)
-        except PageNotAnInteger:
-            property_views = paginator.page(1)
-            page = 1
-        except EmptyPage:
-            property_views = paginator.page(paginator.num_pages)
-            page = paginator.num_pages
+            results, pagination = get_inventory_page(
+                property_views_list, org_id, cycle.id, request.query_params, columns
+            )
+        except InvalidCursor as e:
+            return JsonResponse({'status': 'error', 'message': str(e)},
+                                status=status.HTTP_400_BAD_REQUEST)
 
         response = {
-            'pagination': {
-                'page': page,
-                'start': paginator.page(page).start_index(),
-                'end': paginator.page(page).end_index(),
-                'num_pages': paginator.num_pages,
-                'has_next': paginator.page(page).has_next(),
-                'has_previous': paginator.page(page).has_previous(),
-                'total': paginator.count
-            },
+            'pagination': pagination,
             'cycle_id': cycle.id,
-            'results': TaxLotProperty.get_related(property_views, columns)
+            'results': results
         }
 
         return JsonResponse(response, encoder=PintJSONEncoder)
@@ -258,24 +248,7 @@ class PropertyViewSet(GenericViewSet):
         In general, we move the old relationships to the new state since the old state should not be
         accessible anymore. If we ever unmerge, then we need to decide who gets the data.. both?
         """
-        for s in old_state.scenarios.all():
-            s.property_state = new_state
-            s.save()
-
-        # Move the measures to the new state
-        for m in PropertyMeasure.objects.filter(property_state=old_state):
-            m.property_state = new_state
-            m.save()
-
-        # Move the old building file to the new state to perserve the history
-        for b in old_state.building_files.all():
-            b.property_state = new_state
-            b.save()
-
-        for s in Simulation.objects.filter(property_state=old_state):
-            s.property_state = new_state
-            s.save()
-
+        PropertyState.move_relationships([(old_state, new_state)])
         return new_state
 
     @api_endpoint_class
@@ -302,6 +275,15 @@ class PropertyViewSet(GenericViewSet):
               description: The number of items per page to return
               required: false
               paramType: query
+            - name: cursor
+              description: Opaque token from pagination.next; switches to cursor pagination (pass an
+                           empty value for the first page)
+              required: false
+              paramType: query
+            - name: count
+              description: Total count for cursor pages, one of approximate (default), exact or none
+              required: false
+              paramType: query
         """
         return self._get_filtered_results(request, columns=[])
 
@@ -330,6 +312,15 @@ class PropertyViewSet(GenericViewSet):
               description: The number of items per page to return
               required: false
               paramType: query
+            - name: cursor
+              description: Opaque token from pagination.next; switches to cursor pagination (pass an
+                           empty value for the first page)
+              required: false
+              paramType: query
+            - name: count
+              description: Total count for cursor pages, one of approximate (default), exact or none
+              required: false
+              paramType: query
             - name: column filter data
               description: Object containing columns to filter on, should be a JSON object with a single key "columns"
                            whose value is a list of strings, each representing a column name
@@ -552,6 +543,8 @@ class PropertyViewSet(GenericViewSet):
         log = PropertyAuditLog.objects.select_related('state', 'parent1', 'parent2').filter(
             state_id=property_view.state_id
         ).order_by('-id').first()
+        # load all of the ancestors at once instead of each parent on access
+        log = prefetch_lineage(log)
 
         if log:
             master = {
@@ -785,6 +778,8 @@ class PropertyViewSet(GenericViewSet):
                     for key, value in new_property_state_data.iteritems():
                         setattr(state, key, value)
                     state.save()
+                    refresh_inventory_rows(property_view_ids=[property_view.pk])
+                    invalidate_report_cache(property_view.cycle_id)
 
                     result.update(
                         {'state': PropertyStateSerializer(state).data}
@@ -807,6 +802,7 @@ class PropertyViewSet(GenericViewSet):
 
             # save the property view, even if it hasn't changed so that the datetime gets updated on the property.
             property_view.save()
+            refresh_inventory_rows(property_view_ids=[property_view.pk])
         else:
             status_code = status.HTTP_404_NOT_FOUND
 
@@ -1454,6 +1450,8 @@ class TaxLotViewSet(GenericViewSet):
         log = TaxLotAuditLog.objects.select_related('state', 'parent1', 'parent2').filter(
             state_id=taxlot_view.state_id
         ).order_by('-id').first()
+        # load all of the ancestors at once instead of each parent on access
+        log = prefetch_lineage(log)
         if log:
             master = {
                 'state': TaxLotStateSerializer(log.state).data,
@@ -20,11 +20,11 @@ from rest_framework.viewsets import GenericViewSet
 from seed.decorators import ajax_request_class
 from seed.lib.superperms.orgs.decorators import has_perm_class
 from seed.models import (
-    TaxLotProperty,
     PropertyView,
     TaxLotView
 
 )
+from seed.models.inventory_rows import get_inventory_related
 from seed.serializers.tax_lot_properties import (
     TaxLotPropertySerializer
 )
@@ -140,7 +140,7 @@ class TaxLotPropertyViewSet(GenericViewSet):
         writer = csv.writer(response)
 
         # get the data in a dict which includes the related data
-        data = TaxLotProperty.get_related(model_views, columns)
+        data = get_inventory_related(model_views, columns)
 
         # force the data into the same order as the IDs
         if ids:
@@ -148,7 +148,7 @@ class TaxLotPropertyViewSet(GenericViewSet):
             data.sort(key=lambda x: order_dict[x['id']])  # x is the property/taxlot object
 
         # note that the labels are in the property_labels column and are returned by the
-        # TaxLotProperty.get_related method.
+        # get_inventory_related method.
 
         # header
         writer.writerow(columns)
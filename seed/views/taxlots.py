@@ -11,7 +11,6 @@ All rights reserved.  # NOQA
 import re
 from os import path
 
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.http import JsonResponse
 from rest_framework import status
 from rest_framework.decorators import detail_route, list_route
@@ -31,6 +30,8 @@ from seed.models import (
     TaxLotState,
     TaxLotView
 )
+from seed.models.auditlog import prefetch_lineage
+from seed.models.inventory_rows import get_inventory_page, refresh_inventory_rows
 from seed.serializers.pint import PintJSONEncoder
 from seed.serializers.properties import (
     PropertyViewSerializer
@@ -41,12 +42,14 @@ from seed.serializers.taxlots import (
     TaxLotViewSerializer
 )
 from seed.utils.api import api_endpoint_class
+from seed.utils.pagination import InvalidCursor
 from seed.utils.properties import (
     get_changed_fields,
     pair_unpair_property_taxlot,
     update_result_with_master
 )
 from seed.utils.time import convert_to_js_timestamp
+from seed.views.inventory_search import InventorySearchMixin
 
 # Global toggle that controls whether or not to display the raw extra
 # data fields in the columns returned for the view.
@@ -54,13 +57,12 @@ DISPLAY_RAW_EXTRADATA = True
 DISPLAY_RAW_EXTRADATA_TIME = True
 
 
-class TaxLotViewSet(GenericViewSet):
+class TaxLotViewSet(InventorySearchMixin, GenericViewSet):
     renderer_classes = (JSONRenderer,)
+    inventory_type = 'taxlot'
     serializer_class = TaxLotSerializer
 
     def _get_filtered_results(self, request, columns):
-        page = request.query_params.get('page', 1)
-        per_page = request.query_params.get('per_page', 1)
         org_id = request.query_params.get('organization_id', None)
         cycle_id = request.query_params.get('cycle')
         if not org_id:
@@ -89,30 +91,18 @@ class TaxLotViewSet(GenericViewSet):
             .filter(taxlot__organization_id=request.query_params['organization_id'], cycle=cycle) \
             .order_by('id')
 
-        paginator = Paginator(taxlot_views_list, per_page)
-
         try:
-            taxlot_views = paginator.page(page)
-            page = int(page)
-        except PageNotAnInteger:
-            taxlot_views = paginator.page(1)
-            page = 1
-        except EmptyPage:
-            taxlot_views = paginator.page(paginator.num_pages)
-            page = paginator.num_pages
+            results, pagination = get_inventory_page(
+                taxlot_views_list, org_id, cycle.id, request.query_params, columns
+            )
+        except InvalidCursor as e:
+            return JsonResponse({'status': 'error', 'message': str(e)},
+                                status=status.HTTP_400_BAD_REQUEST)
 
         response = {
-            'pagination': {
-                'page': page,
-                'start': paginator.page(page).start_index(),
-                'end': paginator.page(page).end_index(),
-                'num_pages': paginator.num_pages,
-                'has_next': paginator.page(page).has_next(),
-                'has_previous': paginator.page(page).has_previous(),
-                'total': paginator.count
-            },
+            'pagination': pagination,
             'cycle_id': cycle.id,
-            'results': TaxLotProperty.get_related(taxlot_views, columns)
+            'results': results
         }
 
         return JsonResponse(response, encoder=PintJSONEncoder)
@@ -143,6 +133,15 @@ class TaxLotViewSet(GenericViewSet):
               description: The number of items per page to return
               required: false
               paramType: query
+            - name: cursor
+              description: Opaque token from pagination.next; switches to cursor pagination (pass an
+                           empty value for the first page)
+              required: false
+              paramType: query
+            - name: count
+              description: Total count for cursor pages, one of approximate (default), exact or none
+              required: false
+              paramType: query
         """
         return self._get_filtered_results(request, columns=[])
 
@@ -173,6 +172,15 @@ class TaxLotViewSet(GenericViewSet):
               description: The number of items per page to return
               required: false
               paramType: query
+            - name: cursor
+              description: Opaque token from pagination.next; switches to cursor pagination (pass an
+                           empty value for the first page)
+              required: false
+              paramType: query
+            - name: count
+              description: Total count for cursor pages, one of approximate (default), exact or none
+              required: false
+              paramType: query
             - name: column filter data
               description: Object containing columns to filter on, should be a JSON object with a single key "columns"
                            whose value is a list of strings, each representing a column name
@@ -356,6 +364,8 @@ class TaxLotViewSet(GenericViewSet):
         log = TaxLotAuditLog.objects.select_related('state', 'parent1', 'parent2').filter(
             state_id=taxlot_view.state_id
         ).order_by('-id').first()
+        # load all of the ancestors at once instead of each parent on access
+        log = prefetch_lineage(log)
         master = {
             'state': TaxLotStateSerializer(log.state).data,
             'date_edited': convert_to_js_timestamp(log.created),
@@ -578,6 +588,7 @@ class TaxLotViewSet(GenericViewSet):
 
             # save the tax lot view, even if it hasn't changed so that the datetime gets updated on the taxlot.
             taxlot_view.save()
+            refresh_inventory_rows(taxlot_view_ids=[taxlot_view.pk])
         else:
             status_code = status.HTTP_404_NOT_FOUND
         return JsonResponse(result, status=status_code)
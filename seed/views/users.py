@@ -24,6 +24,7 @@ from seed.decorators import ajax_request_class
 from seed.landing.models import SEEDUser as User
 from seed.lib.superperms.orgs.decorators import PERMS
 from seed.lib.superperms.orgs.decorators import has_perm_class
+from seed.lib.superperms.orgs.membership import invalidate_memberships
 from seed.lib.superperms.orgs.models import (
     ROLE_OWNER,
     ROLE_MEMBER,
@@ -228,6 +229,7 @@ class UserViewSet(viewsets.ViewSet):
                 organization_id=org.pk,
                 user_id=user.pk
             ).update(role_level=_get_role_from_js(role))
+        invalidate_memberships(user.pk)
 
         if created:
             user.email = email
@@ -341,6 +343,7 @@ class UserViewSet(viewsets.ViewSet):
             user_id=user_id,
             organization_id=body['organization_id']
         ).update(role_level=role)
+        invalidate_memberships(user_id)
 
         return JsonResponse({'status': 'success'})
 
@@ -422,10 +425,10 @@ class UserViewSet(viewsets.ViewSet):
             user = content
         else:
             return content
-        user.generate_key()
+        # only the digest of the key is stored, this is the only time the key is available
         return {
             'status': 'success',
-            'api_key': User.objects.get(pk=pk).api_key
+            'api_key': user.generate_key()
         }
 
     @api_endpoint_class